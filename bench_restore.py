@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark session restore: snapshot load + journal replay + Orchestrator rebuild,
+for growing session sizes. No LLM calls are made.
+
+    python bench_restore.py [--sizes 100,1000,5000] [--compression gzip]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'dweebuild_app', 'src'))
+os.environ.setdefault("GROQ_API_KEY", "bench")
+
+from dweebuild.core.orchestrator import Orchestrator
+from dweebuild.core.journal import Journal
+from dweebuild.core.persistence import SessionManager
+from dweebuild.core.modes import WorkMode
+from dweebuild.core.providers import ScriptedProvider
+from dweebuild.core.router import LLMRouter
+from dweebuild.core.llm import LLMClient
+
+
+def build_session(root: str, tasks: int, compression: str) -> dict:
+    """A session with `tasks` tasks (half finished), ~10 logs per task and a journal tail."""
+    llm = LLMClient(router=LLMRouter([ScriptedProvider()]))
+    journal = Journal(os.path.join(root, "journal"), fsync="never")
+    orc = Orchestrator(mode=WorkMode.AUTONOMOUS, llm=llm, journal=journal)
+    specs = [{"id": f"task{i}", "title": f"Implement: module {i}", "files": [f"src/m{i}.py"],
+              "deps": [f"task{i - 1}"] if i % 5 else []} for i in range(tasks)]
+    orc.add_tasks(specs)
+    for i in range(tasks // 2):
+        orc.scheduler.resolve(f"task{i}", True, f"wrote src/m{i}.py")
+        orc.memory.record("task", op="done", id=f"task{i}", result=f"wrote src/m{i}.py")
+        for j in range(10):
+            orc.memory.add_log("ENGINEER", f"step {j} of task{i}: " + "x" * 80)
+        orc.memory.update_context(f"module{i}", {"status": "done", "lines": 120})
+
+    manager = SessionManager(os.path.join(root, "sessions"), compression=compression)
+    state = orc.snapshot()
+    path = manager.save_session("bench", state)
+
+    # Work after the snapshot only exists in the journal.
+    for i in range(tasks // 2, tasks // 2 + tasks // 10):
+        orc.memory.record("task", op="started", id=f"task{i}", agent="ENGINEER")
+        orc.memory.record("step", task_id=f"task{i}", agent="ENGINEER", attempt=1, conversation={
+            "prefix": [{"role": "system", "content": "s" * 2000}, {"role": "user", "content": "u" * 500}],
+            "turns": [{"role": "assistant", "content": "a" * 300}, {"role": "user", "content": "o" * 1500}],
+            "summary": "", "stats": {}})
+        orc.memory.add_log("ENGINEER", f"working on task{i}")
+    journal.close()
+    return {"snapshot": path, "bytes": os.path.getsize(path), "journal": journal.seq}
+
+
+def restore(root: str, snapshot: str) -> tuple:
+    started = time.perf_counter()
+    manager = SessionManager(os.path.join(root, "sessions"))
+    state = manager.load_session(snapshot)
+    loaded = time.perf_counter()
+    llm = LLMClient(router=LLMRouter([ScriptedProvider()]))
+    orc = Orchestrator(mode=WorkMode.AUTONOMOUS, llm=llm)
+    counts = orc.restore(state, os.path.join(root, "journal"))
+    done = time.perf_counter()
+    return loaded - started, done - loaded, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,5000", help="comma-separated task counts")
+    parser.add_argument("--compression", default="auto")
+    args = parser.parse_args()
+
+    print(f"{'tasks':>7} {'snapshot':>10} {'journal':>8} {'load s':>8} {'restore s':>10} {'pending':>8} {'resumable':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        root = tempfile.mkdtemp(prefix="dweebuild-bench-")
+        try:
+            session = build_session(root, size, args.compression)
+            load_s, restore_s, counts = restore(root, session["snapshot"])
+            pending = counts["tasks"] - counts["finished"]
+            print(f"{size:>7} {session['bytes'] / 1024:>8.1f}kB {session['journal']:>8} "
+                  f"{load_s:>8.3f} {restore_s:>10.3f} {pending:>8} {counts['resumable']:>9}")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import streamlit as st
 import asyncio
 import os
 import time
+import sys
 import json
 import base64
 import re
@@ -11,12 +12,19 @@ import subprocess
 import shutil
 from datetime import datetime
 from collections import deque
-from groq import AsyncGroq
 from playwright.async_api import async_playwright
 from duckduckgo_search import DDGS
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+# Shared LLM client pool from the dweebuild package (src path goes first so the
+# package wins over this script's own module name).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dweebuild_app', 'src'))
+from dweebuild.core.llm import get_llm_client
+from dweebuild.core.action_parser import parse_json
+from dweebuild.core.context_budget import ContextBudget
+from dweebuild.core.scheduler import Task, TaskScheduler
+
 # --- 1. CONFIGURATION ---
 st.set_page_config(page_title="dweebuild // ARCHITECT", layout="wide", initial_sidebar_state="collapsed")
 
@@ -92,7 +100,7 @@ if "sys" not in st.session_state:
             "ENGINEER":  {"status": "IDLE", "thought": "Standby", "logs": deque([], maxlen=50)},
             "QA_LEAD":   {"status": "IDLE", "thought": "Standby", "logs": deque([], maxlen=50)},
         },
-        "queue": deque([]),
+        "queue": TaskScheduler(), # Task DAG: deps, target files, critical-path order
         "files": {}, # Cache of file structure
         "running": False,
         "active_file": "README.md",
@@ -148,13 +156,11 @@ async def tool_test():
 # --- 4. BRAIN (GROQ) ---
 
 async def groq_call(system, user):
-    client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
     try:
-        chat = await client.chat.completions.create(
-            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-            model="llama-3.3-70b-versatile", temperature=0.2
+        return await get_llm_client().complete(
+            [{"role": "system", "content": system}, {"role": "user", "content": user}],
+            temperature=0.2
         )
-        return chat.choices[0].message.content
     except Exception as e: return f"ERROR: {str(e)}"
 
 def log(agent, msg, type="INFO"):
@@ -169,7 +175,7 @@ async def architect_loop():
     sys = st.session_state.sys
     
     # Trigger: Running, Queue Empty, No README
-    if sys["running"] and not sys["queue"] and not os.path.exists(f"{PROJECT_ROOT}/README.md"):
+    if sys["running"] and not len(sys["queue"]) and not os.path.exists(f"{PROJECT_ROOT}/README.md"):
         sys["agents"][agent]["status"] = "WORKING"
         sys["agents"][agent]["thought"] = "Designing System Architecture..."
         
@@ -181,7 +187,8 @@ async def architect_loop():
         Design a PRODUCTION-READY Python architecture.
         1. Define the `src/` modules.
         2. Define the `tests/` modules.
-        3. Define the tasks to build them.
+        3. Define the tasks to build them, with ids, dependencies (ids of tasks
+           that must finish first), target files and a relative cost.
         
         Return JSON ONLY:
         {{
@@ -191,21 +198,27 @@ async def architect_loop():
                 "src/utils.py": "# Helpers",
                 "tests/test_main.py": "# Tests"
             }},
-            "tasks": ["Implement src/utils.py", "Implement src/main.py", "Run Tests"]
+            "tasks": [
+                {{"id": "utils", "title": "Implement src/utils.py", "files": ["src/utils.py"], "cost": 1}},
+                {{"id": "main", "title": "Implement src/main.py", "files": ["src/main.py"], "deps": ["utils"], "cost": 2}},
+                {{"id": "tests", "title": "Run Tests", "deps": ["utils", "main"]}}
+            ]
         }}
         """
         res = await groq_call("You are a Senior Staff Engineer. Design robust systems.", prompt)
         
         try:
-            data = json.loads(re.search(r"\{.*\}", res, re.DOTALL).group(0))
+            data = parse_json(res)
+            if not isinstance(data, dict):
+                raise ValueError("No JSON design in response")
             
             # Create Skeleton
             for path, content in data["files"].items():
                 await tool_write(path, content)
                 sys["files"][path] = "Init"
             
-            # Queue Tasks
-            for t in data["tasks"]: sys["queue"].append(t)
+            # Queue Tasks (plain strings are accepted too; cycles raise ValueError)
+            sys["queue"].submit_many(data["tasks"])
             
             log(agent, "Architecture Locked.", "OK")
             sys["active_file"] = f"{PROJECT_ROOT}/README.md"
@@ -219,13 +232,11 @@ async def engineer_loop():
     agent = "ENGINEER"
     sys = st.session_state.sys
     
-    if sys["running"] and sys["queue"]:
-        task = sys["queue"].popleft()
-        
-        # Check if task is for QA
-        if "test" in task.lower():
-            sys["queue"].appendleft(task) # Put back for QA
+    if sys["running"] and len(sys["queue"]):
+        entry = sys["queue"].pop(agent)
+        if entry is None:
             return
+        task = entry.title
 
         sys["agents"][agent]["status"] = "WORKING"
         sys["agents"][agent]["thought"] = f"Engineering: {task}"
@@ -233,25 +244,24 @@ async def engineer_loop():
         
         # 1. Identify Target File
         target = "src/main.py" # Default
-        if "utils" in task.lower(): target = "src/utils.py"
+        if entry.files: target = entry.files[0]
+        elif "utils" in task.lower(): target = "src/utils.py"
         
         # 2. Read Context
         current_code = await tool_read(target)
         project_tree = await run_cmd(f"find {PROJECT_ROOT} -maxdepth 2 -not -path '*/.*'")
         
-        # 3. Write Code
-        prompt = f"""
-        TASK: {task}
-        TARGET FILE: {target}
-        PROJECT FILES:
-        {project_tree}
-        
-        CURRENT CONTENT:
-        {current_code}
-        
-        INSTRUCTION: Write production-grade code. No placeholders. Include docstrings.
-        Return ONLY the full code in a ```python``` block.
-        """
+        # 3. Write Code (context fitted to CONTEXT_BUDGET_TOKENS)
+        budget = ContextBudget(int(os.getenv("CONTEXT_BUDGET_TOKENS", "6000")))
+        budget.add("task", task, pinned=True)
+        budget.add("target file", target, pinned=True)
+        budget.add("current content", current_code, relevance=1.0)
+        budget.add("project files", project_tree, relevance=0.3)
+        budget.add("instruction", "Write production-grade code. No placeholders. Include docstrings.\n"
+                   "Return ONLY the full code in a ```python``` block.", pinned=True)
+        prompt = budget.render()
+        report = budget.report()
+        log(agent, f"Prompt {report['_total']}/{report['_budget']} tokens", "INFO")
         code = await groq_call("You are a Principal Python Developer.", prompt)
         
         match = re.search(r"```python(.*?)```", code, re.DOTALL)
@@ -263,23 +273,23 @@ async def engineer_loop():
             
             # 4. Auto-Queue Unit Test Creation
             test_file = target.replace("src", "tests").replace(".py", "_test.py")
-            if not os.path.exists(f"{PROJECT_ROOT}/{test_file}"):
-                sys["queue"].appendleft(f"Create unit tests for {target} in {test_file}")
+            if target.startswith("src/") and not os.path.exists(f"{PROJECT_ROOT}/{test_file}"):
+                sys["queue"].submit(Task(f"Create unit tests for {target} in {test_file}",
+                                         files=[test_file], deps={entry.id}, priority=1))
                 
+        sys["queue"].complete(entry.id, ok=bool(match))
         sys["agents"][agent]["status"] = "IDLE"
 
 async def qa_loop():
     agent = "QA_LEAD"
     sys = st.session_state.sys
     
-    if sys["running"] and sys["queue"]:
-        task = sys["queue"][0] # Peek
-        
+    if sys["running"] and len(sys["queue"]):
         # QA only takes "Test" tasks
-        if "test" not in task.lower() and "verify" not in task.lower():
+        entry = sys["queue"].pop(agent, include_any=False)
+        if entry is None:
             return
             
-        sys["queue"].popleft() # Consume
         sys["agents"][agent]["status"] = "WORKING"
         sys["agents"][agent]["thought"] = "Running Test Suite..."
         
@@ -289,9 +299,10 @@ async def qa_loop():
         
         if "failed" in output.lower() or "error" in output.lower():
             log(agent, "Tests FAILED. Rejecting code.", "ERR")
-            sys["queue"].append(f"Fix failing tests: {output[-100:]}")
+            sys["queue"].push(f"Fix failing tests: {output[-100:]}")
         else:
             log(agent, "Tests PASSED. Deployment Ready.", "OK")
+        sys["queue"].complete(entry.id, ok="failed" not in output.lower())
             
         sys["agents"][agent]["status"] = "IDLE"
 
@@ -365,7 +376,7 @@ with col_right:
     
     st.markdown("<div class='dwee-panel'>", unsafe_allow_html=True)
     st.markdown("<div class='panel-header'>TASK BACKLOG</div>", unsafe_allow_html=True)
-    tasks = list(st.session_state.sys["queue"])
+    tasks = [t.title for t in st.session_state.sys["queue"]]
     if tasks:
         for i, t in enumerate(tasks):
             st.markdown(f"<div style='font-size:11px; border-bottom:1px solid #333; padding:4px;'>{i+1}. {t}</div>", unsafe_allow_html=True)
@@ -46,7 +46,9 @@ class ArchitectAgent(BaseAgent):
         4. Include proper dependencies for chosen tech stack
         5. E.g. `file_write("requirements.txt", "panda3d>=1.10\\npymunk>=6.0")`.
         6. Create skeleton files with TODO comments for the Engineer
-        7. When done, call FINAL_ANSWER("Architecture complete with [tech stack]").
+        7. When done, call FINAL_ANSWER with a short summary and the implementation plan as JSON:
+           {"tasks": [{"id": "core", "title": "Implement: ...", "files": ["src/core.py"], "deps": [], "cost": 2}, ...]}
+           (deps are ids of tasks that must finish first; cost is relative effort).
         
         Return JSON ONLY:
         {
@@ -54,22 +56,17 @@ class ArchitectAgent(BaseAgent):
             "tool": "file_write",
             "args": { "filepath": "...", "content": "..." }
         }
+        To create several files in one step, return:
+        {
+            "thought": "...",
+            "actions": [ {"tool": "file_write", "args": {...}}, {"tool": "file_write", "args": {...}} ]
+        }
         """
         
-        user_prompt = f"""
-        MISSION: {self.mission}
-        CURRENT TASK: {task}
-        CONTEXT: {context}
-        
-        {self.tech_recommendation}
-        
-        Design a professional project structure. Choose the RIGHT technology for the scope.
-        """
-        
-        result = await self.llm.chat(system_prompt, user_prompt)
+        user_prompt = self._build_user_prompt(
+            system_prompt, task, context,
+            extra={"tech recommendations": self.tech_recommendation}
+        )
+        user_prompt += "\n\nDesign a professional project structure. Choose the RIGHT technology for the scope."
         
-        try:
-            import json
-            return json.loads(result)
-        except:
-            return {"thought": result, "tool": "FINAL_ANSWER", "args": {"result": result}}
+        return await self._request_plan(system_prompt, user_prompt)
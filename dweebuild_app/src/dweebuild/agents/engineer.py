@@ -68,18 +68,13 @@ class EngineerAgent(BaseAgent):
             "tool": "tool_name",
             "args": {{ ... }}
         }}
+        To run several INDEPENDENT tools in one step (e.g. reading several files), return:
+        {{
+            "thought": "...",
+            "actions": [ {{"tool": "shell_exec", "args": {{"cmd": "cat a.py"}}}}, {{"tool": "shell_exec", "args": {{"cmd": "cat b.py"}}}} ]
+        }}
         """
         
-        user_prompt = f"""
-        MISSION: {self.mission}
-        CURRENT TASK: {task}
-        CONTEXT: {context}
-        """
-        
-        result = await self.llm.chat(system_prompt, user_prompt)
+        user_prompt = self._build_user_prompt(system_prompt, task, context)
         
-        try:
-            import json
-            return json.loads(result)
-        except:
-            return {"thought": result, "tool": "FINAL_ANSWER", "args": {"result": result}}
+        return await self._request_plan(system_prompt, user_prompt)
@@ -1,12 +1,23 @@
+import asyncio
+import json
+
 from ..core.agent import BaseAgent
-from ..tools.std_tools import PytestTool
+from ..core.config import config
+from ..core.impact import get_impact_map
+from ..tools.std_tools import TEST_TIMEOUT_SHARE, PytestTool
 
 class QAAgent(BaseAgent):
     """
     The QA Lead runs tests and rejects work if they fail.
+    Only the tests affected by changes since the last passing run are run,
+    with the full suite at checkpoints (see core.impact.ImpactMap). The
+    verdict comes from pytest's JUnit report, which is attached to the
+    result for the follow-up generator. The test runs share a budget below
+    the agent timeout, so a hung suite ends as a reported failure.
     """
     def __init__(self, mission: str, project_root: str):
         super().__init__("QA_LEAD", "Quality Assurance", mission)
+        self.project_root = project_root
         self.equip(PytestTool(project_root))
 
     async def run(self, task: str) -> str:
@@ -14,19 +25,45 @@ class QAAgent(BaseAgent):
         self.log(f"QA initiated for: {task}")
         
         # 1. Run Tests
-        self.thought = "Running full test suite..."
-        self.log(self.thought, "CMD")
-        
+        impact = get_impact_map(self.project_root)
+        selection = await asyncio.to_thread(impact.select)
+        self.log(f"Test selection: {selection.reason}")
         tester = self.tools["run_tests"]
-        output = await tester.execute()
+        runs = 2 if selection.tests and selection.checkpoint else 1
+        timeout = config.agent_timeout * TEST_TIMEOUT_SHARE / runs
+        full_ran = selection.full
+        report = None
+        if selection.full:
+            self.thought = "Running full test suite..."
+            self.log(self.thought, "CMD")
+            report = await tester.run(timeout=timeout)
+        elif selection.tests:
+            self.thought = f"Running {len(selection.tests)} affected test files..."
+            self.log(self.thought, "CMD")
+            report = await tester.run(tests=selection.tests, timeout=timeout)
+        if selection.checkpoint and (report is None or report.ok):
+            self.thought = "Checkpoint: running full test suite..."
+            self.log(self.thought, "CMD")
+            report = await tester.run(timeout=timeout)
+            full_ran = True
         
         # 2. Analyze Results
-        if "failed" in output.lower() or "error" in output.lower():
+        if report is None:
+            impact.record(selection, True, full_ran)
+            self.status = "IDLE"
+            self.log(f"No tests affected by {len(selection.changed)} changed files.", "SUCCESS")
+            return "QA SUCCESS. No tests affected by the changes."
+        attached = json.dumps({"test_report": report.to_dict()})
+        if not report.ok:
+            failing = [f for f in report.by_file() if f is not None]
+            impact.record(selection, False, full_ran, failing or None)
             self.status = "REJECTED"
-            self.log("Tests FAILED.", "ERR")
-            self.log(output[-200:]) # Log last few lines
-            return f"QA FAILURE. Revert or Fix. Output: {output[-100:]}"
+            self.log(f"Tests FAILED: {report.headline()}", "ERR")
+            for failure in report.failures[:5]:
+                self.log(f"{failure.nodeid} - {failure.message[:120]}")
+            return f"QA FAILURE. {report.headline()}\n{attached}"
         else:
+            impact.record(selection, True, full_ran)
             self.status = "IDLE"
-            self.log("Tests PASSED.", "SUCCESS")
-            return "QA SUCCESS. Deployment Approved."
+            self.log(f"Tests PASSED: {report.headline()}", "SUCCESS")
+            return f"QA SUCCESS. Deployment Approved. {report.headline()}\n{attached}"
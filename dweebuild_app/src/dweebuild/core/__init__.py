@@ -1,8 +1,36 @@
 """Core module exports"""
 from .agent import BaseAgent
 from .tool import BaseTool, FunctionalTool
-from .memory import ProjectMemory
+from .memory import ProjectMemory, LogRecord
 from .orchestrator import Orchestrator
-from .llm import LLMClient
+from .cache import ResponseCache
+from .action_parser import parse_action, parse_json, parse_metrics
+from .providers import LLMProvider, GroqProvider, OpenAIProvider, AnthropicProvider, ScriptedProvider
+from .router import LLMRouter
+from .context_budget import ContextBudget, count_tokens
+from .conversation import Conversation
+from .scheduler import Task, TaskScheduler, FileLeases, FairShare
+from .broker import Broker, InProcessBroker, SQLiteBroker, WorkerPool, open_broker
+from .missions import Mission, MissionManager
+from .usage import usage_meter
+from .journal import Journal, open_journal
+from .executor import ExecResult, ShellExecutor, shell_executor
+from .output import OutputBuffer, OutputStream, clip_text
+from .code_index import CodeIndex, get_code_index
+from .impact import ImpactMap, TestSelection, get_impact_map
+from .reports import TestFailure, TestReport
+from .llm import (LLMClient, LLMError, ClientPool, client_pool, get_llm_client,
+                  RateLimiter, rate_limiter)
 
-__all__ = ['BaseAgent', 'BaseTool', 'FunctionalTool', 'ProjectMemory', 'Orchestrator', 'LLMClient']
+__all__ = ['BaseAgent', 'BaseTool', 'FunctionalTool', 'ProjectMemory', 'LogRecord', 'Orchestrator', 'LLMClient',
+           'ClientPool', 'client_pool', 'get_llm_client', 'ResponseCache',
+           'LLMError', 'RateLimiter', 'rate_limiter',
+           'parse_action', 'parse_json', 'parse_metrics',
+           'LLMProvider', 'GroqProvider', 'OpenAIProvider', 'AnthropicProvider', 'ScriptedProvider', 'LLMRouter',
+           'ContextBudget', 'count_tokens', 'Conversation',
+           'Task', 'TaskScheduler', 'FileLeases', 'FairShare',
+           'Broker', 'InProcessBroker', 'SQLiteBroker', 'WorkerPool', 'open_broker',
+           'Mission', 'MissionManager', 'usage_meter', 'Journal', 'open_journal',
+           'ExecResult', 'ShellExecutor', 'shell_executor', 'OutputBuffer', 'OutputStream', 'clip_text',
+           'CodeIndex', 'get_code_index', 'ImpactMap', 'TestSelection', 'get_impact_map',
+           'TestFailure', 'TestReport']
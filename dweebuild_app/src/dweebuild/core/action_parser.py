@@ -0,0 +1,536 @@
+import os
+import re
+import json
+import tempfile
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_SCALAR_END = frozenset(',}] \t\r\n')
+_WHITESPACE = frozenset(' \t\r\n')
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+# A prose reply is only a final answer if it ends like a finished sentence or block.
+_PROSE_ENDINGS = (".", "!", "?", ")", '"', "'", "`", "*")
+_decoder = json.JSONDecoder()
+
+Text = Union[str, bytes, bytearray, memoryview]
+
+
+class ParseMetrics:
+    """Process-wide counters for action parsing outcomes."""
+    OUTCOMES = ("clean", "embedded", "repaired", "truncated", "prose", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {k: 0 for k in self.OUTCOMES}
+        self.multiple_objects = 0
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        total = sum(self.counts.values())
+        return {**self.counts, "multiple_objects": self.multiple_objects, "total": total,
+                "failure_rate": self.counts["failed"] / total if total else 0.0}
+
+
+# Global metrics instance
+parse_metrics = ParseMetrics()
+
+
+class _Frame:
+    """One open JSON container. path is set for containers whose members are tracked."""
+    __slots__ = ("kind", "path", "key", "expect_key")
+
+    def __init__(self, kind: str, path: Optional[Tuple[str, ...]] = None):
+        self.kind = kind
+        self.path = path
+        self.key = None
+        self.expect_key = kind == "{"
+
+
+class IncrementalActionParser:
+    """
+    Incremental parser for agent actions of the form
+    {"thought": ..., "tool": ..., "args": {...}}.
+
+    Chunks of model output are fed as they arrive. Prose or code fences before
+    the first "{" are skipped. Top-level fields and individual args are emitted
+    as soon as their value is complete, so the tool name and small arguments
+    are known long before a large file body finishes streaming.
+
+    Events returned by feed():
+        ("chunk", path, text)   decoded text of a live field or spooled arg
+        ("field", key, value)   a top-level field is complete
+        ("arg", key, value)     one member of "args" is complete
+        ("arg_end", key)        a spooled arg finished streaming
+        ("args", dict)          the whole "args" object is complete
+        ("done", dict)          the root object closed
+    """
+    def __init__(self, live_fields=("thought",), spool_args=("content",)):
+        self.live_fields = set(live_fields)
+        self.spool_args = set(spool_args)
+        self.started = False
+        self.done = False
+        self.args_complete = False
+        self.fields: Dict[str, Any] = {}
+        self.args: Dict[str, Any] = {}
+        self.spooled: List[str] = []
+        self._stack: List[_Frame] = []
+        self._events: List[tuple] = []
+        # String state
+        self._in_string = False
+        self._string_role = None      # "raw" | "key" | "stream"
+        self._escape = None           # None, "" after a backslash, or "uXXXX" in progress
+        self._high_surrogate = None
+        self._key_parts: List[str] = []
+        self._stream_path: Optional[Tuple[str, ...]] = None
+        self._stream_parts: Optional[List[str]] = None
+        # Capture of a complete tracked value (raw JSON text)
+        self._capture: Optional[List[str]] = None
+        self._capture_path: Optional[Tuple[str, ...]] = None
+        self._capture_depth = 0
+        self._capture_scalar = False
+        self._capture_string = False
+
+    # --- public API ---
+
+    def feed(self, chunk: str) -> List[tuple]:
+        """Consume the next piece of model output and return new events."""
+        self._events = []
+        i, n = 0, len(chunk)
+        while i < n and not self.done:
+            if self._in_string:
+                i = self._consume_string(chunk, i, n)
+                continue
+
+            c = chunk[i]
+            if not self.started:
+                if c == "{":
+                    self.started = True
+                    self._stack.append(_Frame("{", ()))
+                i += 1
+                continue
+
+            if self._capture is not None and self._capture_scalar:
+                if c not in _SCALAR_END:
+                    self._capture.append(c)
+                    i += 1
+                    continue
+                self._finish_capture()
+
+            capturing = self._capture is not None
+            if capturing:
+                self._capture.append(c)
+            i += 1
+            if c in _WHITESPACE:
+                continue
+
+            frame = self._stack[-1]
+            if c == '"':
+                self._start_string(frame, capturing)
+            elif c == "{" or c == "[":
+                if not capturing and self._at_tracked_value(frame):
+                    vpath = frame.path + (frame.key,)
+                    if c == "{" and vpath == ("args",):
+                        self._stack.append(_Frame("{", ("args",)))
+                        continue
+                    self._begin_capture(vpath, c)
+                self._stack.append(_Frame(c))
+            elif c == "}" or c == "]":
+                closed = self._stack.pop()
+                if self._capture is not None and len(self._stack) == self._capture_depth:
+                    self._finish_capture()
+                elif closed.path == ("args",):
+                    self.args_complete = True
+                    self._events.append(("args", dict(self.args)))
+                elif closed.path == ():
+                    self.done = True
+                    self._events.append(("done", self.result()))
+            elif c == ":":
+                frame.expect_key = False
+            elif c == ",":
+                if frame.kind == "{":
+                    frame.expect_key = True
+            elif not capturing and self._at_tracked_value(frame):
+                self._begin_capture(frame.path + (frame.key,), c)
+                self._capture_scalar = True
+        return self._events
+
+    def result(self) -> Dict[str, Any]:
+        """The action parsed so far (complete once done is True)."""
+        action = dict(self.fields)
+        if self.args or self.args_complete or self.spooled:
+            action["args"] = dict(self.args)
+        return action
+
+    @property
+    def action_ready(self) -> bool:
+        """True once the tool name and all of its arguments are known."""
+        return self.done or (self.args_complete and "tool" in self.fields)
+
+    # --- internals ---
+
+    @staticmethod
+    def _at_tracked_value(frame: _Frame) -> bool:
+        return frame.path is not None and frame.kind == "{" and not frame.expect_key
+
+    def _begin_capture(self, path, first: str):
+        self._capture = [first]
+        self._capture_path = path
+        self._capture_depth = len(self._stack)
+        self._capture_scalar = False
+        self._capture_string = False
+
+    def _finish_capture(self):
+        raw = "".join(self._capture)
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        self._emit_value(self._capture_path, value)
+        self._capture = None
+        self._capture_scalar = False
+        self._capture_string = False
+
+    def _emit_value(self, path, value):
+        if len(path) == 1:
+            self.fields[path[0]] = value
+            self._events.append(("field", path[0], value))
+        else:
+            self.args[path[1]] = value
+            self._events.append(("arg", path[1], value))
+
+    def _start_string(self, frame: _Frame, capturing: bool):
+        self._in_string = True
+        self._escape = None
+        if capturing:
+            self._string_role = "raw"
+        elif frame.kind == "{" and frame.expect_key:
+            self._string_role = "key"
+            self._key_parts = []
+        else:
+            vpath = frame.path + (frame.key,)
+            if (len(vpath) == 1 and vpath[0] in self.live_fields) or \
+                    (len(vpath) == 2 and vpath[1] in self.spool_args):
+                self._string_role = "stream"
+                self._stream_path = vpath
+                self._stream_parts = [] if len(vpath) == 1 else None
+                self._high_surrogate = None
+            else:
+                self._string_role = "raw"
+                self._begin_capture(vpath, '"')
+                self._capture_string = True
+
+    def _consume_string(self, chunk: str, i: int, n: int) -> int:
+        if self._string_role == "stream":
+            return self._consume_stream(chunk, i, n)
+
+        out = self._capture if self._string_role == "raw" else self._key_parts
+        if self._escape is not None:
+            out.append(chunk[i])
+            self._escape = None
+            return i + 1
+        m = _STRING_SPECIAL.search(chunk, i)
+        if m is None:
+            out.append(chunk[i:])
+            return n
+        j = m.start()
+        if j > i:
+            out.append(chunk[i:j])
+        if chunk[j] == "\\":
+            out.append("\\")
+            self._escape = ""
+            return j + 1
+
+        self._in_string = False
+        if self._string_role == "key":
+            frame = self._stack[-1]
+            try:
+                frame.key = json.loads('"' + "".join(self._key_parts) + '"')
+            except ValueError:
+                frame.key = "".join(self._key_parts)
+        else:
+            out.append('"')
+            if self._capture_string and len(self._stack) == self._capture_depth:
+                self._finish_capture()
+        return j + 1
+
+    def _emit_text(self, text: str):
+        if not text:
+            return
+        if self._high_surrogate is not None:
+            text = "\ufffd" + text
+            self._high_surrogate = None
+        if self._stream_parts is not None:
+            self._stream_parts.append(text)
+        self._events.append(("chunk", self._stream_path, text))
+
+    def _consume_stream(self, chunk: str, i: int, n: int) -> int:
+        if self._escape is not None:
+            return self._consume_escape(chunk, i, n)
+        m = _STRING_SPECIAL.search(chunk, i)
+        if m is None:
+            self._emit_text(chunk[i:])
+            return n
+        j = m.start()
+        self._emit_text(chunk[i:j])
+        if chunk[j] == "\\":
+            self._escape = ""
+            return j + 1
+
+        # Closing quote of a streamed value
+        if self._high_surrogate is not None:
+            self._emit_text("\ufffd")
+            self._high_surrogate = None
+        self._in_string = False
+        path = self._stream_path
+        if len(path) == 1:
+            value = "".join(self._stream_parts)
+            self.fields[path[0]] = value
+            self._events.append(("field", path[0], value))
+        else:
+            self.args[path[1]] = None
+            self.spooled.append(path[1])
+            self._events.append(("arg_end", path[1]))
+        self._stream_path = None
+        self._stream_parts = None
+        return j + 1
+
+    def _consume_escape(self, chunk: str, i: int, n: int) -> int:
+        if self._escape == "":
+            e = chunk[i]
+            if e != "u":
+                self._escape = None
+                self._emit_text(_ESCAPES.get(e, e))
+                return i + 1
+            self._escape = "u"
+            i += 1
+        take = min(5 - len(self._escape), n - i)
+        self._escape += chunk[i:i + take]
+        i += take
+        if len(self._escape) < 5:
+            return i
+
+        try:
+            cp = int(self._escape[1:], 16)
+        except ValueError:
+            cp = 0xFFFD
+        self._escape = None
+        if 0xD800 <= cp < 0xDC00:
+            if self._high_surrogate is not None:
+                self._emit_text("\ufffd")
+            self._high_surrogate = cp
+        elif 0xDC00 <= cp < 0xE000 and self._high_surrogate is not None:
+            combined = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (cp - 0xDC00)
+            self._high_surrogate = None
+            self._emit_text(chr(combined))
+        else:
+            self._emit_text(chr(cp) if not 0xD800 <= cp < 0xE000 else "\ufffd")
+        return i
+
+
+def _as_text(data: Text) -> str:
+    # Decode byte buffers once; every later step works on offsets into this string.
+    if isinstance(data, str):
+        return data
+    return str(data, "utf-8", "replace")
+
+
+def iter_json_objects(text: Text, start: int = 0) -> Iterator[Tuple[int, int, Any]]:
+    """
+    Yield (start, end, value) for each top-level JSON object embedded in text.
+    Prose, code fences and stray braces between objects are skipped. Decoding
+    works on offsets (JSONDecoder.raw_decode) rather than slicing copies.
+    """
+    text = _as_text(text)
+    pos = text.find("{", start)
+    while pos != -1:
+        try:
+            value, end = _decoder.raw_decode(text, pos)
+        except ValueError:
+            pos = text.find("{", pos + 1)
+            continue
+        yield pos, end, value
+        pos = text.find("{", end)
+
+
+def parse_json(text: Text, default: Any = None) -> Any:
+    """First JSON object embedded in text, or default."""
+    for _, _, value in iter_json_objects(text):
+        return value
+    return default
+
+
+def _is_action(value: Any) -> bool:
+    return isinstance(value, dict) and ("tool" in value or "actions" in value)
+
+
+def parse_action(text: Text, metrics: ParseMetrics = None) -> Optional[Dict[str, Any]]:
+    """
+    Tolerant extraction of an agent action from a raw model reply.
+
+    Handles bare JSON, fenced blocks, leading or trailing prose, several
+    objects (the first action-shaped one wins), trailing commas and output
+    truncated after the arguments were complete. A reply with no JSON at all
+    is a prose final answer only if the model clearly ended its turn (it
+    stops at the end of a sentence or block); an empty, cut-off or garbled
+    one is not. Returns None when no action can be recovered; the outcome is
+    recorded in metrics either way.
+    """
+    metrics = metrics or parse_metrics
+    text = _as_text(text)
+    stripped = text.strip()
+
+    if stripped.startswith("{") and stripped.endswith("}"):
+        try:
+            value = json.loads(stripped)
+        except ValueError:
+            pass
+        else:
+            if isinstance(value, dict):
+                metrics.record("clean")
+                return value
+
+    objects = [value for _, _, value in iter_json_objects(text) if isinstance(value, dict)]
+    actions = [value for value in objects if _is_action(value)]
+    if len(objects) > 1:
+        metrics.multiple_objects += 1
+    if actions:
+        metrics.record("embedded")
+        return actions[0]
+
+    first = text.find("{")
+    if first == -1:
+        if not stripped.endswith(_PROSE_ENDINGS) or stripped.startswith("LLM ERROR"):
+            metrics.record("failed")
+            return None
+        metrics.record("prose")
+        return {"thought": stripped, "tool": "FINAL_ANSWER", "args": {"result": stripped}}
+
+    # Trailing commas are the most common syntax slip; retry without them.
+    repaired = _TRAILING_COMMA.sub(r"\1", text[first:])
+    for _, _, value in iter_json_objects(repaired):
+        if _is_action(value):
+            metrics.record("repaired")
+            return value
+
+    # Truncated reply: keep it if the tool and its arguments made it through.
+    parser = IncrementalActionParser(live_fields=(), spool_args=())
+    parser.feed(text[first:])
+    if parser.action_ready or parser.fields.get("tool") == "FINAL_ANSWER":
+        metrics.record("truncated")
+        return parser.result()
+
+    if objects:
+        metrics.record("embedded")
+        return objects[0]
+
+    metrics.record("failed")
+    return None
+
+
+class Spool:
+    """
+    An argument body that stream_action wrote to a temporary file. It only
+    ever comes from the parser, never from the model's JSON, so a tool can
+    trust its path; consuming tools move or delete the file, discard_spools()
+    removes the ones a skipped call left behind.
+    """
+    __slots__ = ("path",)
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> str:
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    def __repr__(self) -> str:
+        try:
+            return f"<spooled {os.path.getsize(self.path)} bytes>"
+        except OSError:
+            return "<spooled>"
+
+
+def discard_spools(args: Any):
+    """Delete the spool files of a call's args (a no-op once a tool moved them)."""
+    if isinstance(args, dict):
+        for value in args.values():
+            if isinstance(value, Spool):
+                _discard(value.path)
+
+
+async def stream_action(chunks: AsyncIterator[str], on_event: Callable[[tuple], None] = None,
+                        spool_dir: str = None, spool_tools=("file_write",)) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Drive an IncrementalActionParser from a token stream.
+
+    Spooled args (file bodies) are written to temporary files as they arrive
+    and handed to spool_tools as a Spool instead of an in-memory string.
+    Consumption stops as soon as the action is complete.
+
+    Returns (action or None if no complete action was found, raw text); callers
+    fall back to parse_action() on the raw text.
+    """
+    parser = IncrementalActionParser()
+    raw: List[str] = []
+    spools: Dict[str, Any] = {}
+    try:
+        async for text in chunks:
+            raw.append(text)
+            for event in parser.feed(text):
+                if event[0] == "chunk" and len(event[1]) == 2:
+                    key = event[1][1]
+                    if key not in spools:
+                        spools[key] = tempfile.NamedTemporaryFile(
+                            "w", encoding="utf-8", suffix=".spool", delete=False, dir=spool_dir)
+                    spools[key].write(event[2])
+                elif event[0] == "arg_end":
+                    if event[1] not in spools:
+                        spools[event[1]] = tempfile.NamedTemporaryFile(
+                            "w", encoding="utf-8", suffix=".spool", delete=False, dir=spool_dir)
+                    spools[event[1]].close()
+                if on_event:
+                    on_event(event)
+            if parser.action_ready:
+                break
+    except BaseException:
+        for f in spools.values():
+            f.close()
+            _discard(f.name)
+        raise
+    finally:
+        for f in spools.values():
+            f.close()
+        close = getattr(chunks, "aclose", None)
+        if close is not None:
+            await close()
+
+    if not parser.action_ready:
+        for f in spools.values():
+            _discard(f.name)
+        return None, "".join(raw)
+
+    parse_metrics.record("clean")
+
+    action = parser.result()
+    args = action.setdefault("args", {})
+    for key in parser.spooled:
+        path = spools[key].name
+        if action.get("tool") in spool_tools:
+            args[key] = Spool(path)
+        else:
+            with open(path, encoding="utf-8") as f:
+                args[key] = f.read()
+            _discard(path)
+    return action, "".join(raw)
+
+
+def _discard(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -1,9 +1,41 @@
 import asyncio
+import contextlib
+import copy
+import json
+import os
+import time
 from typing import List, Dict, Any, Optional
 from collections import deque
 from datetime import datetime
 import abc
 
+from .config import config
+from .llm import LLMError
+from .action_parser import discard_spools, stream_action, parse_action
+from .context_budget import ContextBudget, count_tokens, relevance
+from .conversation import Conversation
+from .output import clip_text
+from .usage import current_mission, record_usage
+
+def apply_step(checkpoint: Optional[Dict[str, Any]], step: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Checkpoint after a journaled "step" event. A full step carries the whole
+    conversation; a delta step carries the turns from `turns_from` on and is
+    applied to the previous checkpoint of the same task (None when there is
+    no such checkpoint to extend). Applying the same step twice is harmless.
+    """
+    if "conversation" in step:
+        return step
+    turns_from = step["turns_from"]
+    if (not checkpoint or checkpoint.get("task_id") != step.get("task_id")
+            or len(checkpoint["conversation"]["turns"]) < turns_from):
+        return None
+    conversation = {**checkpoint["conversation"], "stats": step["stats"],
+                    "turns": checkpoint["conversation"]["turns"][:turns_from] + step["turns"]}
+    return {"task_id": step["task_id"], "agent": step["agent"], "attempt": step["attempt"],
+            "conversation": conversation}
+
+
 class AgentAttribute:
     """Helper to store agent state attributes."""
     def __init__(self, value=None):
@@ -13,17 +45,55 @@ class BaseAgent(abc.ABC):
     """
     Abstract Base Class for Dweebuild Agents.
     """
+    # Tools that only observe the workspace. Any other tool may change what
+    # later calls see, so it clears the repeat cache and runs on its own.
+    READ_ONLY_TOOLS = ("file_read", "grep", "list_dir", "lint", "complexity", "run_tests", "web_search")
+
+    def __new__(cls, *args, **kwargs):
+        self = super().__new__(cls)
+        self._init_args = (args, kwargs)  # Lets a worker process rebuild the agent
+        return self
+
     def __init__(self, name: str, role: str, mission: str):
-        from .llm import LLMClient
+        from .llm import get_llm_client
         self.name = name
+        self.kind = name  # Routing key shared by every member of a worker pool
         self.role = role
         self.mission = mission
         self.status = "IDLE"
         self.thought = "Standby"
+        self.progress = ""  # Live streaming progress for the dashboard
+        self.last_prompt_report: Dict[str, int] = {}
+        self.conversation = Conversation()
         self.logs = deque(maxlen=100)
         self.tools = {}
         self.memory = None # Assigned by Orchestrator
-        self.llm = LLMClient()  # Every agent gets an LLM client
+        self.leases = None # FileLeases, assigned by Orchestrator
+        self.current_task_id: Optional[str] = None  # Lease owner while running a scheduled task
+        self.tool_slots = None  # FairShare across missions, assigned by Orchestrator
+        self.checkpoint: Optional[Dict[str, Any]] = None   # Last completed ReAct step of the current task
+        self.resume_from: Optional[Dict[str, Any]] = None  # Checkpoint to warm-resume on the next run
+        self._journaled: Optional[tuple] = None  # What the last journaled step covered (see _save_checkpoint)
+        self.llm = get_llm_client()  # Shared, pooled LLM client
+
+    def clone(self, name: str) -> "BaseAgent":
+        """
+        Another worker of the same kind. The tool registry, memory, LLM client
+        and leases are shared; status, logs and conversation are its own.
+        """
+        twin = copy.copy(self)
+        twin.name = name
+        twin.status = "IDLE"
+        twin.thought = "Standby"
+        twin.progress = ""
+        twin.last_prompt_report = {}
+        twin.logs = deque(maxlen=self.logs.maxlen)
+        twin.conversation = Conversation()
+        twin.current_task_id = None
+        twin.checkpoint = None
+        twin.resume_from = None
+        twin._journaled = None
+        return twin
 
     def equip(self, tool):
         """Register a tool for the agent to use."""
@@ -44,44 +114,198 @@ class BaseAgent(abc.ABC):
         self.status = "WORKING"
         self.mission_context = task
         self.log(f"Starting ReAct Loop for: {task}", "INFO")
+        self.conversation = Conversation(
+            max_tokens=config.agent_history_tokens,
+            observation_tokens=config.agent_observation_tokens,
+        )
+        # Identical calls since the last state change return the same result,
+        # so they are answered from here instead of being executed again.
+        seen_calls: Dict[str, str] = {}
+        # Created per run so it binds to the loop that is running this task.
+        semaphore = asyncio.Semaphore(config.agent_tool_concurrency)
 
         attempts = 0
         max_attempts = 5
+        self.checkpoint = None
+        self._journaled = None
+        if self.resume_from:
+            # Warm resume after a restart: continue from the last completed step.
+            self.conversation = Conversation.from_state(self.resume_from["conversation"])
+            attempts = min(self.resume_from.get("attempt", 0), max_attempts - 1)
+            self.conversation.add_note("(The session was restarted. Continue from where you left off.)")
+            self.log(f"Resuming at step {attempts + 1}", "INFO")
+            self.resume_from = None
 
         while attempts < max_attempts:
             attempts += 1
             
-            # 1. PERCEPTION: Gather Context
-            context = self._gather_context()
-            
-            # 2. REASONING: Decide next step
-            plan = await self._plan_next_step(task, context)
+            # 1. REASONING: the first turn builds the stable prompt prefix from
+            # gathered context; later turns only append to the history.
+            # LLMClient already retried transient failures; an LLMError here
+            # means the provider is unavailable, so stop instead of burning
+            # the remaining attempts on error strings.
+            try:
+                if self.conversation.started:
+                    if self.conversation.needs_compaction():
+                        await self.conversation.compact(self.llm)
+                    plan = await self._request_plan()
+                else:
+                    plan = await self._plan_next_step(task, self._gather_context())
+            except LLMError as e:
+                self.log(f"LLM unavailable: {e}", "ERR")
+                self.status = "ERROR"
+                return f"LLM ERROR: {e}"
             self.thought = plan.get("thought", "Thinking...")
             self.log(f"Thought: {self.thought}", "INFO")
             
             tool_name = plan.get("tool")
             tool_args = plan.get("args", {})
             
-            # 3. ACTION
+            # 2. ACTION
             if tool_name == "FINAL_ANSWER":
                 self.status = "IDLE"
-                return plan.get("result", "Task Completed")
+                self.log(f"History: {self.conversation.summary_stats()}", "DEBUG")
+                return plan.get("result") or tool_args.get("result", "Task Completed")
+
+            if tool_name == "PARSE_ERROR":
+                self.log("Unparseable action, asking again.", "WARN")
+                if self.conversation.started:
+                    self.conversation.add_note(
+                        "Your last reply was not a valid JSON action. Reply with exactly one JSON object.")
+                continue
             
-            if tool_name in self.tools:
-                try:
-                    self.log(f"Action: {tool_name} {tool_args}", "CMD")
-                    result = await self.tools[tool_name].execute(**tool_args)
-                    self.log(f"Observation: {str(result)[:100]}...", "SUCCESS")
-                    # Store observation for next turn
-                    self.memory.add_log(self.name, f"Tool Output: {result}", "DEBUG")
-                except Exception as e:
-                    self.log(f"Action Failed: {e}", "ERR")
-            else:
-                self.log(f"Unknown Tool: {tool_name}", "WARN")
+            # 3. OBSERVATION: fed back to the model on the next turn. A batch
+            # ({"actions": [...]}) runs concurrently and reports all results.
+            self.conversation.add_action(plan)
+            calls = self._calls_from_plan(plan)
+            if any(call["tool"] == "FINAL_ANSWER" for call in calls) and len(calls) > 1:
+                for call in calls:
+                    if call["tool"] == "FINAL_ANSWER":
+                        discard_spools(call["args"])
+                calls = [call for call in calls if call["tool"] != "FINAL_ANSWER"]
+                self.conversation.add_note("FINAL_ANSWER must be sent on its own, after reviewing these results.")
+            await self._execute_calls(calls, seen_calls, semaphore)
+            self._save_checkpoint(attempts)
                 
         self.status = "ERROR"
         return "Max attempts reached without resolution."
 
+    def _save_checkpoint(self, attempt: int):
+        """
+        Record the conversation after a completed step so a restarted session
+        can resume here. The journal gets the whole conversation only after it
+        was started, resumed or compacted; other steps journal just the turns
+        they added (see apply_step), so a long task's journal grows linearly.
+        """
+        conversation = self.conversation
+        self.checkpoint = {"task_id": self.current_task_id, "agent": self.name, "attempt": attempt,
+                           "conversation": conversation.to_state()}
+        if self.memory is None or not self.current_task_id:
+            return
+        turns = conversation.turns
+        mark = self._journaled
+        # Between compactions turns only grow, and a note may replace the last one.
+        if mark is not None and mark[0] is turns and len(turns) >= mark[1]:
+            done, last = mark[1], mark[2]
+            start = done if not done or turns[done - 1] is last else done - 1
+            self.memory.record("step", task_id=self.current_task_id, agent=self.name, attempt=attempt,
+                               turns_from=start, turns=turns[start:], stats=conversation.stats)
+        else:
+            self.memory.record("step", **self.checkpoint)
+        self._journaled = (turns, len(turns), turns[-1] if turns else None)
+
+    @staticmethod
+    def _calls_from_plan(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        actions = plan.get("actions")
+        if isinstance(actions, list):
+            return [{"tool": a.get("tool"), "args": a.get("args") or {}}
+                    for a in actions if isinstance(a, dict)]
+        return [{"tool": plan.get("tool"), "args": plan.get("args") or {}}]
+
+    async def _execute_calls(self, calls: List[Dict[str, Any]], seen_calls: Dict[str, str],
+                             semaphore: asyncio.Semaphore):
+        """
+        Run a step's tool calls and append their observations in call order.
+        Read-only calls run concurrently (bounded by semaphore); any other
+        call waits for the ones before it and the ones after it wait for it.
+        """
+        numbered = len(calls) > 1
+        group: List[tuple] = []
+
+        async def flush():
+            outcomes = await asyncio.gather(*(self._execute_call(call, seen_calls, semaphore)
+                                              for _, call in group))
+            for (index, call), (text, error) in zip(group, outcomes):
+                label = f"{call['tool']} #{index + 1}" if numbered else str(call["tool"])
+                if error is None:
+                    self.conversation.add_note(text)
+                else:
+                    self.conversation.add_observation(label, text, error=error)
+            group.clear()
+
+        for index, call in enumerate(calls):
+            if call["tool"] not in self.READ_ONLY_TOOLS:
+                await flush()
+                group.append((index, call))
+                await flush()
+            else:
+                group.append((index, call))
+        await flush()
+
+    async def _execute_call(self, call: Dict[str, Any], seen_calls: Dict[str, str],
+                            semaphore: asyncio.Semaphore) -> tuple:
+        """Returns (text, error): error is None when text is a note rather than a tool result."""
+        try:
+            return await self._run_call(call, seen_calls, semaphore)
+        finally:
+            discard_spools(call["args"])  # Whatever a skipped or failed call did not consume
+
+    async def _run_call(self, call: Dict[str, Any], seen_calls: Dict[str, str],
+                        semaphore: asyncio.Semaphore) -> tuple:
+        tool_name, tool_args = call["tool"], call["args"]
+        if tool_name not in self.tools:
+            self.log(f"Unknown Tool: {tool_name}", "WARN")
+            return (f"Unknown tool {tool_name!r}. Available: {', '.join(self.tools) or 'none'}, "
+                    f"FINAL_ANSWER."), None
+
+        call_key = json.dumps([tool_name, tool_args], sort_keys=True, default=str)
+        if call_key in seen_calls:
+            self.conversation.stats["repeats"] += 1
+            self.log(f"Repeated call skipped: {tool_name}", "WARN")
+            return (f"You already ran {tool_name} with these arguments and nothing has changed since. "
+                    f"Result was:\n{seen_calls[call_key][:500]}\nChoose a different action or FINAL_ANSWER."), None
+
+        filepath = tool_args.get("filepath") if tool_name not in self.READ_ONLY_TOOLS else None
+        owner = self.current_task_id or self.name
+        if filepath and self.leases is not None and not self.leases.acquire(filepath, owner):
+            holder = self.leases.holder(filepath)
+            self.log(f"{filepath} is leased by {holder}", "WARN")
+            return (f"{filepath} is being edited by {holder}. Work on other files and "
+                    f"leave this one to them."), None
+
+        if tool_name not in self.READ_ONLY_TOOLS:
+            seen_calls.clear()  # Even a failed call may have changed something
+
+        shared = (self.tool_slots.slot(current_mission.get() or self.name) if self.tool_slots is not None
+                  else contextlib.nullcontext())
+        async with semaphore, shared:
+            started = time.monotonic()
+            try:
+                self.log(f"Action: {tool_name} {tool_args}", "CMD")
+                result = await self.tools[tool_name].execute(**tool_args)
+            except Exception as e:
+                self.log(f"Action Failed: {e}", "ERR")
+                return e, True
+            finally:
+                record_usage(tool_calls=1, tool_seconds=time.monotonic() - started)
+        text = str(result)
+        self.log(f"Observation: {text[:100]}...", "SUCCESS")
+        if self.memory:
+            self.memory.add_log(self.name, f"Tool Output: {clip_text(text, config.tool_output_log_chars)}", "DEBUG")
+        if tool_name in self.READ_ONLY_TOOLS:
+            seen_calls[call_key] = text[:500]
+        return result, False
+
     async def _plan_next_step(self, task: str, context: str) -> Dict[str, Any]:
         """
         Uses LLM to decide the next action based on history.
@@ -91,6 +315,95 @@ class BaseAgent(abc.ABC):
         # For Dweebuild v31 specific agents, we override this or use a specific prompt.
         return {"tool": "FINAL_ANSWER", "result": "Default BaseAgent has no brain."}
 
+    def _build_user_prompt(self, system_prompt: str, task: str, context: str,
+                           extra: Optional[Dict[str, str]] = None) -> str:
+        """
+        Assemble the user prompt within CONTEXT_BUDGET_TOKENS. Mission and task
+        are always kept; extra sections and context are ranked by relevance
+        to the task and truncated to fit. Per-section usage is kept in
+        last_prompt_report.
+        """
+        budget = ContextBudget(max(config.context_budget_tokens - count_tokens(system_prompt), 256))
+        budget.add("mission", self.mission, pinned=True)
+        budget.add("current task", task, pinned=True)
+        for section, text in (extra or {}).items():
+            budget.add(section, text, relevance=max(relevance(task, text), 0.5))
+        if context:
+            budget.add("context", context, relevance=relevance(task, context))
+        prompt = budget.render()
+        self.last_prompt_report = budget.report()
+        self.log(f"Prompt budget: {self.last_prompt_report}", "DEBUG")
+        return prompt
+
+    async def _request_plan(self, system_prompt: Optional[str] = None,
+                            user_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ask the LLM for the next action. The prompts start this task's
+        conversation; on later turns they are omitted and the accumulated
+        history is sent instead. Streams by default so the tool and its
+        arguments are available as soon as they are complete.
+        """
+        if not self.conversation.started:
+            self.conversation.start(system_prompt, user_prompt)
+        messages = self.conversation.messages()
+        if config.llm_streaming:
+            self.progress = ""
+            live_thought = []
+            state = {"tool": "?", "chars": 0}
+
+            def on_event(event):
+                if event[0] == "chunk":
+                    if event[1] == ("thought",):
+                        live_thought.append(event[2])
+                        self.thought = "".join(live_thought)[-200:]
+                    else:
+                        state["chars"] += len(event[2])
+                        self.progress = f"{state['tool']}: {event[1][-1]} {state['chars'] / 1024:.1f} KB"
+                elif event[0] == "field" and event[1] == "tool":
+                    state["tool"] = event[2]
+                    self.progress = f"{event[2]} ..."
+                elif event[0] == "arg":
+                    self.progress = f"{state['tool']}: {event[1]} ready"
+
+            try:
+                plan, raw = await stream_action(
+                    self.llm.stream(messages, tier=config.llm_plan_tier), on_event=on_event)
+            finally:
+                self.progress = ""
+            if plan is not None:
+                return plan
+            result = raw
+        else:
+            result = await self.llm.complete(messages, tier=config.llm_plan_tier)
+
+        plan = parse_action(result)
+        if plan is None:
+            return {"thought": "Could not parse the model's action.", "tool": "PARSE_ERROR"}
+        return plan
+
     def _gather_context(self) -> str:
-        """Collects relevant state from memory."""
-        return "Context gathering not implemented in Base."
+        """Collects relevant state: project files, shared context and team activity."""
+        parts = []
+        working_dir = getattr(self, "working_dir", None)
+        if working_dir and os.path.isdir(working_dir):
+            files = []
+            for root, dirs, names in os.walk(working_dir):
+                dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "__pycache__")
+                for name in sorted(names):
+                    if not name.startswith("."):
+                        files.append(os.path.relpath(os.path.join(root, name), working_dir))
+                if len(files) >= 200:
+                    break
+            parts.append("PROJECT FILES:\n" + ("\n".join(files[:200]) or "(empty)"))
+
+        if self.memory is not None:
+            if self.memory.kv_store:
+                shared = "\n".join(f"- {k}: {v}" for k, v in self.memory.kv_store.items())
+                parts.append(f"SHARED CONTEXT:\n{shared}")
+            activity = [entry for entry in self.memory.get_logs(200)
+                        if entry["source"] != self.name and entry["level"] != "DEBUG"][-15:]
+            if activity:
+                parts.append("RECENT TEAM ACTIVITY:\n" + "\n".join(
+                    f"[{e['source']}] {e['message']}" for e in activity))
+
+        return "\n\n".join(parts) or "No context yet."
@@ -0,0 +1,404 @@
+import abc
+import asyncio
+import importlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from .memory import ProjectMemory
+from .usage import current_mission, usage_meter
+
+POLL_INTERVAL = 0.05
+SHUTDOWN = "__shutdown__"
+
+
+class Broker(abc.ABC):
+    """
+    Work queue between an Orchestrator (coordinator) and worker processes.
+
+    Jobs flow coordinator -> workers; messages (logs, memory updates, agent
+    status, results) flow back, tagged with the submitting coordinator so
+    several orchestrators can share one broker. All methods are synchronous
+    and safe to call from any thread; poll them from async code.
+    """
+    url: str = ""
+
+    @abc.abstractmethod
+    def submit(self, job: Dict[str, Any]) -> str:
+        """Queue a job (must carry "coordinator"); returns its id."""
+
+    @abc.abstractmethod
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Take the oldest queued job, or None."""
+
+    @abc.abstractmethod
+    def publish(self, coordinator: str, job_id: str, kind: str, payload: Any):
+        """Send a message back to a coordinator."""
+
+    @abc.abstractmethod
+    def fetch(self, coordinator: str, cursor: int = 0, limit: int = 500) -> Tuple[List[Dict[str, Any]], int]:
+        """Messages for coordinator after cursor, and the new cursor."""
+
+    def finish(self, job_id: str):
+        """Mark a claimed job as handled so it is never re-delivered."""
+
+    @abc.abstractmethod
+    def cancel(self, job_id: str):
+        pass
+
+    @abc.abstractmethod
+    def is_cancelled(self, job_id: str) -> bool:
+        pass
+
+    def close(self):
+        pass
+
+
+class InProcessBroker(Broker):
+    """Thread-safe in-memory broker; workers run as threads (tests, single process)."""
+    url = "memory://"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: deque = deque()
+        self._cancelled: set = set()
+        self._messages: Dict[str, List[Dict[str, Any]]] = {}
+        self._seq = 0
+
+    def submit(self, job):
+        job = dict(job, id=job.get("id") or uuid.uuid4().hex)
+        with self._lock:
+            self._jobs.append(job)
+        return job["id"]
+
+    def claim(self, worker_id):
+        with self._lock:
+            while self._jobs:
+                job = self._jobs.popleft()
+                if job["id"] not in self._cancelled:
+                    return job
+        return None
+
+    def publish(self, coordinator, job_id, kind, payload):
+        with self._lock:
+            self._seq += 1
+            self._messages.setdefault(coordinator, []).append(
+                {"seq": self._seq, "job_id": job_id, "kind": kind, "payload": payload})
+
+    def fetch(self, coordinator, cursor=0, limit=500):
+        with self._lock:
+            inbox = self._messages.get(coordinator, [])
+            # Messages are only read by their coordinator; drop what it has seen.
+            while inbox and inbox[0]["seq"] <= cursor:
+                inbox.pop(0)
+            batch = inbox[:limit]
+        return batch, (batch[-1]["seq"] if batch else cursor)
+
+    def cancel(self, job_id):
+        with self._lock:
+            self._cancelled.add(job_id)
+
+    def is_cancelled(self, job_id):
+        return job_id in self._cancelled
+
+
+class SQLiteBroker(Broker):
+    """
+    Broker backed by a SQLite file in WAL mode, shared by every process that
+    opens the same path. Claims are a single UPDATE inside an IMMEDIATE
+    transaction, so two workers never take the same job; jobs claimed by a
+    worker that died are re-queued after `visibility_timeout` seconds.
+    """
+    def __init__(self, path: str = ".dweebuild_cache/broker.sqlite3", visibility_timeout: float = 900.0):
+        self.path = path
+        self.url = f"sqlite:///{path}"
+        self.visibility_timeout = visibility_timeout
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, coordinator TEXT, payload TEXT, status TEXT,
+                worker TEXT, created REAL, claimed REAL);
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, coordinator TEXT, job_id TEXT,
+                kind TEXT, payload TEXT, created REAL);
+            CREATE INDEX IF NOT EXISTS messages_inbox ON messages (coordinator, seq);
+        """)
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def submit(self, job):
+        job = dict(job, id=job.get("id") or uuid.uuid4().hex)
+        self._execute("INSERT INTO jobs VALUES (?, ?, ?, 'queued', NULL, ?, NULL)",
+                      (job["id"], job.get("coordinator", ""), json.dumps(job), time.time()))
+        return job["id"]
+
+    def claim(self, worker_id):
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM jobs WHERE status = 'cancelled' AND worker IS NULL")
+                conn.execute("UPDATE jobs SET status = 'queued', worker = NULL "
+                             "WHERE status = 'claimed' AND claimed < ?", (now - self.visibility_timeout,))
+                row = conn.execute("SELECT id, payload FROM jobs WHERE status = 'queued' "
+                                   "ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    conn.execute("UPDATE jobs SET status = 'claimed', worker = ?, claimed = ? WHERE id = ?",
+                                 (worker_id, now, row[0]))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return json.loads(row[1]) if row is not None else None
+
+    def publish(self, coordinator, job_id, kind, payload):
+        self._execute("INSERT INTO messages (coordinator, job_id, kind, payload, created) VALUES (?, ?, ?, ?, ?)",
+                      (coordinator, job_id, kind, json.dumps(payload, default=str), time.time()))
+        if kind == "result":
+            self.finish(job_id)
+
+    def finish(self, job_id):
+        self._execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def fetch(self, coordinator, cursor=0, limit=500):
+        rows = self._execute("SELECT seq, job_id, kind, payload FROM messages "
+                             "WHERE coordinator = ? AND seq > ? ORDER BY seq LIMIT ?",
+                             (coordinator, cursor, limit))
+        if not rows:
+            return [], cursor
+        self._execute("DELETE FROM messages WHERE coordinator = ? AND seq <= ?", (coordinator, rows[-1][0]))
+        return ([{"seq": r[0], "job_id": r[1], "kind": r[2], "payload": json.loads(r[3])} for r in rows],
+                rows[-1][0])
+
+    def cancel(self, job_id):
+        self._execute("UPDATE jobs SET status = 'cancelled' WHERE id = ?", (job_id,))
+
+    def is_cancelled(self, job_id):
+        rows = self._execute("SELECT status FROM jobs WHERE id = ?", (job_id,))
+        return bool(rows) and rows[0][0] == "cancelled"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_memory_brokers: Dict[str, InProcessBroker] = {}
+
+
+def open_broker(url: str) -> Broker:
+    """memory://[name] or sqlite:///path/to/file."""
+    if url.startswith("memory://"):
+        return _memory_brokers.setdefault(url, InProcessBroker())
+    if url.startswith("sqlite:///"):
+        return SQLiteBroker(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported broker URL: {url}")
+
+
+# --- Agent shipping ---------------------------------------------------------
+
+def _class_path(obj) -> str:
+    return f"{type(obj).__module__}.{type(obj).__qualname__}"
+
+
+def _load_class(path: str):
+    module, _, name = path.rpartition(".")
+    return getattr(importlib.import_module(module), name)
+
+
+def is_jsonable(value) -> bool:
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def agent_spec(agent) -> Dict[str, Any]:
+    """
+    Recipe a worker uses to rebuild an agent: its class and constructor
+    arguments, plus every equipped tool that can be rebuilt the same way.
+    """
+    args, kwargs = getattr(agent, "_init_args", ((), {}))
+    if not is_jsonable([args, kwargs]):
+        raise ValueError(f"{agent.name}: constructor arguments are not serializable")
+    tools = []
+    for tool in agent.tools.values():
+        t_args, t_kwargs = getattr(tool, "_init_args", ((), {}))
+        if is_jsonable([t_args, t_kwargs]):
+            tools.append({"class": _class_path(tool), "args": list(t_args), "kwargs": t_kwargs})
+    return {"class": _class_path(agent), "args": list(args), "kwargs": kwargs, "tools": tools,
+            "name": agent.name, "kind": agent.kind, "mission": agent.mission}
+
+
+def build_agent(spec: Dict[str, Any]):
+    agent = _load_class(spec["class"])(*spec["args"], **spec["kwargs"])
+    for tool_spec in spec["tools"]:
+        tool = _load_class(tool_spec["class"])(*tool_spec["args"], **tool_spec["kwargs"])
+        agent.tools[tool.name] = tool
+    agent.name, agent.kind, agent.mission = spec["name"], spec["kind"], spec["mission"]
+    return agent
+
+
+class ReplicatedMemory(ProjectMemory):
+    """
+    Worker-side ProjectMemory: starts from the coordinator's snapshot and
+    forwards every log and context update back through the broker.
+    """
+    def __init__(self, broker: Broker, coordinator: str, job_id: str, snapshot: Dict[str, Any] = None):
+        super().__init__()
+        self.broker = broker
+        self.coordinator = coordinator
+        self.job_id = job_id
+        snapshot = snapshot or {}
+        self.kv_store.update(snapshot.get("kv", {}))
+        for entry in snapshot.get("logs", []):
+            super().add_log(entry["source"], entry["message"], entry["level"])
+
+    def add_log(self, source: str, message: str, level: str = "INFO"):
+        super().add_log(source, message, level)
+        self.broker.publish(self.coordinator, self.job_id, "log",
+                            {"source": source, "message": message, "level": level})
+
+    def update_context(self, key: str, value: Any):
+        super().update_context(key, value)
+        self.broker.publish(self.coordinator, self.job_id, "context", {"key": key, "value": value})
+
+    def record(self, kind: str, **data: Any):
+        self.broker.publish(self.coordinator, self.job_id, "event", {"kind": kind, "data": data})
+
+
+# --- Workers ----------------------------------------------------------------
+
+async def serve(broker: Broker, worker_id: str, stop: Optional[threading.Event] = None):
+    """Worker loop: claim jobs, run the agent, stream status and the result back."""
+    agents: Dict[str, Any] = {}
+    while stop is None or not stop.is_set():
+        job = broker.claim(worker_id)
+        if job is None:
+            await asyncio.sleep(POLL_INTERVAL)
+            continue
+        if job.get("kind") == SHUTDOWN:
+            broker.finish(job["id"])
+            break
+        await _run_job(broker, job, agents)
+
+
+async def _run_job(broker: Broker, job: Dict[str, Any], agents: Dict[str, Any]):
+    coordinator, job_id = job["coordinator"], job["id"]
+    spec = job["agent"]
+    try:
+        # Rebuilt agents are reused for later jobs with the same recipe.
+        key = json.dumps([spec["class"], spec["args"], spec["kwargs"], spec["tools"]], sort_keys=True)
+        if key not in agents:
+            agents[key] = build_agent(spec)
+        agent = agents[key]
+        agent.name, agent.kind, agent.mission = spec["name"], spec["kind"], spec["mission"]
+    except Exception as e:
+        broker.publish(coordinator, job_id, "result", {"error": f"Could not build agent: {e}"})
+        return
+
+    agent.memory = ReplicatedMemory(broker, coordinator, job_id, job.get("memory"))
+    agent.current_task_id = job.get("task_id")
+    agent.resume_from = job.get("resume")
+    agent.leases = None  # Leases live with the coordinator's scheduler
+
+    def forward_log(message: str, level: str = "INFO", _log=type(agent).log):
+        _log(agent, message, level)
+        broker.publish(coordinator, job_id, "agent_log", {"agent": spec["name"], "entry": agent.logs[-1]})
+    agent.log = forward_log
+
+    async def report_status():
+        last = None
+        while True:
+            state = {"agent": spec["name"], "status": agent.status, "thought": agent.thought,
+                     "progress": agent.progress}
+            if state != last:
+                broker.publish(coordinator, job_id, "status", state)
+                last = state
+            await asyncio.sleep(0.5)
+
+    # Usage is metered per job here and charged to the mission by the coordinator.
+    mission_token = current_mission.set(job_id)
+    reporter = asyncio.create_task(report_status())
+    run = asyncio.create_task(agent.run(job["task"]))
+    current_mission.reset(mission_token)
+    try:
+        while not run.done():
+            await asyncio.wait({run}, timeout=1.0)
+            if not run.done() and broker.is_cancelled(job_id):
+                run.cancel()
+        result = run.result()
+        payload = {"result": result if is_jsonable(result) else str(result)}
+    except asyncio.CancelledError:
+        payload = {"error": "cancelled"}
+    except Exception as e:
+        payload = {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        reporter.cancel()
+        del agent.log
+    broker.publish(coordinator, job_id, "status", {"agent": spec["name"], "status": agent.status,
+                                                   "thought": agent.thought, "progress": ""})
+    payload["usage"] = usage_meter.pop(job_id)
+    broker.publish(coordinator, job_id, "result", payload)
+
+
+def worker_main(broker_url: str, worker_id: str):
+    """Process entry point."""
+    broker = open_broker(broker_url)
+    try:
+        asyncio.run(serve(broker, worker_id))
+    finally:
+        broker.close()
+
+
+class WorkerPool:
+    """
+    N workers serving one broker: processes for SQLite brokers, threads (each
+    with its own event loop) for the in-process broker.
+    """
+    def __init__(self, broker: Broker, size: int):
+        self.broker = broker
+        self.size = size
+        self.workers: List[Any] = []
+        self._stop = threading.Event()
+
+    def start(self):
+        for i in range(self.size):
+            worker_id = f"worker-{os.getpid()}-{i + 1}"
+            if isinstance(self.broker, InProcessBroker):
+                worker = threading.Thread(target=asyncio.run, args=(serve(self.broker, worker_id, self._stop),),
+                                          name=worker_id, daemon=True)
+            else:
+                worker = multiprocessing.get_context("spawn").Process(
+                    target=worker_main, args=(self.broker.url, worker_id), name=worker_id, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for _ in self.workers:
+            self.broker.submit({"kind": SHUTDOWN, "coordinator": ""})
+        for worker in self.workers:
+            worker.join(timeout)
+            if worker.is_alive() and hasattr(worker, "terminate"):
+                worker.terminate()
+        self.workers = []
+
+    @property
+    def alive(self) -> int:
+        return sum(1 for w in self.workers if w.is_alive())
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import hashlib
+import asyncio
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+def request_key(provider: str, model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+    """Content address of a chat request (sha256 of its canonical JSON form)."""
+    payload = json.dumps(
+        {"provider": provider, "model": model, "temperature": temperature, "messages": messages},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for LLM completions.
+
+    An in-memory LRU sits in front of an on-disk store (one JSON file per key,
+    sharded by the first two hex digits). Entries expire after max_age seconds
+    and the disk store is trimmed oldest-first once it exceeds max_bytes.
+    Requests above max_temperature bypass the cache entirely, since sampled
+    completions are not meant to be replayed.
+    """
+    def __init__(self, cache_dir: str = ".dweebuild_cache/llm", max_memory_entries: int = 256,
+                 max_bytes: int = 64 * 1024 * 1024, max_age: float = 7 * 24 * 3600,
+                 max_temperature: float = 0.0):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_entries = max_memory_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_temperature = max_temperature
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0,
+                      "stores": 0, "evictions": 0}
+
+    def should_cache(self, temperature: float) -> bool:
+        return temperature <= self.max_temperature
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, created: float, value: str):
+        with self._lock:
+            self._lru[key] = (created, value)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_memory_entries:
+                self._lru.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Synchronous lookup (memory first, then disk)."""
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.max_age:
+                    self._lru.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                del self._lru[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+
+        if now - record.get("created", 0) > self.max_age:
+            self._unlink(path)
+            self.stats["misses"] += 1
+            return None
+
+        self._remember(key, record["created"], record["response"])
+        self.stats["disk_hits"] += 1
+        return record["response"]
+
+    def put(self, key: str, value: str):
+        """Synchronous store; trims the disk store when it grows past max_bytes."""
+        created = time.time()
+        self._remember(key, created, value)
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"created": created, "response": value}).encode("utf-8")
+        # A private temp file per write, so concurrent puts of one key never interleave.
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{key}.", suffix=".tmp",
+                                         delete=False) as f:
+            f.write(data)
+        with self._lock:
+            try:
+                replaced = path.stat().st_size
+            except OSError:
+                replaced = 0
+            os.replace(f.name, path)
+            self.stats["stores"] += 1
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data) - replaced
+        if self._disk_bytes is None:
+            self._disk_bytes = self._scan_size()
+        if self._disk_bytes > self.max_bytes:
+            self.evict()
+
+    async def aget(self, key: str) -> Optional[str]:
+        # Memory hits are answered inline; only disk lookups go to a thread.
+        if key in self._lru:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: str):
+        await asyncio.to_thread(self.put, key, value)
+
+    def _entries(self) -> List[os.DirEntry]:
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                entries.extend(e for e in os.scandir(shard.path) if e.name.endswith(".json"))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(e.stat().st_size for e in self._entries())
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+            self.stats["evictions"] += 1
+        except OSError:
+            pass
+
+    def evict(self):
+        """Drop expired entries, then the oldest ones until under max_bytes."""
+        now = time.time()
+        live = []
+        for entry in self._entries():
+            st = entry.stat()
+            if now - st.st_mtime > self.max_age:
+                self._unlink(entry.path)
+            else:
+                live.append((st.st_mtime, st.st_size, entry.path))
+
+        total = sum(size for _, size, _ in live)
+        # Trim to 90% so we do not rescan on every subsequent put.
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in sorted(live):
+            if total <= target:
+                break
+            self._unlink(path)
+            total -= size
+        self._disk_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+        for entry in self._entries():
+            self._unlink(entry.path)
+        self._disk_bytes = 0
+
+    def summary(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {**self.stats, "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._lru)}
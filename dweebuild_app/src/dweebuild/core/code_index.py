@@ -0,0 +1,280 @@
+import fnmatch
+import os
+import re
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:  # The regex parser is private; it moved in 3.11
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+from .config import config
+
+# Never worth searching, .gitignore or not.
+DEFAULT_IGNORES = (".git/", "__pycache__/", "*.pyc", ".venv/", "venv/", "node_modules/",
+                   ".dweebuild_cache/", ".pytest_cache/", ".mypy_cache/", ".ruff_cache/", ".tox/")
+
+
+class IgnoreRules:
+    """
+    The common subset of .gitignore semantics: globs, "!" negation, trailing
+    "/" for directories and patterns anchored by a "/". Rules from nested
+    .gitignore files apply below their own directory; later rules win.
+    """
+    def __init__(self):
+        self.rules: List[Tuple[str, str, bool, bool, bool]] = []  # (base, pattern, negate, dir_only, anchored)
+
+    def add(self, lines, base: str = ""):
+        for line in lines:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            pattern = line[1:] if negate else line
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if pattern.startswith("**/"):
+                pattern = pattern[3:]
+            anchored = "/" in pattern
+            self.rules.append((base, pattern.lstrip("/"), negate, dir_only, anchored))
+
+    def load(self, directory: str, base: str = ""):
+        try:
+            with open(os.path.join(directory, ".gitignore"), encoding="utf-8", errors="ignore") as f:
+                self.add(f, base)
+        except OSError:
+            pass
+
+    def ignored(self, relpath: str, is_dir: bool) -> bool:
+        result = False
+        for base, pattern, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not relpath.startswith(base + "/"):
+                    continue
+                path = relpath[len(base) + 1:]
+            else:
+                path = relpath
+            target = path if anchored else path.rsplit("/", 1)[-1]
+            if fnmatch.fnmatchcase(target, pattern):
+                result = not negate
+        return result
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _required_literals(parsed) -> List[str]:
+    """Literal runs every match must contain (conservative: alternations contribute nothing)."""
+    runs, current = [], []
+
+    def cut():
+        if len(current) >= 3:
+            runs.append("".join(current))
+        current.clear()
+
+    for op, arg in parsed:
+        name = str(op)
+        if name == "LITERAL":
+            current.append(chr(arg))
+        elif name == "SUBPATTERN":
+            cut()
+            runs.extend(_required_literals(arg[-1]))
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") and arg[0] >= 1:
+            cut()
+            runs.extend(_required_literals(arg[2]))
+        elif name == "AT":
+            continue  # Anchors do not break a literal run's meaning
+        else:
+            cut()
+    cut()
+    return runs
+
+
+class CodeIndex:
+    """
+    Trigram index over the text files under root, for grep-style searches.
+
+    refresh() walks the tree (honouring DEFAULT_IGNORES and every
+    .gitignore) and re-reads only files whose mtime or size changed, so it
+    costs a stat per file rather than a read. Each indexed file version gets
+    a new id; ids of replaced versions are dropped from the postings lazily,
+    when they outnumber the live ones. A query keeps only the files that
+    contain every trigram of its required literals and runs the real regex
+    over those.
+    """
+    def __init__(self, root: str, max_file_bytes: Optional[int] = None):
+        self.root = os.path.abspath(root)
+        self.max_file_bytes = max_file_bytes or config.code_index_max_file_kb * 1024
+        self._postings: Dict[str, Set[int]] = {}
+        self._files: Dict[str, Tuple[int, float, int]] = {}  # relpath -> (id, mtime, size)
+        self._live: Dict[int, str] = {}
+        self._next_id = 0
+        self._dead = 0
+        self._lock = threading.Lock()
+        self.stats = {"refreshes": 0, "indexed": 0, "queries": 0, "scanned": 0}
+
+    # --- Indexing -------------------------------------------------------------
+
+    def _walk(self) -> Iterator[Tuple[str, os.stat_result]]:
+        rules = IgnoreRules()
+        rules.add(DEFAULT_IGNORES)
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            directory = os.path.join(self.root, rel_dir)
+            rules.load(directory, rel_dir)
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                relpath = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if rules.ignored(relpath, is_dir):
+                        continue
+                    if is_dir:
+                        stack.append(relpath)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield relpath, entry.stat()
+                except OSError:
+                    continue
+
+    def refresh(self) -> Dict[str, int]:
+        """Bring the index up to date with the tree; returns what changed."""
+        with self._lock:
+            changed = {"added": 0, "updated": 0, "removed": 0}
+            seen = set()
+            for relpath, st in self._walk():
+                seen.add(relpath)
+                known = self._files.get(relpath)
+                if known is not None and known[1] == st.st_mtime and known[2] == st.st_size:
+                    continue
+                if known is not None:
+                    self._forget(relpath)
+                changed["updated" if known else "added"] += 1
+                self._add(relpath, st)
+            for relpath in [p for p in self._files if p not in seen]:
+                self._forget(relpath)
+                changed["removed"] += 1
+            if self._dead > max(64, len(self._live)):
+                live = set(self._live)
+                for ids in self._postings.values():
+                    ids.intersection_update(live)
+                self._postings = {gram: ids for gram, ids in self._postings.items() if ids}
+                self._dead = 0
+            self.stats["refreshes"] += 1
+            return changed
+
+    def _add(self, relpath: str, st: os.stat_result):
+        file_id = self._next_id
+        self._next_id += 1
+        self._files[relpath] = (file_id, st.st_mtime, st.st_size)
+        text = self._read(relpath) if st.st_size <= self.max_file_bytes else None
+        if text is None:
+            return  # Binary or too big: tracked (so it is not re-read) but never searched
+        self._live[file_id] = relpath
+        for gram in _trigrams(text.lower()):
+            self._postings.setdefault(gram, set()).add(file_id)
+        self.stats["indexed"] += 1
+
+    def _forget(self, relpath: str):
+        file_id = self._files.pop(relpath)[0]
+        if self._live.pop(file_id, None) is not None:
+            self._dead += 1
+
+    def _read(self, relpath: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, relpath), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if b"\0" in data[:8192]:
+            return None
+        return data.decode("utf-8", errors="replace")
+
+    # --- Querying -------------------------------------------------------------
+
+    def candidates(self, literals: List[str], path: str = "") -> List[str]:
+        """Indexed files under path that contain every trigram of the literals."""
+        grams = set()
+        for literal in literals:
+            grams |= _trigrams(literal.lower())
+        with self._lock:
+            if grams:
+                postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+                ids = set(postings[0]).intersection(*postings[1:])
+                files = [self._live[i] for i in ids if i in self._live]
+            else:
+                files = list(self._live.values())
+        prefix = path.strip("/")
+        if prefix and prefix != ".":
+            files = [f for f in files if f == prefix or f.startswith(prefix + "/")]
+        return sorted(files)
+
+    def search(self, pattern: str, path: str = ".", literal: bool = False, ignore_case: bool = False,
+               max_results: int = 200) -> List[str]:
+        """
+        grep -rn style matches ("file:line:text") for a regex (or a literal
+        string) under path, relative to root. An invalid regex is searched
+        for literally.
+        """
+        self.refresh()
+        flags = re.IGNORECASE if ignore_case else 0
+        if not literal:
+            try:
+                regex = re.compile(pattern, flags)
+                literals = _required_literals(sre_parse.parse(pattern, flags))
+            except re.error:
+                literal = True
+        if literal:
+            regex = re.compile(re.escape(pattern), flags)
+            literals = [pattern]
+
+        files = self.candidates(literals, os.path.normpath(path))
+        self.stats["queries"] += 1
+        self.stats["scanned"] += len(files)
+        matches: List[str] = []
+        for relpath in files:
+            text = self._read(relpath)
+            if text is None:
+                continue
+            for number, line in enumerate(text.splitlines(), 1):
+                if regex.search(line):
+                    matches.append(f"{relpath}:{number}:{line[:300]}")
+                    if len(matches) > max_results:
+                        return matches[:max_results] + [f"... (more than {max_results} matches; narrow the search)"]
+        return matches
+
+    def snapshot(self) -> Dict[str, Tuple[float, int]]:
+        """relpath -> (mtime, size) of every tracked file as of the last refresh()."""
+        with self._lock:
+            return {path: (mtime, size) for path, (_, mtime, size) in self._files.items()}
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "files": len(self._live), "trigrams": len(self._postings)}
+
+
+_indexes: Dict[str, CodeIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_code_index(root: str) -> CodeIndex:
+    """The process-wide index for a working directory (shared by every agent's GrepTool)."""
+    root = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = CodeIndex(root)
+        return index
+
+
+def drop_code_index(root: str) -> Optional[CodeIndex]:
+    """Forget a working directory's index (its mission is gone)."""
+    with _indexes_lock:
+        return _indexes.pop(os.path.abspath(root), None)
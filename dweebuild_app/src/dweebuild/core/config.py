@@ -35,6 +35,231 @@ class Config:
     def max_concurrent_agents(self) -> int:
         return int(os.getenv("MAX_CONCURRENT_AGENTS", "3"))
     
+    @property
+    def llm_providers(self) -> list[str]:
+        names = os.getenv("LLM_PROVIDERS", "groq,openai,anthropic")
+        return [n.strip().lower() for n in names.split(",") if n.strip()]
+    
+    @property
+    def llm_cost_weight(self) -> float:
+        return float(os.getenv("LLM_COST_WEIGHT", "0.1"))
+    
+    @property
+    def llm_plan_tier(self) -> str:
+        return os.getenv("LLM_PLAN_TIER", "default")
+    
+    @property
+    def llm_max_connections(self) -> int:
+        return int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    
+    @property
+    def llm_max_keepalive_connections(self) -> int:
+        return int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    
+    @property
+    def llm_keepalive_expiry(self) -> float:
+        return float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "30"))
+    
+    @property
+    def llm_request_timeout(self) -> float:
+        return float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+    
+    @property
+    def llm_requests_per_minute(self) -> int:
+        return int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+    
+    @property
+    def llm_tokens_per_minute(self) -> int:
+        return int(os.getenv("LLM_TOKENS_PER_MINUTE", "12000"))
+    
+    @property
+    def llm_completion_token_estimate(self) -> int:
+        return int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "512"))
+    
+    @property
+    def llm_max_retries(self) -> int:
+        return int(os.getenv("LLM_MAX_RETRIES", "5"))
+    
+    @property
+    def llm_coalesce(self) -> bool:
+        return os.getenv("LLM_COALESCE", "true").lower() == "true"
+    
+    @property
+    def llm_streaming(self) -> bool:
+        return os.getenv("LLM_STREAMING", "true").lower() == "true"
+    
+    @property
+    def llm_cache_enabled(self) -> bool:
+        return os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+    
+    @property
+    def llm_cache_dir(self) -> str:
+        return os.getenv("LLM_CACHE_DIR", ".dweebuild_cache/llm")
+    
+    @property
+    def llm_cache_max_mb(self) -> int:
+        return int(os.getenv("LLM_CACHE_MAX_MB", "64"))
+    
+    @property
+    def llm_cache_max_age_hours(self) -> float:
+        return float(os.getenv("LLM_CACHE_MAX_AGE_HOURS", "168"))
+    
+    @property
+    def llm_cache_max_temperature(self) -> float:
+        """Highest temperature whose replies are cached; the default covers agent planning (0.2)."""
+        return float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+    
+    @property
+    def context_budget_tokens(self) -> int:
+        return int(os.getenv("CONTEXT_BUDGET_TOKENS", "6000"))
+    
+    @property
+    def agent_history_tokens(self) -> int:
+        return int(os.getenv("AGENT_HISTORY_TOKENS", "8000"))
+    
+    @property
+    def agent_observation_tokens(self) -> int:
+        return int(os.getenv("AGENT_OBSERVATION_TOKENS", "1500"))
+    
+    @property
+    def agent_tool_concurrency(self) -> int:
+        return int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
+    
+    @property
+    def task_aging_per_minute(self) -> float:
+        return float(os.getenv("TASK_AGING_PER_MINUTE", "1.0"))
+    
+    @property
+    def task_max_retries(self) -> int:
+        """Times a failed task is queued again before it is given up."""
+        return int(os.getenv("TASK_MAX_RETRIES", "2"))
+    
+    def pool_size(self, kind: str) -> int:
+        """Workers per agent kind, from e.g. ENGINEER_POOL_SIZE (default 1)."""
+        return max(1, int(os.getenv(f"{kind.upper()}_POOL_SIZE", "1")))
+    
+    @property
+    def missions_root(self) -> str:
+        """Parent directory of per-mission working directories."""
+        return os.getenv("MISSIONS_ROOT", "missions")
+    
+    @property
+    def mission_agent_slots(self) -> int:
+        """Agents running at once across all missions (fair-shared)."""
+        return max(1, int(os.getenv("MISSION_AGENT_SLOTS", "8")))
+    
+    @property
+    def mission_tool_slots(self) -> int:
+        """Tool calls (mostly subprocesses) running at once across all missions."""
+        return max(1, int(os.getenv("MISSION_TOOL_SLOTS", "16")))
+    
+    @property
+    def journal_dir(self) -> str:
+        """Event journal location; empty disables journaling."""
+        return os.getenv("JOURNAL_DIR", "")
+    
+    @property
+    def journal_fsync(self) -> str:
+        return os.getenv("JOURNAL_FSYNC", "batch").lower()
+    
+    @property
+    def journal_flush_ms(self) -> int:
+        return int(os.getenv("JOURNAL_FLUSH_MS", "200"))
+    
+    @property
+    def journal_segment_mb(self) -> int:
+        return max(1, int(os.getenv("JOURNAL_SEGMENT_MB", "16")))
+    
+    @property
+    def journal_max_mb(self) -> int:
+        """Journal growth that triggers an automatic session snapshot and prune; 0 disables."""
+        return max(0, int(os.getenv("JOURNAL_MAX_MB", "64")))
+    
+    @property
+    def session_compression(self) -> str:
+        """auto (zstd if installed, else gzip), zstd, gzip or none."""
+        return os.getenv("SESSION_COMPRESSION", "auto")
+    
+    @property
+    def session_full_every(self) -> int:
+        """Every Nth session save is a full snapshot; the rest are deltas."""
+        return max(1, int(os.getenv("SESSION_FULL_EVERY", "10")))
+    
+    @property
+    def session_keep(self) -> int:
+        return max(1, int(os.getenv("SESSION_KEEP", "20")))
+    
+    @property
+    def session_max_age_days(self) -> float:
+        return float(os.getenv("SESSION_MAX_AGE_DAYS", "0"))
+    
+    @property
+    def resume_on_start(self) -> bool:
+        """Restore the last saved session (plus journal) when the dashboard starts."""
+        return os.getenv("RESUME_ON_START", "false").lower() == "true"
+    
+    @property
+    def worker_processes(self) -> int:
+        """Agent worker processes behind the broker; 0 runs agents in-process."""
+        return max(0, int(os.getenv("WORKER_PROCESSES", "0")))
+    
+    @property
+    def broker_url(self) -> str:
+        return os.getenv("BROKER_URL", "sqlite:///.dweebuild_cache/broker.sqlite3")
+    
+    @property
+    def shell_pool_size(self) -> int:
+        """Warm shell sessions kept per working directory for tool commands (0 = fresh shell per call)."""
+        return max(0, int(os.getenv("SHELL_POOL_SIZE", "2")))
+    
+    @property
+    def shell_timeout(self) -> float:
+        return float(os.getenv("SHELL_TIMEOUT_SECONDS", "120"))
+    
+    @property
+    def shell_max_output_kb(self) -> int:
+        return max(1, int(os.getenv("SHELL_MAX_OUTPUT_KB", "256")))
+    
+    @property
+    def shell_scrub_env(self) -> list[str]:
+        """Environment variables removed from tool shells (by default only the LLM provider keys)."""
+        names = os.getenv("SHELL_SCRUB_ENV", "GROQ_API_KEY,OPENAI_API_KEY,ANTHROPIC_API_KEY")
+        return [name.strip() for name in names.split(",") if name.strip()]
+    
+    @property
+    def tool_output_spill_dir(self) -> str:
+        """Where full tool output goes once it outgrows the in-memory head+tail buffer ("" = nowhere)."""
+        return os.getenv("TOOL_OUTPUT_SPILL_DIR", ".dweebuild_cache/tool_output")
+    
+    @property
+    def tool_output_spill_keep(self) -> int:
+        return int(os.getenv("TOOL_OUTPUT_SPILL_KEEP", "100"))
+    
+    @property
+    def tool_output_spill_max_mb(self) -> int:
+        """Size cap per spill file; output past it is not saved (0 = no cap)."""
+        return max(0, int(os.getenv("TOOL_OUTPUT_SPILL_MAX_MB", "64")))
+    
+    @property
+    def tool_output_log_chars(self) -> int:
+        """Tool output kept per observation in the shared memory log."""
+        return int(os.getenv("TOOL_OUTPUT_LOG_CHARS", "2000"))
+    
+    @property
+    def code_index_max_file_kb(self) -> int:
+        """Files larger than this are left out of the grep index."""
+        return int(os.getenv("CODE_INDEX_MAX_FILE_KB", "512"))
+    
+    @property
+    def test_full_every(self) -> int:
+        """Every Nth QA verification also runs the full suite after the affected tests."""
+        return max(1, int(os.getenv("TEST_FULL_EVERY", "5")))
+    
+    @property
+    def test_workers(self) -> str:
+        """pytest-xdist workers for test runs: "auto", a number, or 0 for none."""
+        return os.getenv("TEST_WORKERS", "auto")
+    
     @property
     def agent_timeout(self) -> int:
         return int(os.getenv("AGENT_TIMEOUT_SECONDS", "300"))
@@ -54,7 +279,13 @@ class Config:
     def validate(self) -> tuple[bool, list[str]]:
         """Validate configuration. Returns (is_valid, missing_keys)."""
         missing = []
-        if not self.groq_api_key:
+        has_provider = (
+            self.groq_api_key or
+            ("openai" in self.llm_providers and self.openai_api_key) or
+            ("anthropic" in self.llm_providers and self.anthropic_api_key) or
+            "scripted" in self.llm_providers
+        )
+        if not has_provider:
             missing.append("GROQ_API_KEY")
         return (len(missing) == 0, missing)
 
@@ -0,0 +1,170 @@
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Word pieces of up to four characters plus punctuation approximate BPE
+# tokenizers closely enough for budgeting without a model-specific vocabulary.
+_PIECE_RE = re.compile(r"\w{1,4}|[^\w\s]")
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # Optional dependency (or no cached vocabulary)
+            _encoding = None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Local token count (tiktoken when installed, heuristic otherwise)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_PIECE_RE.findall(text))
+
+
+def relevance(query: str, text: str) -> float:
+    """Share of the query's identifiers that appear in text (0..1)."""
+    terms = {w.lower() for w in _WORD_RE.findall(query)}
+    if not terms:
+        return 0.0
+    found = {w.lower() for w in _WORD_RE.findall(text)}
+    return len(terms & found) / len(terms)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of text within max_tokens, marking the cut."""
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    # Token density is roughly uniform, so cut by character share and shrink
+    # until the result (marker included) fits.
+    target = max_tokens
+    while target > 0:
+        keep_chars = int(len(text) * target / total)
+        head = keep_chars * 2 // 3
+        tail = keep_chars - head
+        marker = f"\n... [~{total - target} tokens omitted] ...\n"
+        result = text[:head] + marker + (text[len(text) - tail:] if tail else "")
+        used = count_tokens(result)
+        if used <= max_tokens:
+            return result
+        target -= max(used - max_tokens, 1)
+    return ""
+
+
+@dataclass
+class ContextItem:
+    """One candidate piece of prompt context."""
+    section: str
+    text: str
+    relevance: float = 0.5
+    pinned: bool = False
+    created: float = field(default_factory=time.monotonic)
+    tokens: int = 0
+
+
+class ContextBudget:
+    """
+    Assembles prompt context under a token budget.
+
+    Pinned items (mission, task) are always kept. The rest are ranked by
+    relevance and recency; items that fit are kept whole, the first one
+    that does not is truncated (or summarized, when a summarizer is given)
+    into the remaining space, and the rest are dropped. report() gives the
+    tokens used per section.
+    """
+    def __init__(self, max_tokens: int, recency_weight: float = 0.3,
+                 summarizer: Callable[[str, int], str] = None, min_fragment: int = 64):
+        self.max_tokens = max_tokens
+        self.recency_weight = recency_weight
+        self.summarizer = summarizer
+        self.min_fragment = min_fragment
+        self.items: List[ContextItem] = []
+        self._report: Dict[str, int] = {}
+
+    def add(self, section: str, text: str, relevance: float = 0.5, pinned: bool = False,
+            created: float = None) -> ContextItem:
+        item = ContextItem(section, text or "", relevance, pinned,
+                           created if created is not None else time.monotonic())
+        item.tokens = count_tokens(item.text)
+        self.items.append(item)
+        return item
+
+    def _rank(self, items: List[ContextItem]) -> List[ContextItem]:
+        if not items:
+            return []
+        oldest = min(i.created for i in items)
+        span = (max(i.created for i in items) - oldest) or 1.0
+        def score(item):
+            recency = (item.created - oldest) / span
+            return (1 - self.recency_weight) * item.relevance + self.recency_weight * recency
+        return sorted(items, key=score, reverse=True)
+
+    def build(self) -> Tuple[List[ContextItem], Dict[str, int]]:
+        """Select and fit items. Returns (kept items in insertion order, report)."""
+        remaining = self.max_tokens
+        kept: Dict[int, ContextItem] = {}
+        report: Dict[str, int] = {}
+        dropped = 0
+
+        for item in self.items:
+            if item.pinned:
+                text = item.text if item.tokens <= remaining else truncate_to_tokens(item.text, max(remaining, 0))
+                fitted = ContextItem(item.section, text, item.relevance, True, item.created, count_tokens(text))
+                kept[id(item)] = fitted
+                remaining -= fitted.tokens
+
+        for item in self._rank([i for i in self.items if not i.pinned]):
+            if item.tokens <= remaining:
+                kept[id(item)] = item
+                remaining -= item.tokens
+            elif remaining >= self.min_fragment:
+                if self.summarizer is not None:
+                    text = self.summarizer(item.text, remaining)
+                    text = truncate_to_tokens(text, remaining)
+                else:
+                    text = truncate_to_tokens(item.text, remaining)
+                fitted = ContextItem(item.section, text, item.relevance, False, item.created, count_tokens(text))
+                kept[id(item)] = fitted
+                remaining -= fitted.tokens
+            else:
+                dropped += 1
+
+        ordered = [kept[id(i)] for i in self.items if id(i) in kept]
+        for item in ordered:
+            report[item.section] = report.get(item.section, 0) + item.tokens
+        report["_total"] = self.max_tokens - remaining
+        report["_budget"] = self.max_tokens
+        report["_dropped"] = dropped
+        self._report = report
+        return ordered, report
+
+    def render(self, header: Callable[[str], str] = None) -> str:
+        """Build and join kept items, grouping consecutive items of a section."""
+        items, _ = self.build()
+        header = header or (lambda section: f"{section.upper()}:")
+        lines: List[str] = []
+        last = None
+        for item in items:
+            if item.section != last:
+                lines.append(header(item.section))
+                last = item.section
+            lines.append(item.text)
+        return "\n".join(lines)
+
+    def report(self) -> Dict[str, int]:
+        return dict(self._report)
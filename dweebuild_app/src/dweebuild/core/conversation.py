@@ -0,0 +1,158 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from .action_parser import Spool
+from .context_budget import count_tokens, truncate_to_tokens
+from .output import clip_text
+
+SUMMARY_PROMPT = """
+You compress an agent's working history. Summarize the steps below into a
+short bullet list: what was tried, what each tool call returned (facts, file
+names, errors), and what is still open. Keep exact paths and error messages.
+Reply with the bullet list only.
+"""
+
+
+class Conversation:
+    """
+    Per-task chat history for a ReAct agent.
+
+    The first two messages (system prompt and task prompt) form a stable
+    prefix that is sent byte-identical on every turn, so provider-side prompt
+    caching can reuse it. Each turn then only appends the agent's action and
+    the resulting observation. When the history grows past max_tokens, the
+    oldest turns are folded into a running summary placed right after the
+    prefix; the last keep_recent turns are always kept verbatim.
+    """
+    def __init__(self, max_tokens: int = 8000, observation_tokens: int = 1500,
+                 keep_recent: int = 6, max_arg_chars: int = 400):
+        self.max_tokens = max_tokens
+        self.observation_tokens = observation_tokens
+        self.keep_recent = keep_recent
+        self.max_arg_chars = max_arg_chars
+        self.prefix: List[Dict[str, str]] = []
+        self.turns: List[Dict[str, str]] = []
+        self.summary = ""
+        self.stats = {"turns": 0, "summaries": 0, "repeats": 0}
+
+    @property
+    def started(self) -> bool:
+        return bool(self.prefix)
+
+    def start(self, system_prompt: str, user_prompt: str):
+        self.prefix = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+        self.turns = []
+        self.summary = ""
+
+    def messages(self) -> List[Dict[str, str]]:
+        messages = list(self.prefix)
+        if self.summary:
+            # Keeps user/assistant alternation: the prefix ends with a user turn.
+            messages.append({"role": "assistant", "content": "(Earlier steps, summarized.)"})
+            messages.append({"role": "user", "content": f"SUMMARY OF EARLIER STEPS:\n{self.summary}"})
+        for message in self.turns:
+            if messages and messages[-1]["role"] == message["role"] == "user":
+                messages[-1] = {"role": "user", "content": messages[-1]["content"] + "\n\n" + message["content"]}
+            else:
+                messages.append(message)
+        return messages
+
+    def _append(self, role: str, content: str):
+        if self.turns and self.turns[-1]["role"] == role == "user":
+            self.turns[-1] = {"role": "user", "content": self.turns[-1]["content"] + "\n\n" + content}
+        else:
+            self.turns.append({"role": role, "content": content})
+
+    def _compact_args(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        args = {}
+        for key, value in (raw or {}).items():
+            if isinstance(value, Spool):
+                value = "<streamed to file>"
+            elif isinstance(value, str) and len(value) > self.max_arg_chars:
+                value = f"<{len(value)} chars>"
+            args[key] = value
+        return args
+
+    def add_action(self, plan: Dict[str, Any]):
+        """Record the agent's action (single or batch), with bulky arguments elided."""
+        compact: Dict[str, Any] = {"thought": plan.get("thought", "")}
+        if isinstance(plan.get("actions"), list):
+            compact["actions"] = [{"tool": a.get("tool"), "args": self._compact_args(a.get("args"))}
+                                  for a in plan["actions"] if isinstance(a, dict)]
+        else:
+            compact["tool"] = plan.get("tool")
+            compact["args"] = self._compact_args(plan.get("args"))
+        self._append("assistant", json.dumps(compact))
+        self.stats["turns"] += 1
+
+    def add_observation(self, tool: str, result: Any, error: bool = False):
+        label = "ERROR" if error else "OBSERVATION"
+        # A cheap character cut first, so megabytes of output are never tokenized.
+        text = truncate_to_tokens(clip_text(str(result), self.observation_tokens * 8), self.observation_tokens)
+        self._append("user", f"{label} ({tool}):\n{text}")
+
+    def add_note(self, text: str):
+        self._append("user", text)
+
+    def tokens(self) -> int:
+        return sum(count_tokens(m["content"]) for m in self.messages())
+
+    def needs_compaction(self) -> bool:
+        return len(self.turns) > self.keep_recent and self.tokens() > self.max_tokens
+
+    async def compact(self, llm=None, tier: str = "fast"):
+        """Fold all but the last keep_recent turns into the running summary."""
+        if len(self.turns) <= self.keep_recent:
+            return
+        cut = len(self.turns) - self.keep_recent
+        # Never start the kept window on an observation without its action.
+        if self.turns[cut]["role"] == "user" and cut > 0:
+            cut -= 1
+        old, self.turns = self.turns[:cut], self.turns[cut:]
+        if not old:
+            return
+        transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in old)
+        if self.summary:
+            transcript = f"PREVIOUS SUMMARY:\n{self.summary}\n\n{transcript}"
+
+        summary = None
+        if llm is not None:
+            from .llm import LLMError
+            try:
+                summary = await llm.complete([
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": truncate_to_tokens(transcript, self.max_tokens)},
+                ], temperature=0.0, tier=tier)
+            except LLMError:
+                summary = None
+        if not summary or summary.startswith("LLM ERROR"):
+            summary = self._mechanical_summary(old)
+        self.summary = truncate_to_tokens(summary.strip(), self.max_tokens // 4)
+        self.stats["summaries"] += 1
+
+    def _mechanical_summary(self, turns: List[Dict[str, str]]) -> str:
+        lines = [self.summary] if self.summary else []
+        for message in turns:
+            first = message["content"].strip().splitlines()[0] if message["content"].strip() else ""
+            lines.append(f"- {message['role']}: {first[:160]}")
+        return "\n".join(lines)
+
+    def to_state(self) -> Dict[str, Any]:
+        """JSON-safe copy for checkpoints; from_state() rebuilds it."""
+        return {"prefix": self.prefix, "turns": self.turns, "summary": self.summary, "stats": self.stats,
+                "limits": [self.max_tokens, self.observation_tokens, self.keep_recent, self.max_arg_chars]}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Conversation":
+        conversation = cls(*state.get("limits", ()))
+        conversation.prefix = [dict(m) for m in state["prefix"]]
+        conversation.turns = [dict(m) for m in state["turns"]]
+        conversation.summary = state.get("summary", "")
+        conversation.stats.update(state.get("stats", {}))
+        return conversation
+
+    def summary_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "messages": len(self.messages()), "tokens": self.tokens()}
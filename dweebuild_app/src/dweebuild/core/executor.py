@@ -0,0 +1,307 @@
+import asyncio
+import os
+import secrets
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from .config import config
+from .output import OutputBuffer, OutputStream
+
+# on_output(stream, text) receives "stdout"/"stderr" chunks as they arrive.
+OutputCallback = Callable[[str, str], None]
+
+
+@dataclass
+class ExecResult:
+    returncode: int
+    stdout: str
+    stderr: str
+    duration: float
+    timed_out: bool = False
+    truncated: bool = False  # The middle of a stream was cut (see the *_file spills)
+    stdout_file: Optional[str] = None  # Full output, when it outgrew the in-memory buffer
+    stderr_file: Optional[str] = None
+
+    @property
+    def output(self) -> str:
+        return self.stdout + self.stderr
+
+
+class _Capture:
+    """
+    Reads one pipe up to an end marker into an OutputBuffer of max_bytes:
+    a third for the head, the rest for the tail, where errors and summaries
+    usually are.
+    """
+    def __init__(self, reader: asyncio.StreamReader, stream: str, max_bytes: int,
+                 on_output: Optional[OutputCallback]):
+        self.reader = reader
+        self.stream = stream
+        self.on_output = on_output
+        self.buffer = OutputBuffer(max_bytes // 3, max_bytes - max_bytes // 3,
+                                   config.tool_output_spill_dir or None, prefix=stream)
+
+    def _emit(self, data: bytes):
+        if not data:
+            return
+        self.buffer.write(data)
+        if self.on_output is not None:
+            self.on_output(self.stream, data.decode(errors="replace"))
+
+    async def until(self, marker: bytes, pending: bytes = b"", emit: bool = True) -> bytes:
+        """
+        Pass output through (or drop it, without emit) until marker and
+        return whatever followed it in the last chunk. The marker may straddle
+        reads, so a tail that could be the start of it is held back until the
+        next one.
+        """
+        while True:
+            at = pending.find(marker)
+            if at >= 0:
+                if emit:
+                    self._emit(pending[:at])
+                return pending[at + len(marker):]
+            hold = next((k for k in range(min(len(pending), len(marker) - 1), 0, -1)
+                         if marker.startswith(pending[-k:])), 0)
+            if emit:
+                self._emit(pending[:len(pending) - hold])
+            pending = pending[len(pending) - hold:]
+            chunk = await self.reader.read(65536)
+            if not chunk:
+                if emit:
+                    self._emit(pending)
+                raise EOFError(f"{self.stream} closed")
+            pending += chunk
+
+    async def between(self, start: bytes, end: bytes) -> bytes:
+        """Capture the output between two markers; see until()."""
+        return await self.until(end, await self.until(start, emit=False))
+
+    async def line(self, rest: bytes) -> bytes:
+        while b"\n" not in rest:
+            chunk = await self.reader.read(256)
+            if not chunk:
+                raise EOFError(f"{self.stream} closed")
+            rest += chunk
+        return rest.split(b"\n", 1)[0]
+
+    def close(self) -> Optional[str]:
+        self.buffer.close()
+        return self.buffer.spill_path
+
+
+class ShellSession:
+    """
+    A long-lived /bin/sh in its own process group, rooted at cwd.
+
+    Commands are written to the shell's stdin, each run in a subshell (so a
+    `cd` or `exit` cannot change the session) with stdin from /dev/null,
+    between random start and end markers on stdout and stderr (the end one
+    carries the exit status). A timed-out or cancelled command takes the
+    whole process group down with it and the session is discarded. Jobs a
+    command leaves in the background get SIGTERM once it ends (the shell
+    itself traps it), so they cannot write into a later command's output.
+
+    This isolates commands from each other, not from the machine: they run
+    as this user, with its filesystem and network, minus the environment
+    variables in SHELL_SCRUB_ENV.
+    """
+    def __init__(self, cwd: str):
+        self.cwd = cwd
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.commands = 0
+        self.alive = False
+
+    async def start(self) -> "ShellSession":
+        # Tool commands never need dweebuild's own provider keys; other
+        # credentials (git remotes, private package indexes) pass through.
+        scrub = set(config.shell_scrub_env)
+        env = {key: value for key, value in os.environ.items() if key not in scrub}
+        self.proc = await asyncio.create_subprocess_exec(
+            "/bin/sh", stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, cwd=self.cwd, env=env, start_new_session=True)
+        self.loop = asyncio.get_running_loop()
+        self.alive = True
+        # Caught (not ignored) traps reset in subshells, so only the shell survives end_background().
+        self.proc.stdin.write(b"trap : TERM\n")
+        return self
+
+    async def run(self, cmd: str, timeout: float, max_bytes: int,
+                  on_output: Optional[OutputCallback] = None) -> ExecResult:
+        token = secrets.token_hex(8)
+        start, marker = f"__dweebuild_start_{token}__".encode(), f"__dweebuild_end_{token}__".encode()
+        stdout = _Capture(self.proc.stdout, "stdout", max_bytes, on_output)
+        stderr = _Capture(self.proc.stderr, "stderr", max_bytes, on_output)
+        quoted = cmd.replace("'", "'\\''")
+        # eval inside the subshell keeps a syntax error in cmd from ending the session.
+        script = (f"printf '%s' '{start.decode()}'; printf '%s' '{start.decode()}' >&2\n"
+                  f"( eval '{quoted}' ) </dev/null\n"
+                  f"printf '%s%d\\n' '{marker.decode()}' $?\n"
+                  f"printf '%s' '{marker.decode()}' >&2\n")
+        self.commands += 1
+        started = time.monotonic()
+
+        async def collect() -> int:
+            rest, _ = await asyncio.gather(stdout.between(start, marker), stderr.between(start, marker))
+            return int(await stdout.line(rest))
+
+        try:
+            self.proc.stdin.write(script.encode())
+            await self.proc.stdin.drain()
+            returncode = await asyncio.wait_for(collect(), timeout)
+            timed_out = False
+            self.end_background()
+        except asyncio.TimeoutError:
+            self.kill()
+            returncode, timed_out = -signal.SIGKILL, True
+        except (EOFError, ConnectionError, ValueError):
+            # The shell itself died (e.g. the command killed its parent).
+            self.kill()
+            returncode, timed_out = (self.proc.returncode or -1), False
+        except BaseException:
+            self.kill()  # Cancelled mid-command: nothing can be trusted about the session now
+            raise
+        finally:
+            stdout_file, stderr_file = stdout.close(), stderr.close()
+        return ExecResult(returncode, stdout.buffer.text(), stderr.buffer.text(), time.monotonic() - started,
+                          timed_out, bool(stdout.buffer.omitted or stderr.buffer.omitted),
+                          stdout_file, stderr_file)
+
+    def end_background(self):
+        """SIGTERM what the last command left running; the shell traps it and stays."""
+        try:
+            os.killpg(self.proc.pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def kill(self):
+        """SIGKILL the session's whole process group (the shell and anything it started)."""
+        self.alive = False
+        if self.proc is None or self.proc.returncode is not None:
+            return
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    async def close(self):
+        self.kill()
+        if self.proc is not None:
+            try:
+                # Drain what the killed group left in the pipes; wait() only returns once they close.
+                await asyncio.wait_for(asyncio.gather(
+                    self.proc.stdout.read(), self.proc.stderr.read(), self.proc.wait()), 1)
+            except (asyncio.TimeoutError, RuntimeError):
+                pass
+
+
+class ShellExecutor:
+    """
+    Process-wide pool of warm shell sessions, keyed by working directory.
+
+    Tools run commands through run() instead of forking a fresh shell per
+    call. Up to pool_size idle sessions are kept per directory; a busy
+    directory gets extra sessions on demand, which are closed again when
+    more than pool_size are idle. Like the LLM ClientPool, sessions are bound
+    to the event loop that started them, so ones left over from an earlier
+    loop (Streamlit reruns) are dropped instead of reused. With pool_size 0
+    every command gets a fresh session (timeouts and caps still apply).
+    """
+    def __init__(self, pool_size: Optional[int] = None, timeout: Optional[float] = None,
+                 max_output_bytes: Optional[int] = None, max_commands: int = 500):
+        self.pool_size = config.shell_pool_size if pool_size is None else pool_size
+        self.timeout = timeout or config.shell_timeout
+        self.max_output_bytes = max_output_bytes or config.shell_max_output_kb * 1024
+        self.max_commands = max_commands  # Recycle a session after this many commands
+        self._idle: Dict[str, List[ShellSession]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "reused": 0, "timeouts": 0, "killed": 0}
+
+    async def _acquire(self, cwd: str) -> ShellSession:
+        loop = asyncio.get_running_loop()
+        stale = []
+        with self._lock:
+            idle = self._idle.get(cwd, [])
+            while idle:
+                session = idle.pop()
+                if session.alive and session.loop is loop and session.proc.returncode is None:
+                    self.stats["reused"] += 1
+                    return session
+                stale.append(session)
+        for session in stale:
+            session.kill()
+        self.stats["started"] += 1
+        return await ShellSession(cwd).start()
+
+    async def _release(self, session: ShellSession):
+        if session.alive and session.commands < self.max_commands:
+            with self._lock:
+                idle = self._idle.setdefault(session.cwd, [])
+                if len(idle) < self.pool_size:
+                    idle.append(session)
+                    return
+        await session.close()
+
+    async def run(self, cmd: str, cwd: Optional[str] = None, timeout: Optional[float] = None,
+                  max_output_bytes: Optional[int] = None,
+                  on_output: Optional[OutputCallback] = None) -> ExecResult:
+        """Run cmd in a warm session rooted at cwd (default: the process cwd)."""
+        cwd = os.path.abspath(cwd or os.getcwd())
+        session = await self._acquire(cwd)
+        try:
+            result = await session.run(cmd, timeout or self.timeout,
+                                       max_output_bytes or self.max_output_bytes, on_output)
+        finally:
+            if not session.alive:
+                self.stats["killed"] += 1
+            await self._release(session)
+        if result.timed_out:
+            self.stats["timeouts"] += 1
+        return result
+
+    def stream(self, cmd: str, cwd: Optional[str] = None, timeout: Optional[float] = None,
+               max_output_bytes: Optional[int] = None) -> OutputStream:
+        """
+        Start cmd and iterate its output as it arrives:
+
+            stream = shell_executor.stream("pytest -x", cwd=root)
+            async for name, text in stream:   # name is "stdout", "stderr" or "note"
+                ...
+            stream.result                     # the ExecResult
+
+        Leaving the loop early should be followed by `await stream.aclose()`.
+        """
+        stream = OutputStream()
+        stream.task = asyncio.get_running_loop().create_task(
+            self.run(cmd, cwd, timeout, max_output_bytes, on_output=stream.push))
+        stream.task.add_done_callback(stream.finish)
+        return stream
+
+    def release(self, cwd: str) -> int:
+        """Kill the idle sessions rooted at cwd (e.g. a removed mission's directory)."""
+        with self._lock:
+            sessions = self._idle.pop(os.path.abspath(cwd), [])
+        for session in sessions:
+            session.kill()
+        return len(sessions)
+
+    def shutdown(self):
+        """Kill every idle session."""
+        with self._lock:
+            sessions = [s for idle in self._idle.values() for s in idle]
+            self._idle.clear()
+        for session in sessions:
+            session.kill()
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            idle = sum(len(v) for v in self._idle.values())
+        return {**self.stats, "idle": idle, "directories": len(self._idle)}
+
+
+shell_executor = ShellExecutor()
+
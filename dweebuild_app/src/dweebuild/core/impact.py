@@ -0,0 +1,223 @@
+import ast
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from .code_index import get_code_index
+from .config import config
+
+# Changing any of these can change how every test runs.
+GLOBAL_FILES = ("pytest.ini", "pyproject.toml", "setup.cfg", "tox.ini", "setup.py")
+
+
+def is_test_file(relpath: str) -> bool:
+    name = relpath.rsplit("/", 1)[-1]
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+@dataclass
+class TestSelection:
+    """What QA should run: `tests` (files) first, then the full suite if `checkpoint` (or only it, if `full`)."""
+    __test__ = False  # Not a pytest test class
+    tests: List[str]
+    full: bool
+    checkpoint: bool
+    reason: str
+    changed: List[str] = field(default_factory=list)
+    baseline: Dict[str, Tuple[float, int]] = field(default_factory=dict, repr=False)
+
+
+class ImpactMap:
+    """
+    Change-aware test selection for one project.
+
+    Source files are linked to the tests that can observe them through the
+    project's own imports (parsed with ast, re-parsed only when a file's
+    mtime or size changes, and followed transitively) and, when the project
+    has a .coverage file recorded with --cov-context=test, through coverage.
+    Changes are measured against the file stats of the last passing run, so
+    QA re-tests everything touched since then, plus whatever failed last
+    time. Every full_every-th verification is a checkpoint that also runs
+    the full suite.
+    """
+    def __init__(self, root: str, full_every: Optional[int] = None):
+        self.root = os.path.abspath(root)
+        self.index = get_code_index(self.root)
+        self.full_every = full_every or config.test_full_every
+        self._imports: Dict[str, Tuple[Tuple[float, int], Set[str]]] = {}  # file -> (stat, imported names)
+        self._coverage: Dict[str, Set[str]] = {}  # source file -> test files that executed it
+        self._coverage_stat: Optional[Tuple[float, int]] = None
+        self._verified: Optional[Dict[str, Tuple[float, int]]] = None  # File stats at the last passing run
+        self._suspects: Set[str] = set()  # Tests of a failing run, rerun until they pass
+        self.runs_since_full = 0
+        self._lock = threading.Lock()
+
+    # --- Dependency map --------------------------------------------------------
+
+    @staticmethod
+    def _module_names(relpath: str) -> List[str]:
+        """Every dotted name the file may be imported as (the import root is unknown)."""
+        parts = relpath[:-3].split("/")
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        return [".".join(parts[i:]) for i in range(len(parts)) if parts[i:]]
+
+    def _parse_imports(self, relpath: str) -> Set[str]:
+        try:
+            with open(os.path.join(self.root, relpath), "rb") as f:
+                tree = ast.parse(f.read(), relpath)
+        except (OSError, SyntaxError, ValueError):
+            return set()
+        package = relpath[:-3].split("/")[:-1]
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    base = package[:len(package) - node.level + 1] if node.level > 1 else package
+                    module = ".".join(base + ([node.module] if node.module else []))
+                else:
+                    module = node.module or ""
+                if module:
+                    names.add(module)
+                names.update(f"{module}.{alias.name}" if module else alias.name for alias in node.names)
+        return names
+
+    def _graph(self, stats: Dict[str, Tuple[float, int]]) -> Dict[str, Set[str]]:
+        """file -> project files that import it (directly)."""
+        sources = [p for p in stats if p.endswith(".py")]
+        for relpath in sources:
+            cached = self._imports.get(relpath)
+            if cached is None or cached[0] != stats[relpath]:
+                self._imports[relpath] = (stats[relpath], self._parse_imports(relpath))
+        for relpath in [p for p in self._imports if p not in stats]:
+            del self._imports[relpath]
+
+        modules: Dict[str, Set[str]] = {}
+        for relpath in sources:
+            for name in self._module_names(relpath):
+                modules.setdefault(name, set()).add(relpath)
+        importers: Dict[str, Set[str]] = {}
+        for relpath in sources:
+            for name in self._imports[relpath][1]:
+                # "import a.b.c" also runs a/__init__.py and a/b/__init__.py.
+                parts = name.split(".")
+                for i in range(1, len(parts) + 1):
+                    for target in modules.get(".".join(parts[:i]), ()):
+                        if target != relpath:
+                            importers.setdefault(target, set()).add(relpath)
+        return importers
+
+    def _load_coverage(self):
+        path = os.path.join(self.root, ".coverage")
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        if self._coverage_stat == (st.st_mtime, st.st_size):
+            return
+        self._coverage_stat = (st.st_mtime, st.st_size)
+        try:
+            import coverage
+            data = coverage.CoverageData(basename=path)
+            data.read()
+            coverage_map: Dict[str, Set[str]] = {}
+            for measured in data.measured_files():
+                relpath = os.path.relpath(measured, self.root).replace(os.sep, "/")
+                if relpath.startswith(".."):
+                    continue
+                for contexts in (data.contexts_by_lineno(measured) or {}).values():
+                    for context in contexts:
+                        if "::" in context:
+                            coverage_map.setdefault(relpath, set()).add(context.split("::", 1)[0])
+            self._coverage = coverage_map
+        except Exception:  # Optional dependency, or data without test contexts
+            self._coverage = {}
+
+    def affected(self, changed: List[str], stats: Dict[str, Tuple[float, int]]) -> Set[str]:
+        """Test files that import (transitively) or executed any of the changed files."""
+        importers = self._graph(stats)
+        self._load_coverage()
+        seen, stack = set(), [p for p in changed if p.endswith(".py")]
+        while stack:
+            relpath = stack.pop()
+            if relpath in seen:
+                continue
+            seen.add(relpath)
+            stack.extend(importers.get(relpath, ()))
+        tests = {p for p in seen if is_test_file(p) and p in stats}
+        for relpath in changed:
+            tests |= {t for t in self._coverage.get(relpath, ()) if t in stats}
+            if relpath.rsplit("/", 1)[-1] == "conftest.py":
+                folder = relpath.rsplit("/", 1)[0] + "/" if "/" in relpath else ""
+                tests |= {t for t in stats if is_test_file(t) and t.startswith(folder)}
+        return tests
+
+    # --- Selection -------------------------------------------------------------
+
+    def select(self) -> TestSelection:
+        """Plan the next QA run from what changed since the last passing one."""
+        with self._lock:
+            self.index.refresh()
+            stats = self.index.snapshot()
+            checkpoint = self.runs_since_full + 1 >= self.full_every
+            if self._verified is None:
+                return TestSelection([], True, False, "no passing run yet: full suite", list(stats), stats)
+            changed = sorted(p for p, st in stats.items() if self._verified.get(p) != st)
+            deleted = sorted(p for p in self._verified if p not in stats)
+            if deleted and any(p.endswith(".py") for p in deleted):
+                return TestSelection([], True, False, f"{len(deleted)} files deleted: full suite",
+                                     changed + deleted, stats)
+            if any(p.rsplit("/", 1)[-1] in GLOBAL_FILES for p in changed):
+                return TestSelection([], True, False, "test configuration changed: full suite", changed, stats)
+            tests = self.affected(changed, stats) | {t for t in self._suspects if t in stats}
+            reason = f"{len(tests)} test files affected by {len(changed)} changed files"
+            if checkpoint:
+                reason += ", then the full suite (checkpoint)"
+            return TestSelection(sorted(tests), False, checkpoint, reason, changed, stats)
+
+    def record(self, selection: TestSelection, passed: bool, full_ran: bool = False,
+               failing: Optional[List[str]] = None):
+        """
+        Feed back a run's outcome. A pass makes its baseline the new reference
+        point; a failure keeps the failing test files (or, without that detail,
+        every selected one) in the next selection until they pass.
+        """
+        with self._lock:
+            if full_ran:
+                self.runs_since_full = 0
+            else:
+                self.runs_since_full += 1
+            if passed:
+                self._verified = selection.baseline
+                if full_ran:
+                    self._suspects.clear()
+                else:
+                    self._suspects.difference_update(selection.tests)
+            else:
+                self._suspects |= set(failing if failing is not None else selection.tests)
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            return {"modules": len(self._imports), "covered": len(self._coverage),
+                    "suspects": len(self._suspects), "runs_since_full": self.runs_since_full}
+
+
+_maps: Dict[str, ImpactMap] = {}
+_maps_lock = threading.Lock()
+
+
+def get_impact_map(root: str) -> ImpactMap:
+    root = os.path.abspath(root)
+    with _maps_lock:
+        impact = _maps.get(root)
+        if impact is None:
+            impact = _maps[root] = ImpactMap(root)
+        return impact
+
+
+def drop_impact_map(root: str) -> Optional[ImpactMap]:
+    with _maps_lock:
+        return _maps.pop(os.path.abspath(root), None)
@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import config
+
+FSYNC_POLICIES = ("always", "batch", "never")
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+class Journal:
+    """
+    Append-only event journal (write-ahead log) in rotating JSONL segments.
+
+    append() only buffers the event under a lock, so callers on the event
+    loop never wait on disk. A background thread writes the buffer every
+    flush_interval seconds (or as soon as batch_size events are pending),
+    fsyncing per policy:
+      always - every append wakes the writer, which writes and fsyncs at once
+               (safest; appends made while it syncs share the next fsync)
+      batch  - each background flush is fsynced; a crash loses at most one interval
+      never  - leave it to the OS
+    Each event is one line: {"seq": n, "t": unix time, "k": kind, "d": data}.
+    """
+    def __init__(self, directory: str, fsync: str = "batch", flush_interval: float = 0.2,
+                 batch_size: int = 256, segment_bytes: int = 16 * 1024 * 1024):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, not {fsync!r}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.segment_bytes = segment_bytes
+        self.stats = {"appended": 0, "flushes": 0, "fsyncs": 0, "rotations": 0}
+
+        self._lock = threading.Lock()        # Guards the buffer and seq
+        self._write_lock = threading.Lock()  # Serializes file writes
+        self._buffer: List[str] = []
+        segments = self.segments()
+        self._segment_index = self._index_of(segments[-1]) if segments else 1
+        # The newest segment may be empty right after a rotation.
+        self._seq = next((seq for seq in map(self._last_seq, reversed(segments)) if seq), 0)
+        self._file = open(self._segment_path(self._segment_index), "a", encoding="utf-8")
+        if self._file.tell() and not self._ends_with_newline(self._segment_path(self._segment_index)):
+            self._file.write("\n")  # Seal a torn line left by a crash
+
+        self._closed = False
+        self._wakeup = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="dweebuild-journal", daemon=True)
+        self._flusher.start()
+
+    # --- Segments -------------------------------------------------------------
+
+    def _segment_path(self, index: int) -> Path:
+        return self.directory / f"{SEGMENT_PREFIX}{index:06d}{SEGMENT_SUFFIX}"
+
+    @staticmethod
+    def _index_of(path: Path) -> int:
+        return int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+    def size_bytes(self) -> int:
+        """Bytes on disk across all segments."""
+        return sum(path.stat().st_size for path in self.segments())
+
+    @staticmethod
+    def _ends_with_newline(path: Path) -> bool:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    @staticmethod
+    def _last_seq(path: Path, block: int = 65536) -> int:
+        """Seq of the last complete event in a segment, reading backwards from its end."""
+        with open(path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            partial = b""  # Start of a line that continues past the block read last
+            while end > 0:
+                start = max(0, end - block)
+                f.seek(start)
+                lines = (f.read(end - start) + partial).split(b"\n")
+                end = start
+                # The first line may begin in an earlier block unless this one starts the file.
+                partial = lines.pop(0) if start else b""
+                for line in reversed(lines):
+                    try:
+                        return json.loads(line)["seq"]
+                    except (ValueError, KeyError):
+                        continue  # Blank, or a torn write from a crash
+        return 0
+
+    # --- Writing --------------------------------------------------------------
+
+    @property
+    def seq(self) -> int:
+        """Seq of the newest appended event."""
+        return self._seq
+
+    def append(self, kind: str, **data: Any) -> int:
+        """Buffer an event; returns its seq."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Journal is closed")
+            self._seq += 1
+            seq = self._seq
+            self._buffer.append(json.dumps({"seq": seq, "t": round(time.time(), 3), "k": kind, "d": data},
+                                           separators=(",", ":"), default=str))
+            self.stats["appended"] += 1
+            pending = len(self._buffer)
+        if self.fsync == "always" or pending >= self.batch_size:
+            self._wakeup.set()
+        return seq
+
+    def flush(self):
+        """Write buffered events now (thread-safe; blocking)."""
+        with self._write_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+                self.stats["fsyncs"] += 1
+            self.stats["flushes"] += 1
+            if self._file.tell() >= self.segment_bytes:
+                self._rotate()
+
+    def flush_soon(self):
+        """Have the background thread write (and fsync) the buffer now; returns at once."""
+        self._wakeup.set()
+
+    def _rotate(self):
+        self._file.close()
+        self._segment_index += 1
+        self._file = open(self._segment_path(self._segment_index), "a", encoding="utf-8")
+        self.stats["rotations"] += 1
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except OSError:
+                pass  # Disk trouble; the events stay lost but the app keeps running
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._flusher.join()
+        self.flush()
+        self._file.close()
+
+    def prune(self, upto_seq: int) -> int:
+        """Delete whole segments whose events all have seq <= upto_seq (e.g. after a snapshot)."""
+        removed = 0
+        with self._write_lock:
+            for path in self.segments():
+                if self._index_of(path) >= self._segment_index:
+                    break
+                if self._last_seq(path) > upto_seq:
+                    break
+                path.unlink()
+                removed += 1
+        return removed
+
+    # --- Reading --------------------------------------------------------------
+
+    def replay(self, after_seq: int = 0) -> Iterator[Dict[str, Any]]:
+        """Events with seq > after_seq, in order, streamed segment by segment."""
+        return replay(self.directory, after_seq)
+
+    def summary(self) -> Dict[str, Any]:
+        return {**self.stats, "seq": self._seq, "pending": len(self._buffer),
+                "segments": len(self.segments()), "fsync": self.fsync}
+
+
+def replay(directory: str, after_seq: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Stream events from a journal directory without opening it for writing.
+    A torn last line (crash mid-write) is skipped.
+    """
+    for path in sorted(Path(directory).glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")):
+        if after_seq and Journal._last_seq(path) <= after_seq:
+            continue  # Already covered by a snapshot
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event["seq"] > after_seq:
+                    yield event
+
+
+def open_journal(directory: Optional[str] = None) -> Optional[Journal]:
+    """A Journal configured from JOURNAL_* settings, or None when journaling is off."""
+    directory = directory or config.journal_dir
+    if not directory:
+        return None
+    return Journal(directory, fsync=config.journal_fsync, flush_interval=config.journal_flush_ms / 1000,
+                   segment_bytes=config.journal_segment_mb * 1024 * 1024)
@@ -1,49 +1,607 @@
 import os
-import json
-from groq import AsyncGroq
+import time
+import random
+import asyncio
+import itertools
+import logging
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .config import config
+from .cache import ResponseCache, request_key
+from .action_parser import parse_json
+from .providers import LLMProvider, ScriptedProvider, PROVIDER_TYPES
+from .router import LLMRouter
+from .usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class ClientPool:
+    """
+    Process-wide registry of provider SDK clients.
+
+    Keeps one keep-alive HTTP connection pool per (provider, api_key, event
+    loop) so every agent reuses warm connections instead of paying a TLS
+    handshake per call. Async HTTP pools are bound to the loop that opened
+    them, and the dashboards run a background dispatch thread next to the
+    Streamlit loop (which calls asyncio.run() on every rerun), so each loop
+    gets its own clients. A client is closed when its loop shuts down
+    (asyncio.run cancels the watcher task left on it), and entries of loops
+    that were closed some other way are dropped on the next get().
+    """
+    def __init__(self, max_connections: int = None, max_keepalive: int = None):
+        self.max_connections = max_connections or config.llm_max_connections
+        self.max_keepalive = max_keepalive or config.llm_max_keepalive_connections
+        self._clients: Dict[Tuple[str, str, Any], Any] = {}
+        self._closers: Dict[Tuple[str, str, Any], asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.clients_created = 0
+        self.clients_closed = 0
+
+    def get(self, provider: str, api_key: str):
+        """Return the shared SDK client for provider/key on the current loop."""
+        loop = _running_loop()
+        key = (provider, api_key, loop)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                return client
+            for stale in [k for k in self._clients if k[2] is not None and k[2].is_closed()]:
+                # Closed without running its shutdown; nothing left to await the close on.
+                del self._clients[stale]
+                self._closers.pop(stale, None)
+            client = self._build(provider, api_key)
+            self._clients[key] = client
+            self.clients_created += 1
+            if loop is not None:
+                self._closers[key] = loop.create_task(self._close_with_loop(key, client),
+                                                      name="dweebuild-client-closer")
+            return client
+
+    async def _close_with_loop(self, key: Tuple[str, str, Any], client):
+        try:
+            await asyncio.Event().wait()  # Until the loop cancels its leftover tasks on shutdown
+        finally:
+            await self._discard(key, client)
+
+    async def _discard(self, key: Tuple[str, str, Any], client):
+        with self._lock:
+            if self._clients.get(key) is not client:
+                return  # Already closed
+            del self._clients[key]
+            self._closers.pop(key, None)
+            self.clients_closed += 1
+        await client.close()
+
+    def _build(self, provider: str, api_key: str):
+        import httpx
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=config.llm_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(config.llm_request_timeout, connect=10.0),
+        )
+        if provider == "groq":
+            from groq import AsyncGroq
+            return AsyncGroq(api_key=api_key, http_client=http_client)
+        if provider == "openai":
+            from openai import AsyncOpenAI
+            return AsyncOpenAI(api_key=api_key, http_client=http_client)
+        if provider == "anthropic":
+            from anthropic import AsyncAnthropic
+            return AsyncAnthropic(api_key=api_key, http_client=http_client)
+        raise ValueError(f"Unknown LLM provider: {provider}")
+
+    async def aclose(self):
+        """Close every client owned by the running loop."""
+        loop = _running_loop()
+        with self._lock:
+            owned = [(key, client, self._closers.get(key)) for key, client in self._clients.items()
+                     if key[2] is loop]
+        closers = [task for _, _, task in owned if task is not None]
+        for task in closers:
+            task.cancel()
+        await asyncio.gather(*closers, return_exceptions=True)
+        for key, client, _ in owned:
+            await self._discard(key, client)  # A closer cancelled before it started did not
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "clients": len(self._clients),
+            "clients_created": self.clients_created,
+            "clients_closed": self.clients_closed,
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+        }
+
+
+# Global pool instance
+client_pool = ClientPool()
+
+
+class LLMError(Exception):
+    """Raised when an LLM call fails after all retries."""
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _TokenBucket:
+    """Continuously refilling bucket holding at most one minute of budget."""
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.fill_rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def delay_for(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # Requests larger than the whole bucket wait for a full bucket.
+        need = min(amount, self.capacity)
+        if self.level >= need:
+            return 0.0
+        return (need - self.level) / self.fill_rate
+
+    def consume(self, amount: float):
+        # May go negative when actual usage exceeds the estimate; the debt
+        # is paid back by the refill before the next request is admitted.
+        self.level -= amount
+
+
+class RateLimiter:
+    """
+    Shared async limiter for requests-per-minute and tokens-per-minute.
+
+    Callers are admitted strictly in arrival order. The limiter avoids
+    asyncio primitives that bind to a loop, so a single instance survives
+    the dashboards' asyncio.run() per rerun.
+    """
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None):
+        self.requests = _TokenBucket(requests_per_minute or config.llm_requests_per_minute)
+        self.tokens = _TokenBucket(tokens_per_minute or config.llm_tokens_per_minute)
+        self.blocked_until = 0.0
+        self._waiting: deque = deque()
+        self._tickets = itertools.count()
+        self.stats = {"admitted": 0, "throttled_seconds": 0.0, "pauses": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of callers currently waiting for admission."""
+        return len(self._waiting)
+
+    def _delay(self, tokens: int) -> float:
+        now = time.monotonic()
+        return max(
+            self.blocked_until - now,
+            self.requests.delay_for(1, now),
+            self.tokens.delay_for(tokens, now),
+        )
+
+    async def acquire(self, tokens: int = 1):
+        """Wait until one request carrying ~tokens may be sent."""
+        ticket = next(self._tickets)
+        self._waiting.append(ticket)
+        started = time.monotonic()
+        try:
+            while True:
+                if self._waiting[0] == ticket:
+                    delay = self._delay(tokens)
+                    if delay <= 0:
+                        self.requests.consume(1)
+                        self.tokens.consume(tokens)
+                        self.stats["admitted"] += 1
+                        return
+                else:
+                    delay = self.POLL_INTERVAL
+                await asyncio.sleep(delay)
+        finally:
+            self._waiting.remove(ticket)
+            self.stats["throttled_seconds"] += time.monotonic() - started
+
+    def record_usage(self, estimated: int, actual: Optional[int]):
+        """Correct the token bucket once the provider reports real usage."""
+        if actual is not None:
+            self.tokens.consume(actual - estimated)
+
+    def pause(self, seconds: float):
+        """Hold every caller back, e.g. after a 429 with retry-after."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.stats["pauses"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        return {**self.stats, "queue_depth": self.queue_depth,
+                "request_budget": round(self.requests.level, 2),
+                "token_budget": round(self.tokens.level, 2)}
+
+
+# Global limiter instance
+rate_limiter = RateLimiter()
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Cheap prompt-size estimate (~4 characters per token) plus reply headroom."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + config.llm_completion_token_estimate
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    return getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    status = _status_code(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # Groq, OpenAI and Anthropic SDKs share these exception names.
+    return any(cls.__name__ in ("APIConnectionError", "APITimeoutError") for cls in type(exc).__mro__)
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def coalesce_key(messages: List[Dict[str, str]], temperature: float, tier: str) -> str:
+    """Key for in-flight deduplication: the exact messages, since whitespace matters in code."""
+    return request_key("inflight", tier, messages, temperature)
+
+
+class _StreamFanout:
+    """
+    Replays one upstream token stream to any number of subscribers. When the
+    last subscriber leaves early, the upstream stream is cancelled, unless
+    `finish` is set (a cacheable reply), in which case it runs to the end.
+    """
+    def __init__(self, source: AsyncIterator[str], finish: bool = False):
+        self.chunks: List[str] = []
+        self.done = False
+        self.finish = finish
+        self.abandoned = False
+        self.subscribers = 0
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[str]):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._wake()
+        except BaseException as e:
+            self.error = e if isinstance(e, LLMError) else LLMError(f"Shared stream failed: {e!r}")
+        finally:
+            self.done = True
+            self._wake()
+
+    def _wake(self):
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        self.subscribers += 1
+        i = 0
+        try:
+            while True:
+                if i < len(self.chunks):
+                    yield self.chunks[i]
+                    i += 1
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if not self.subscribers and not self.done and not self.finish:
+                self.abandoned = True
+                self.task.cancel()
+
+
+def build_router(api_key: str = None, pool: ClientPool = None, limiter: RateLimiter = None) -> LLMRouter:
+    """
+    Build the provider router from Config. LLM_PROVIDERS lists providers in
+    preference order; those without an API key are skipped. "scripted" adds
+    the deterministic stand-in provider for local runs.
+    """
+    pool = pool or client_pool
+    keys = {
+        "groq": api_key or config.groq_api_key,
+        "openai": config.openai_api_key,
+        "anthropic": config.anthropic_api_key,
+    }
+    providers = []
+    for name in config.llm_providers:
+        if name == "scripted":
+            providers.append(ScriptedProvider())
+        elif name in PROVIDER_TYPES and keys.get(name):
+            # Groq uses the shared limiter; other providers get their own budget.
+            provider_limiter = (limiter or rate_limiter) if name == "groq" else RateLimiter()
+            providers.append(PROVIDER_TYPES[name](keys[name], pool, limiter=provider_limiter))
+    if not providers:
+        raise ValueError("GROQ_API_KEY not found in environment variables.")
+    return LLMRouter(providers, cost_weight=config.llm_cost_weight)
+
 
 class LLMClient:
     """
-    Wrapper for Groq API interactions.
+    Provider-agnostic LLM interface.
+    Each call is routed by LLMRouter to the best available provider for the
+    requested tier ("default" or "fast") and fails over when one degrades.
+    SDK clients come from the shared ClientPool, so instances are cheap.
+    Completions go through an optional ResponseCache (LLM_CACHE_ENABLED) and the
+    provider's RateLimiter; 429/5xx responses are retried with jittered backoff.
     """
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, pool: ClientPool = None, cache: ResponseCache = None,
+                 limiter: RateLimiter = None, router: LLMRouter = None, providers: List[LLMProvider] = None):
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY not found in environment variables.")
-        self.client = AsyncGroq(api_key=self.api_key)
-        self.model = "llama-3.3-70b-versatile"
+        self.pool = pool or client_pool
+        self.limiter = limiter or rate_limiter
+        if router is None:
+            router = LLMRouter(providers) if providers else build_router(self.api_key, self.pool, self.limiter)
+        self.router = router
+        if cache is None and config.llm_cache_enabled:
+            cache = ResponseCache(
+                config.llm_cache_dir,
+                max_bytes=config.llm_cache_max_mb * 1024 * 1024,
+                max_age=config.llm_cache_max_age_hours * 3600,
+                max_temperature=config.llm_cache_max_temperature,
+            )
+        self.cache = cache
+        self.max_retries = config.llm_max_retries
+        self.coalesce = config.llm_coalesce
+        self._inflight: Dict[Tuple[asyncio.AbstractEventLoop, str], Any] = {}
+        self._finishing: set = set()  # Streams still running for the cache after their readers left
+        self.stats = {"calls": 0, "retries": 0, "failovers": 0, "failures": 0, "coalesced": 0}
+
+    def _cacheable(self, temperature: float) -> bool:
+        return self.cache is not None and self.cache.should_cache(temperature)
+
+    def _cache_key(self, messages: List[Dict[str, str]], temperature: float, tier: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        if not self.cache.should_cache(temperature):
+            self.cache.stats["bypassed"] += 1
+            return None
+        return request_key("router", tier, messages, temperature)
+
+    async def complete(self, messages: List[Dict[str, str]], temperature: float = 0.2,
+                       tier: str = "default") -> str:
+        """
+        Send a list of chat messages and return the completion text.
+        Concurrent identical requests share one upstream call.
+        """
+        if not self.coalesce:
+            return await self._complete(messages, temperature, tier)
+
+        # Futures belong to one loop, so only callers on the same loop can share.
+        key = (asyncio.get_running_loop(), coalesce_key(messages, temperature, tier))
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._complete(messages, temperature, tier))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._release(k, t))
+        # Shield so one cancelled waiter does not cancel the call for the others.
+        return await asyncio.shield(task)
+
+    def _release(self, key: Tuple[asyncio.AbstractEventLoop, str], done):
+        if self._inflight.get(key) is done:
+            del self._inflight[key]
+        if isinstance(done, asyncio.Future) and not done.cancelled():
+            done.exception()  # Mark retrieved; waiters re-raise it themselves.
+
+    async def _complete(self, messages: List[Dict[str, str]], temperature: float, tier: str) -> str:
+        key = self._cache_key(messages, temperature, tier)
+        if key is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                return cached
+
+        completion = await self._dispatch(messages, temperature, tier)
+        if key is not None:
+            await self.cache.aput(key, completion.text)
+        return completion.text
+
+    async def stream(self, messages: List[Dict[str, str]], temperature: float = 0.2,
+                     tier: str = "default") -> AsyncIterator[str]:
+        """
+        Yield the completion as text deltas. Cached responses are replayed as
+        a single chunk; retries and failover only happen before the first delta.
+        Concurrent identical requests subscribe to one upstream stream. A
+        cacheable reply is read to the end and stored even when the caller
+        stops early (as agents do once their action is parsed).
+        """
+        finish = self._cacheable(temperature)
+        if not self.coalesce and not finish:
+            async for delta in self._stream(messages, temperature, tier):
+                yield delta
+            return
+
+        key = (asyncio.get_running_loop(), coalesce_key(messages, temperature, tier))
+        fanout = self._inflight.get(key) if self.coalesce else None
+        if fanout is not None and not fanout.abandoned:
+            self.stats["coalesced"] += 1
+        else:
+            fanout = _StreamFanout(self._stream(messages, temperature, tier), finish=finish)
+            if self.coalesce:
+                self._inflight[key] = fanout
+                fanout.task.add_done_callback(lambda t, k=key, f=fanout: self._release(k, f))
+            # The loop only holds tasks weakly; keep this one until it has finished.
+            self._finishing.add(fanout.task)
+            fanout.task.add_done_callback(self._finishing.discard)
+        subscription = fanout.subscribe()
+        try:
+            async for delta in subscription:
+                yield delta
+        finally:
+            await subscription.aclose()
+
+    async def _stream(self, messages: List[Dict[str, str]], temperature: float, tier: str) -> AsyncIterator[str]:
+        key = self._cache_key(messages, temperature, tier)
+        if key is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                yield cached
+                return
+
+        first, rest, provider, latency = await self._dispatch(messages, temperature, tier, stream=True)
+        parts = [first] if first else []
+        try:
+            if first:
+                yield first
+            async for delta in rest:
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            self.router.record_failure(provider)
+            raise LLMError(str(e), _status_code(e)) from e
+        # Judged only once the stream has ended normally: a failed one was
+        # recorded above, and a cancelled or abandoned one says nothing.
+        self.router.record_success(provider, latency)
+        if key is not None:
+            await self.cache.aput(key, "".join(parts))
+
+    async def _dispatch(self, messages: List[Dict[str, str]], temperature: float, tier: str,
+                        stream: bool = False):
+        """
+        Route one call. Each candidate provider is retried on 429/5xx and
+        connection errors (once if another provider can take over, up to
+        max_retries for the last one) before failing over to the next. The
+        router records one failure per provider given up on, not per attempt.
+        Returns a Completion, or (first_delta, remaining_iterator, provider,
+        time_to_first_delta) when streaming; the caller records the outcome.
+        """
+        estimate = estimate_tokens(messages)
+        candidates = self.router.candidates(tier)
+        last_error = None
+        for index, provider in enumerate(candidates):
+            model = provider.model_for(tier)
+            limiter = provider.limiter or self.limiter
+            retries = self.max_retries if index == len(candidates) - 1 else min(1, self.max_retries)
+            for attempt in range(retries + 1):
+                await limiter.acquire(estimate)
+                self.stats["calls"] += 1
+                started = time.monotonic()
+                try:
+                    if stream:
+                        rest = provider.stream(messages, model, temperature).__aiter__()
+                        try:
+                            first = await rest.__anext__()
+                        except StopAsyncIteration:
+                            first = ""
+                        result, tokens = (first, rest, provider, time.monotonic() - started), None
+                    else:
+                        result = await provider.complete(messages, model, temperature)
+                        tokens = result.total_tokens
+                except Exception as e:
+                    last_error = e
+                    if not _is_retryable(e) or attempt == retries:
+                        self.router.record_failure(provider)
+                        break
+                    delay = _retry_after(e)
+                    if delay is None:
+                        delay = backoff_delay(attempt)
+                    if _status_code(e) == 429:
+                        limiter.pause(delay)
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(delay)
+                    continue
+                if not stream:
+                    self.router.record_success(provider, time.monotonic() - started, tokens)
+                limiter.record_usage(estimate, tokens)
+                record_usage(llm_calls=1, llm_tokens=tokens or estimate,
+                             llm_seconds=time.monotonic() - started)
+                return result
+            if index < len(candidates) - 1:
+                self.stats["failovers"] += 1
+
+        self.stats["failures"] += 1
+        raise LLMError(str(last_error), _status_code(last_error)) from last_error
 
-    async def chat(self, system_prompt: str, user_prompt: str, temperature: float = 0.2) -> str:
+    async def chat(self, system_prompt: str, user_prompt: str, temperature: float = 0.2,
+                   raise_on_error: bool = False, tier: str = "default") -> str:
         """
-        Send a chat completion request to Groq.
+        Send a chat completion request to the routed provider.
+        With raise_on_error, failures raise LLMError instead of returning an
+        "LLM ERROR: ..." string.
         """
         try:
-            chat = await self.client.chat.completions.create(
-                messages=[
+            return await self.complete(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                model=self.model,
-                temperature=temperature
+                temperature=temperature,
+                tier=tier
             )
-            return chat.choices[0].message.content
         except Exception as e:
+            if raise_on_error:
+                raise e if isinstance(e, LLMError) else LLMError(str(e)) from e
             return f"LLM ERROR: {str(e)}"
 
-    async def get_json(self, system_prompt: str, user_prompt: str, temperature: float = 0.1) -> dict:
+    async def get_json(self, system_prompt: str, user_prompt: str, temperature: float = 0.1,
+                       tier: str = "default") -> dict:
         """
         Expects a JSON response from the LLM and parses it.
         """
-        response = await self.chat(system_prompt, user_prompt + "\n\nRETURN JSON ONLY.", temperature)
-        try:
-            # Naive cleanup for markdown code blocks if present
-            clean_res = response.strip()
-            if "```json" in clean_res:
-                clean_res = clean_res.split("```json")[1].split("```")[0]
-            elif "```" in clean_res:
-                clean_res = clean_res.split("```")[1].split("```")[0]
-            
-            return json.loads(clean_res)
-        except json.JSONDecodeError:
-            print(f"FAILED TO PARSE JSON: {response}")
+        response = await self.chat(system_prompt, user_prompt + "\n\nRETURN JSON ONLY.", temperature, tier=tier)
+        result = parse_json(response)
+        if not isinstance(result, dict):
+            logger.warning("get_json: no JSON object in reply: %s", response[:500])
             return {}
+        return result
+
+
+_shared_clients: Dict[str, LLMClient] = {}
+
+
+def get_llm_client(api_key: str = None) -> LLMClient:
+    """
+    Return the process-wide LLMClient for api_key (defaults to GROQ_API_KEY;
+    other providers are configured through LLM_PROVIDERS and their own keys).
+    Agents, the Orchestrator and the dashboards all share it.
+    """
+    key = api_key or os.getenv("GROQ_API_KEY")
+    client = _shared_clients.get(key)
+    if client is None:
+        client = LLMClient(api_key=key)
+        _shared_clients[key] = client
+    return client
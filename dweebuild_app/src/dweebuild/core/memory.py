@@ -1,35 +1,206 @@
+import threading
+import time
+import uuid
 from collections import deque
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class LogRecord:
+    """
+    One log entry. Reads like the old dict entries (entry["source"],
+    entry["timestamp"], dict(entry)) without carrying a dict per record.
+    """
+    __slots__ = ("seq", "ts", "wall", "source", "level", "message")
+    FIELDS = ("timestamp", "source", "level", "message")
+
+    def __init__(self, seq: int, source: str, level: str, message: str, wall: Optional[float] = None):
+        self.seq = seq
+        self.ts = time.monotonic()  # Ordering and durations
+        self.wall = wall or time.time()  # Display only
+        self.source = source
+        self.level = level
+        self.message = message
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(self.wall).strftime("%H:%M:%S")
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS and key != "seq":
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.FIELDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self.FIELDS}
+
+    def __repr__(self):
+        return f"LogRecord({self.seq}, {self.source!r}, {self.level!r}, {self.message[:40]!r})"
+
 
 class ProjectMemory:
     """
     Shared memory storage for the Dweebuild session.
     Stores logs, knowledge, and file caches shared between agents.
+
+    Logs live in a fixed-size ring buffer addressed by sequence number, with
+    per-source and per-level indexes of sequence numbers. Appends are O(1)
+    (the evicted record is always the oldest entry of its indexes), and
+    reads cost O(k) in the number of records returned, not in capacity.
+
+    With a Journal attached, every log, context update and recorded event
+    is also appended to it (buffered, off the event loop), and replay()
+    rebuilds the memory from those events after a restart.
     """
-    def __init__(self):
-        self.logs: deque = deque(maxlen=1000)
+    def __init__(self, capacity: int = 1000, journal=None):
+        self.capacity = capacity
+        self._ring: List[Optional[LogRecord]] = [None] * capacity
+        self._next_seq = 1
+        self._by_source: Dict[str, deque] = {}
+        self._by_level: Dict[str, deque] = {}
+        self._log_lock = threading.Lock()
         self.kv_store: Dict[str, Any] = {}
         self.project_context: Dict[str, str] = {} # e.g. path -> content summary
-    
-    def add_log(self, source: str, message: str, level: str = "INFO"):
+        self.journal = journal
+        # Log seqs only mean something within one run: a new process, or logs
+        # re-added from a snapshot or journal, starts a new one.
+        self.run_id = uuid.uuid4().hex
+
+    def add_log(self, source: str, message: str, level: str = "INFO") -> LogRecord:
         """Add a centralized log entry."""
-        ts = datetime.now().strftime("%H:%M:%S")
-        entry = {
-            "timestamp": ts,
-            "source": source,
-            "level": level,
-            "message": message
-        }
-        self.logs.append(entry)
-        # In a real app, we might write to disk or db here
-        
-    def get_logs(self, limit: int = 50) -> List[Dict]:
-        """Retrieve recent logs."""
-        return list(self.logs)[-limit:]
+        if self.journal is not None:
+            self.journal.append("log", source=source, level=level, message=message)
+        return self._add_record(source, level, message)
+
+    def _add_record(self, source: str, level: str, message: str, wall: Optional[float] = None) -> LogRecord:
+        with self._log_lock:
+            record = LogRecord(self._next_seq, source, level, message, wall)
+            slot = record.seq % self.capacity
+            evicted = self._ring[slot]
+            if evicted is not None:
+                self._unindex(self._by_source, evicted.source)
+                self._unindex(self._by_level, evicted.level)
+            self._ring[slot] = record
+            self._by_source.setdefault(source, deque()).append(record.seq)
+            self._by_level.setdefault(level, deque()).append(record.seq)
+            self._next_seq += 1
+        return record
+
+    @staticmethod
+    def _unindex(index: Dict[str, deque], key: str):
+        seqs = index[key]
+        seqs.popleft()
+        if not seqs:
+            del index[key]
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest log (0 when empty)."""
+        return self._next_seq - 1
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest log still held."""
+        return max(1, self._next_seq - self.capacity)
+
+    def __len__(self) -> int:
+        return self._next_seq - self.first_seq
+
+    @property
+    def logs(self) -> List[LogRecord]:
+        return self.get_logs(self.capacity)
+
+    def _record(self, seq: int) -> LogRecord:
+        return self._ring[seq % self.capacity]
+
+    def get_logs(self, limit: int = 50, source: Optional[str] = None, level: Optional[str] = None,
+                 since: int = 0) -> List[LogRecord]:
+        """
+        The newest `limit` logs, oldest first, optionally only those from
+        `source` and/or at `level`, and only with seq > since.
+        """
+        if limit <= 0:
+            return []
+        with self._log_lock:
+            low = max(since + 1, self.first_seq)
+            if source is None and level is None:
+                start = max(low, self._next_seq - limit)
+                return [self._record(seq) for seq in range(start, self._next_seq)]
+            # Walk the smaller index backwards; the other filter is checked per record.
+            candidates = [index.get(key, ()) for index, key in
+                          ((self._by_source, source), (self._by_level, level)) if key is not None]
+            seqs = min(candidates, key=len)
+            picked = []
+            for seq in reversed(seqs):
+                if seq < low or len(picked) == limit:
+                    break
+                record = self._record(seq)
+                if (source is None or record.source == source) and (level is None or record.level == level):
+                    picked.append(record)
+            picked.reverse()
+            return picked
+
+    def read_logs(self, cursor: int = 0, limit: int = 500) -> Tuple[List[LogRecord], int]:
+        """
+        Logs with seq > cursor (oldest first, at most `limit`) and the cursor
+        to pass next time. Records evicted before they were read are skipped.
+        """
+        with self._log_lock:
+            start = max(cursor + 1, self.first_seq)
+            end = min(self._next_seq, start + limit)
+            records = [self._record(seq) for seq in range(start, end)]
+        return records, (records[-1].seq if records else max(cursor, start - 1))
+
+    def iter_logs(self, reverse: bool = False) -> Iterator[LogRecord]:
+        records = self.logs
+        return reversed(records) if reverse else iter(records)
+
+    def log_counts(self) -> Dict[str, Dict[str, int]]:
+        """Live record counts per source and per level (O(sources + levels))."""
+        with self._log_lock:
+            return {"source": {k: len(v) for k, v in self._by_source.items()},
+                    "level": {k: len(v) for k, v in self._by_level.items()}}
 
     def update_context(self, key: str, value: Any):
         self.kv_store[key] = value
+        if self.journal is not None:
+            self.journal.append("kv", key=key, value=value)
+
+    def record(self, kind: str, **data: Any):
+        """Journal a non-memory event (e.g. task lifecycle) alongside the logs."""
+        if self.journal is not None:
+            self.journal.append(kind, **data)
+
+    def load_logs(self, entries: Iterable[Dict[str, Any]]):
+        """Re-add saved log entries (e.g. from a session snapshot) without journaling them."""
+        self.run_id = uuid.uuid4().hex
+        for entry in entries:
+            self._add_record(entry["source"], entry["level"], entry["message"])
+
+    def replay(self, events: Iterable[Dict[str, Any]]) -> int:
+        """
+        Apply journaled log and kv events (without re-journaling them); other
+        kinds are left to their owners. Returns the last seq seen.
+        """
+        self.run_id = uuid.uuid4().hex
+        last = 0
+        for event in events:
+            data = event["d"]
+            if event["k"] == "log":
+                self._add_record(data["source"], data["level"], data["message"], event.get("t"))
+            elif event["k"] == "kv":
+                self.kv_store[data["key"]] = data["value"]
+            last = event["seq"]
+        return last
 
     def get_context(self, key: str) -> Any:
         return self.kv_store.get(key)
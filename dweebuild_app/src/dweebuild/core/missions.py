@@ -0,0 +1,238 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .agent import BaseAgent
+from .broker import WorkerPool, open_broker
+from .code_index import drop_code_index
+from .config import config
+from .executor import shell_executor
+from .impact import drop_impact_map
+from .journal import open_journal
+from .llm import LLMClient, get_llm_client
+from .modes import WorkMode
+from .orchestrator import Orchestrator
+from .scheduler import FairShare
+from .usage import usage_meter
+
+AgentFactory = Callable[[str, str], List[BaseAgent]]
+
+
+def default_agents(objective: str, working_dir: str) -> List[BaseAgent]:
+    """The standard architect / engineer / QA crew with the full toolbelt, rooted at working_dir."""
+    from ..agents import ArchitectAgent, EngineerAgent, QAAgent
+    from ..tools.std_tools import (FileReadTool, GrepTool, GitTool, PipTool, WebSearchTool,
+                                   DirectoryTool, LintTool, FormatTool, ComplexityTool, CoverageTool)
+    crew = [ArchitectAgent(objective, working_dir), EngineerAgent(objective, working_dir),
+            QAAgent(objective, working_dir)]
+    for agent in crew:
+        for tool in (FileReadTool(working_dir), GrepTool(working_dir), GitTool(working_dir), PipTool(),
+                     WebSearchTool(), DirectoryTool(working_dir), LintTool(working_dir),
+                     FormatTool(working_dir), ComplexityTool(working_dir), CoverageTool(working_dir)):
+            agent.equip(tool)
+    return crew
+
+
+@dataclass
+class Mission:
+    id: str
+    objective: str
+    working_dir: str
+    orchestrator: Orchestrator
+    weight: float = 1.0
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    error: Optional[str] = None
+    task: Optional[asyncio.Task] = None  # The mission's dispatch loop
+
+    @property
+    def status(self) -> str:
+        if self.task is None:
+            return "queued"
+        if not self.task.done():
+            return "running"
+        if self.task.cancelled():
+            return "cancelled"
+        return "failed" if self.error else "done"
+
+
+class MissionManager:
+    """
+    Hosts many missions in one process. Each mission gets its own
+    Orchestrator (working directory, memory, task queue); all of them share
+    the LLM client (connection pool, cache, rate limiter), the optional
+    broker worker pool, and two FairShare limits - agent runs and tool calls -
+    so a mission with a long backlog cannot starve the others. Usage is
+    metered per mission through usage.current_mission.
+    """
+    def __init__(self, root: Optional[str] = None, agent_factory: AgentFactory = default_agents,
+                 llm: Optional[LLMClient] = None, agent_slots: Optional[int] = None,
+                 tool_slots: Optional[int] = None):
+        self.root = os.path.abspath(root or config.missions_root)
+        self.agent_factory = agent_factory
+        self.llm = llm or get_llm_client()
+        self.fair_share = FairShare(agent_slots or config.mission_agent_slots)
+        self.tool_share = FairShare(tool_slots or config.mission_tool_slots)
+        self.missions: Dict[str, Mission] = {}
+        self.broker = None
+        self.workers: Optional[WorkerPool] = None
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def create(self, objective: str, mode: WorkMode = WorkMode.SINGLE, mission_id: Optional[str] = None,
+               weight: float = 1.0, working_dir: Optional[str] = None) -> Mission:
+        """Set up a mission and queue its design task; it starts on the next serve() pass."""
+        mission_id = mission_id or uuid.uuid4().hex[:8]
+        with self._lock:
+            if mission_id in self.missions:
+                raise ValueError(f"Mission {mission_id} already exists")
+            working_dir = os.path.abspath(working_dir or os.path.join(self.root, mission_id))
+            os.makedirs(working_dir, exist_ok=True)
+
+            journal = open_journal(os.path.join(config.journal_dir, mission_id)) if config.journal_dir else None
+            orc = Orchestrator(mode=mode, llm=self.llm, broker=self.broker, journal=journal)
+            orc.mission_id = mission_id
+            orc.fair_share = self.fair_share
+            orc.tool_share = self.tool_share
+            self.fair_share.weights[mission_id] = weight
+            self.tool_share.weights[mission_id] = weight
+            for agent in self.agent_factory(objective, working_dir):
+                orc.register_agent(agent)
+            orc.start()
+            orc.add_task(f"Design: {objective}")
+
+            mission = Mission(mission_id, objective, working_dir, orc, weight)
+            self.missions[mission_id] = mission
+        self._wake()
+        return mission
+
+    def get(self, mission_id: str) -> Mission:
+        return self.missions[mission_id]
+
+    def cancel(self, mission_id: str):
+        """Stop a mission now; in-flight agent runs are cancelled."""
+        mission = self.missions[mission_id]
+        mission.orchestrator.is_running = False
+        mission.orchestrator.cancel()
+
+    def remove(self, mission_id: str) -> Mission:
+        """
+        Forget a finished mission and release what it held: usage counters,
+        its journal, idle shells and code/test indexes for its directory
+        (the directory itself is kept).
+        """
+        mission = self.missions[mission_id]
+        if mission.status in ("queued", "running"):
+            raise ValueError(f"Mission {mission_id} is still {mission.status}")
+        with self._lock:
+            del self.missions[mission_id]
+        self.fair_share.weights.pop(mission_id, None)
+        self.tool_share.weights.pop(mission_id, None)
+        usage_meter.pop(mission_id)
+        journal = mission.orchestrator.memory.journal
+        if journal is not None:
+            journal.close()
+        shell_executor.release(mission.working_dir)
+        drop_impact_map(mission.working_dir)
+        drop_code_index(mission.working_dir)
+        return mission
+
+    def start_workers(self, count: Optional[int] = None) -> WorkerPool:
+        """One broker worker pool for every mission (each Orchestrator keeps its own coordinator id)."""
+        if self.workers is None:
+            self.broker = open_broker(config.broker_url)
+            self.workers = WorkerPool(self.broker, count or config.worker_processes or 1)
+            self.workers.start()
+            for mission in self.missions.values():
+                mission.orchestrator.broker = self.broker
+        return self.workers
+
+    def stop_workers(self):
+        if self.workers is not None:
+            self.workers.stop()
+            self.workers = None
+
+    # --- Hosting -------------------------------------------------------------
+
+    async def serve(self, until_idle: bool = False):
+        """
+        Run every mission's dispatch loop on this event loop, picking up new
+        missions as they are created. With until_idle, return once no mission
+        is running; otherwise run until stop().
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        try:
+            while not self._stopping:
+                self._wakeup.clear()
+                for mission in list(self.missions.values()):
+                    if mission.task is None:
+                        mission.task = self._loop.create_task(self._run(mission))
+                if until_idle and not any(m.status == "running" for m in self.missions.values()):
+                    break
+                await self._wakeup.wait()
+        finally:
+            running = [m.task for m in self.missions.values() if m.task is not None and not m.task.done()]
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            self._loop = None
+            self._wakeup = None
+
+    async def _run(self, mission: Mission):
+        try:
+            await mission.orchestrator.dispatch()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            mission.error = f"{type(e).__name__}: {e}"
+        finally:
+            mission.finished = time.time()
+            self._wake()
+
+    def _wake(self):
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            wakeup.set()
+        else:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def start_background(self) -> threading.Thread:
+        """Host missions on a daemon thread (for long-running services and the dashboard)."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=asyncio.run, args=(self.serve(),),
+                                        name="dweebuild-missions", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stopping = True
+        self._wake()
+
+    # --- Accounting ----------------------------------------------------------
+
+    def usage(self, mission_id: str) -> Dict[str, Any]:
+        """Resource use charged to a mission so far, plus its queue state."""
+        mission = self.missions[mission_id]
+        end = mission.finished or time.time()
+        return {"status": mission.status, "wall_seconds": round(end - mission.created, 2),
+                **usage_meter.get(mission_id), "queue": mission.orchestrator.scheduler.summary()}
+
+    def summary(self) -> Dict[str, Any]:
+        return {"missions": {mission_id: self.usage(mission_id) for mission_id in list(self.missions)},
+                "agent_slots": self.fair_share.summary(), "tool_slots": self.tool_share.summary()}
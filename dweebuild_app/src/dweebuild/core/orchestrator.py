@@ -1,40 +1,310 @@
 import asyncio
-from collections import deque
-from typing import Dict, List, Optional
+import contextlib
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Union
 import time
+import uuid
 
-from .agent import BaseAgent
+from .agent import BaseAgent, apply_step
+from .config import config
 from .memory import ProjectMemory
+from .output import clip_text
+from .reports import TestReport
+from .scheduler import FINISHED, Task, TaskScheduler
+from .journal import Journal, replay as replay_journal
+from .broker import Broker, WorkerPool, POLL_INTERVAL, agent_spec, is_jsonable, open_broker
+from .action_parser import parse_json
+from .llm import LLMClient, get_llm_client
 from .modes import WorkMode, ModeConfig
+from .usage import current_mission, record_usage
+
+# Fallback plan when the architect does not return one (ids are prefixed
+# with the design task's id so repeated designs do not collide).
+DEFAULT_IMPLEMENTATION_PLAN = [
+    {"id": "character", "title": "Implement: Create monkey character class", "cost": 2},
+    {"id": "bananas", "title": "Implement: Create banana collectible system", "cost": 1},
+    {"id": "environment", "title": "Implement: Create house/environment classes", "cost": 2},
+    {"id": "main", "title": "Implement: Create main game file with Panda3D", "cost": 2,
+     "deps": ["character", "bananas", "environment"]},
+]
+
+VERIFY_TITLE = "Verify: Run tests and validate implementation"
+
+# Agent results that mean the task did not get done.
+FAILURE_MARKERS = ("LLM ERROR", "Max attempts reached", "QA FAILURE")
+
+# Prefix of the note a retried task carries about its previous attempt.
+RETRY_NOTE = "Previous attempt failed:"
+
 
 class Orchestrator:
     """
     The central hub that manages agents, task queues, and global state.
     Now with true async concurrency and operation modes.
     """
-    def __init__(self, mode: WorkMode = WorkMode.SINGLE):
-        self.memory = ProjectMemory()
+    def __init__(self, mode: WorkMode = WorkMode.SINGLE, llm: Optional[LLMClient] = None,
+                 broker: Optional[Broker] = None, journal: Optional[Journal] = None):
+        self.memory = ProjectMemory(journal=journal)
+        self.llm = llm or get_llm_client()
         self.agents: Dict[str, BaseAgent] = {}
-        self.task_queue: deque = deque()
+        self.scheduler = TaskScheduler(aging_rate=config.task_aging_per_minute / 60,
+                                       lease_ttl=config.agent_timeout)
         self.is_running = False
         self.mode_config = ModeConfig(mode=mode)
         self.iteration_count = 0
         self.agent_locks: Dict[str, asyncio.Lock] = {}
+        # Dispatch loop state; created inside the loop that runs dispatch().
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._role_queues: Dict[str, asyncio.Queue] = {}
+        self._idle: Dict[str, int] = {}
+        self._in_flight = 0
+        self._draining = False
+        self._slots: Optional[tuple] = None  # (loop, Semaphore) for MAX_CONCURRENT_AGENTS
+        self._thread: Optional[threading.Thread] = None
+        self._dispatch_task: Optional[asyncio.Task] = None
+        # Remote execution: agent runs go to worker processes through the broker.
+        self.broker = broker
+        self.coordinator_id = uuid.uuid4().hex
+        self.workers: Optional[WorkerPool] = None
+        self._remote: Dict[str, tuple] = {}  # job id -> (agent, Future)
+        self._broker_cursor = 0
+        self._pump: Optional[tuple] = None  # (loop, Task) applying broker messages
+        # Tenancy, set by MissionManager: usage is charged to mission_id and
+        # agent/tool slots are shared fairly with other missions.
+        self.mission_id: Optional[str] = None
+        self._checkpoints: Dict[str, Dict[str, Any]] = {}  # task id -> ReAct checkpoint to resume from
+        self.fair_share = None
+        self.tool_share = None
+        # Session store for save_session(); also used to bound the journal (JOURNAL_MAX_MB).
+        self.sessions = None
+        self.session_id = "dweeb_session"
+        self._journal_floor = 0  # Journal size after the last automatic snapshot
+        self._saving = False
+        self._save_lock = threading.Lock()  # The SAVE button and the journal check may overlap
+        self._saved_seq = -1  # journal_seq of the newest saved snapshot
     
-    def register_agent(self, agent: BaseAgent):
-        """Add an agent to the swarm."""
-        agent.memory = self.memory
-        self.agents[agent.name] = agent
-        self.agent_locks[agent.name] = asyncio.Lock()
-        self.memory.add_log("SYSTEM", f"Agent {agent.name} registered.", "INFO")
-
-    def add_task(self, task: str, priority: int = 0):
-        """Add a task to the global queue."""
-        if priority > 0:
-            self.task_queue.appendleft(task)
+    def register_agent(self, agent: BaseAgent, pool_size: Optional[int] = None):
+        """
+        Add an agent to the swarm, plus pool_size - 1 clones of it (default
+        from <KIND>_POOL_SIZE) that share its tools and memory. Clones are
+        named ENGINEER-2, ENGINEER-3, ...
+        """
+        size = pool_size or config.pool_size(agent.kind)
+        members = [agent] + [agent.clone(f"{agent.kind}-{i}") for i in range(2, size + 1)]
+        for member in members:
+            member.memory = self.memory
+            member.llm = self.llm
+            member.leases = self.scheduler.leases
+            member.tool_slots = self.tool_share
+            self.agents[member.name] = member
+            self.agent_locks[member.name] = asyncio.Lock()
+            self.memory.add_log("SYSTEM", f"Agent {member.name} registered.", "INFO")
+
+    def pool(self, kind: str) -> List[BaseAgent]:
+        return [agent for agent in self.agents.values() if agent.kind == kind]
+
+    def start_workers(self, count: Optional[int] = None) -> WorkerPool:
+        """
+        Start worker processes (default WORKER_PROCESSES) on the broker
+        (default BROKER_URL); agent runs are sent to them from then on.
+        """
+        if self.broker is None:
+            self.broker = open_broker(config.broker_url)
+        if self.workers is None:
+            self.workers = WorkerPool(self.broker, count or config.worker_processes or 1)
+            self.workers.start()
+            self.memory.add_log("SYSTEM", f"Started {self.workers.size} agent workers on {self.broker.url}.", "INFO")
+        return self.workers
+
+    def stop_workers(self):
+        if self.workers is not None:
+            self.workers.stop()
+            self.workers = None
+            self.memory.add_log("SYSTEM", "Agent workers stopped.", "INFO")
+
+    @property
+    def task_queue(self) -> List[str]:
+        """Pending tasks, best first (read-only view of the scheduler)."""
+        return [task.title for task in self.scheduler]
+
+    def add_task(self, task: Union[str, Dict[str, Any], Task], priority: float = 0) -> Optional[Task]:
+        """
+        Queue a task (title, spec dict or Task); higher priority and longer
+        critical paths run first, waiting tasks age upward. Returns the
+        queued Task (None if rejected, or when called from another thread).
+        """
+        if self._loop is not None and self._loop is not self._current_loop():
+            # The dispatch loop owns the scheduler; hand the task over to it.
+            self._loop.call_soon_threadsafe(self.add_task, task, priority)
+            return None
+        merged = self.scheduler.stats["deduplicated"]
+        try:
+            entry = self.scheduler.push(task, priority)
+        except ValueError as e:
+            self.memory.add_log("SYSTEM", f"Task rejected: {e}", "ERR")
+            return None
+        if self.scheduler.stats["deduplicated"] != merged:
+            self.memory.add_log("SYSTEM", f"Task merged into pending {entry.id}: {entry.title}", "INFO")
         else:
-            self.task_queue.append(task)
-        self.memory.add_log("SYSTEM", f"Task queued: {task}", "INFO")
+            self.memory.record("task", op="queued", task=entry.to_spec())
+            self.memory.add_log("SYSTEM", f"Task queued ({entry.id}, {entry.role}, p={entry.priority}): {entry.title}", "INFO")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return entry
+
+    def add_tasks(self, specs: Iterable[Union[str, Dict[str, Any], Task]], priority: float = 0) -> List[Task]:
+        """Queue a batch that may reference its own ids in deps (see TaskScheduler.submit_many)."""
+        specs = list(specs)
+        if self._loop is not None and self._loop is not self._current_loop():
+            self._loop.call_soon_threadsafe(self.add_tasks, specs, priority)
+            return []
+        try:
+            tasks = self.scheduler.submit_many(specs, priority)
+        except ValueError as e:
+            self.memory.add_log("SYSTEM", f"Task batch rejected: {e}", "ERR")
+            return []
+        for entry in tasks:
+            self.memory.record("task", op="queued", task=entry.to_spec())
+            deps = f" after {', '.join(sorted(entry.deps))}" if entry.deps else ""
+            self.memory.add_log("SYSTEM", f"Task queued ({entry.id}, {entry.role}{deps}): {entry.title}", "INFO")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return tasks
+
+    @staticmethod
+    def _current_loop() -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+    def _agent_slots(self) -> asyncio.Semaphore:
+        """Global MAX_CONCURRENT_AGENTS limit, bound to the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots[0] is not loop:
+            self._slots = (loop, asyncio.Semaphore(config.max_concurrent_agents))
+        return self._slots[1]
+
+    async def dispatch(self):
+        """
+        Long-lived dispatch loop. Each agent gets a worker fed through its
+        role's asyncio.Queue; the feeder pops from the scheduler only when a
+        worker of that role is idle, so a task starts the moment any agent
+        frees up and priorities are decided as late as possible.
+
+        Returns when should_continue() is false with nothing in flight, or
+        after drain(); cancel() stops it immediately.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._dispatch_task = asyncio.current_task()
+        self._wakeup = asyncio.Event()
+        self._draining = False
+        self._in_flight = 0
+        self._role_queues = {}
+        self._idle = {}
+        workers = [asyncio.create_task(self._worker(agent)) for agent in list(self.agents.values())]
+        self.memory.add_log("SYSTEM", f"Dispatch loop started with {len(workers)} workers.", "INFO")
+        try:
+            while True:
+                self._wakeup.clear()
+                if not self._draining and self.is_running:
+                    self._feed()
+                if self._in_flight == 0:
+                    if self._draining or not self.should_continue():
+                        break
+                    if self.mode_config.mode == WorkMode.SINGLE and sum(self._idle.values()) == len(workers):
+                        # Every worker is waiting and none can take what is left.
+                        self.memory.add_log(
+                            "SYSTEM", f"No agent can run the remaining {len(self.scheduler)} task(s).", "WARN")
+                        break
+                await self._wakeup.wait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._requeue_undelivered()
+            self._loop = None
+            self._wakeup = None
+            self._dispatch_task = None
+            self.memory.add_log("SYSTEM", "Dispatch loop stopped.", "INFO")
+
+    def _feed(self):
+        for role, queue in self._role_queues.items():
+            while self._idle.get(role, 0) > queue.qsize():
+                entry = self.scheduler.pop(role)
+                if entry is None:
+                    break
+                queue.put_nowait(entry)
+                self._in_flight += 1
+
+    async def _worker(self, agent: BaseAgent):
+        queue = self._role_queues.setdefault(agent.kind, asyncio.Queue())
+        while True:
+            self._idle[agent.kind] = self._idle.get(agent.kind, 0) + 1
+            self._wakeup.set()
+            try:
+                entry = await queue.get()
+            finally:
+                self._idle[agent.kind] -= 1
+            try:
+                await self._run_agent_safe(agent, entry)
+                self.iteration_count += 1
+            except asyncio.CancelledError:
+                # Cancelled mid-task: put it back so a later run picks it up.
+                self.scheduler.requeue(entry)
+                raise
+            finally:
+                self._in_flight -= 1
+                self._wakeup.set()
+
+    def _requeue_undelivered(self):
+        for queue in self._role_queues.values():
+            while not queue.empty():
+                entry = queue.get_nowait()
+                self.scheduler.requeue(entry)
+                self._in_flight -= 1
+        self._role_queues = {}
+
+    def drain(self):
+        """Stop starting new tasks; dispatch() returns once in-flight ones finish."""
+        if self._loop is not None and self._loop is not self._current_loop():
+            self._loop.call_soon_threadsafe(self.drain)
+            return
+        self._draining = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel(self):
+        """Stop now; in-flight tasks are cancelled and returned to the queue."""
+        loop = self._loop
+        if loop is None:
+            return
+        if loop is not self._current_loop():
+            loop.call_soon_threadsafe(self.cancel)
+            return
+        if self._dispatch_task is not None:
+            self._dispatch_task.cancel()
+
+    def start_background(self) -> threading.Thread:
+        """Run dispatch() on its own event loop in a daemon thread (for the dashboard)."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=self._dispatch_in_thread,
+                                        name="dweebuild-dispatch", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _dispatch_in_thread(self):
+        try:
+            asyncio.run(self.dispatch())
+        except asyncio.CancelledError:
+            pass  # cancel() was called
+
+    @property
+    def is_dispatching(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
 
     async def run_concurrent(self):
         """
@@ -47,7 +317,7 @@ class Orchestrator:
         # Gather all agent tasks
         agent_tasks = []
         for agent in self.agents.values():
-            if agent.status == "IDLE" and self.task_queue:
+            if agent.status == "IDLE" and len(self.scheduler):
                 # Check if agent can process the next task
                 task = self._route_task_to_agent(agent)
                 if task:
@@ -60,76 +330,215 @@ class Orchestrator:
                 if isinstance(result, Exception):
                     self.memory.add_log("SYSTEM", f"Agent error: {result}", "ERR")
     
-    def _route_task_to_agent(self, agent: BaseAgent) -> Optional[str]:
-        """Route appropriate task to agent based on their role."""
-        if not self.task_queue:
-            return None
-        
-        # Simple routing logic
-        task = self.task_queue[0]
-        task_lower = task.lower()
-        
-        if "design" in task_lower or "architecture" in task_lower:
-            if agent.name == "ARCHITECT":
-                return self.task_queue.popleft()
-        elif "implement" in task_lower or "fix" in task_lower or "create" in task_lower:
-            if agent.name == "ENGINEER":
-                return self.task_queue.popleft()
-        elif "test" in task_lower or "verify" in task_lower or "qa" in task_lower:
-            if agent.name == "QA_LEAD":
-                return self.task_queue.popleft()
-        
-        return None
+    def _route_task_to_agent(self, agent: BaseAgent) -> Optional[Task]:
+        """Best ready task this agent's role can run (O(log n))."""
+        return self.scheduler.pop(agent.kind)
     
-    async def _run_agent_safe(self, agent: BaseAgent, task: str):
+    async def _run_agent_safe(self, agent: BaseAgent, task: Task):
         """Run agent with timeout, error handling, and automatic task generation."""
-        async with self.agent_locks[agent.name]:
+        shared = (self.fair_share.slot(self.mission_id) if self.fair_share is not None
+                  else contextlib.nullcontext())
+        async with self.agent_locks[agent.name], self._agent_slots(), shared:
+            mission_token = current_mission.set(self.mission_id)
+            agent.current_task_id = task.id
+            agent.resume_from = self._checkpoints.pop(task.id, None)
+            self.memory.record("task", op="started", id=task.id, agent=agent.name)
+            ok, result, error = False, "", ""
+            started = time.monotonic()
             try:
-                result = await asyncio.wait_for(
-                    agent.run(task),
-                    timeout=300  # 5 minute timeout
-                )
-                self.memory.add_log(agent.name, f"Completed: {task[:50]}...", "SUCCESS")
-                
-                # ✨ LOOP OF TRUTH: Auto-generate follow-up tasks
-                await self._generate_follow_up_tasks(agent.name, task, result)
-                
-                return result
+                run = self._run_remote(agent, task) if self.broker is not None else agent.run(task.prompt())
+                result = await asyncio.wait_for(run, timeout=config.agent_timeout)
+                ok = bool(result) and not (isinstance(result, str) and result.startswith(FAILURE_MARKERS))
+                self.memory.add_log(agent.name, f"Completed: {task.title[:50]}...", "SUCCESS")
             except asyncio.TimeoutError:
+                error = f"Task timed out after {config.agent_timeout}s"
                 self.memory.add_log(agent.name, "Task timeout", "ERR")
                 agent.status = "ERROR"
             except Exception as e:
+                error = f"Error: {e!r}"
                 self.memory.add_log(agent.name, f"Error: {e}", "ERR")
                 agent.status = "ERROR"
+            except asyncio.CancelledError:
+                # The task goes back to the queue; its next run picks up here.
+                if agent.checkpoint:
+                    self._checkpoints[task.id] = agent.checkpoint
+                raise
+            finally:
+                agent.checkpoint = None
+                agent.resume_from = None
+                outcome = "tasks_done" if ok else "tasks_failed"
+                record_usage(**{"agent_seconds": time.monotonic() - started, outcome: 1})
+                current_mission.reset(mission_token)
+                agent.current_task_id = None
+                self.scheduler.leases.release_all(task.id)
+                self.scheduler.leases.release_all(agent.name)
+
+            # A FINAL_ANSWER result may be structured (e.g. the architect's plan).
+            text = (result if isinstance(result, str) else json.dumps(result, default=str)) or error
+            # Dependents are released even when a task fails; the follow-ups
+            # below queue the retry or fix.
+            self.scheduler.complete(task.id, ok, text)
+            self.memory.record("task", op="done" if ok else "failed", id=task.id, result=text[:4000])
+            try:
+                # ✨ LOOP OF TRUTH: Auto-generate follow-up tasks
+                await self._generate_follow_up_tasks(agent.kind, task, text, ok)
+            except Exception as e:
+                self.memory.add_log("SYSTEM", f"Follow-up generation failed: {e}", "ERR")
+            await self._bound_journal()
+            return result
     
-    async def _generate_follow_up_tasks(self, agent_name: str, completed_task: str, result: str):
+    async def _run_remote(self, agent: BaseAgent, task: Task):
+        """Run the agent in a worker process; its logs, memory writes and status stream back."""
+        memory = {"kv": {k: v for k, v in self.memory.kv_store.items() if is_jsonable(v)},
+                  "logs": [entry.to_dict() for entry in self.memory.get_logs(50)]}
+        job_id = await asyncio.to_thread(self.broker.submit, {
+            "coordinator": self.coordinator_id, "task_id": task.id, "task": task.prompt(),
+            "mission": self.mission_id, "resume": agent.resume_from,
+            "agent": agent_spec(agent), "memory": memory})
+        future = asyncio.get_running_loop().create_future()
+        self._remote[job_id] = (agent, future)
+        self._ensure_pump()
+        try:
+            payload = await future
+        except asyncio.CancelledError:
+            self.broker.cancel(job_id)
+            raise
+        finally:
+            self._remote.pop(job_id, None)
+        record_usage(**payload.get("usage", {}))
+        if "error" in payload:
+            raise RuntimeError(f"worker: {payload['error']}")
+        return payload["result"]
+
+    def _ensure_pump(self):
+        loop = asyncio.get_running_loop()
+        if self._pump is None or self._pump[0] is not loop or self._pump[1].done():
+            self._pump = (loop, loop.create_task(self._pump_broker()))
+
+    async def _pump_broker(self):
+        """Apply worker messages until no remote run is outstanding."""
+        while self._remote:
+            messages, self._broker_cursor = await asyncio.to_thread(
+                self.broker.fetch, self.coordinator_id, self._broker_cursor)
+            for message in messages:
+                self._apply_remote(message)
+            if not messages:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    def _apply_remote(self, message: Dict[str, Any]):
+        kind, payload = message["kind"], message["payload"]
+        agent, future = self._remote.get(message["job_id"], (None, None))
+        if kind == "log":
+            self.memory.add_log(payload["source"], payload["message"], payload["level"])
+        elif kind == "context":
+            self.memory.update_context(payload["key"], payload["value"])
+        elif kind == "event":
+            self.memory.record(payload["kind"], **payload["data"])
+            if payload["kind"] == "step" and agent is not None:
+                agent.checkpoint = apply_step(agent.checkpoint, payload["data"])
+        elif agent is None:
+            return  # Run already finished here (timeout or cancel)
+        elif kind == "agent_log":
+            agent.logs.append(payload["entry"])
+        elif kind == "status":
+            agent.status, agent.thought, agent.progress = payload["status"], payload["thought"], payload["progress"]
+        elif kind == "result" and not future.done():
+            future.set_result(payload)
+
+    def _plan_from_result(self, design: Task, result: str) -> List[Dict[str, Any]]:
+        """
+        Implementation plan from the architect's answer ({"tasks": [...]} or a
+        bare list), or the default plan. Batch ids are prefixed with the
+        design task's id.
+        """
+        data = parse_json(result)
+        specs = data.get("tasks") if isinstance(data, dict) else None
+        if not specs:
+            specs = DEFAULT_IMPLEMENTATION_PLAN
+        normalized = []
+        for index, spec in enumerate(specs):
+            spec = {"title": spec} if isinstance(spec, str) else dict(spec)
+            spec.setdefault("id", str(index + 1))
+            normalized.append(spec)
+        ids = {str(spec["id"]) for spec in normalized}
+        for spec in normalized:
+            deps = spec.get("deps", spec.pop("depends_on", []))
+            deps = [deps] if isinstance(deps, str) else list(deps or [])
+            spec["deps"] = [f"{design.id}.{d}" if str(d) in ids else str(d) for d in deps]
+            spec["id"] = f"{design.id}.{spec['id']}"
+        return normalized
+
+    async def _generate_follow_up_tasks(self, agent_kind: str, completed: Task, result: str, ok: bool):
         """
         Implements the Loop of Truth: automatically chain tasks between agents.
+        Follow-ups are structured tasks: implementation work from a design is
+        a DAG, and verification depends on the work it verifies (repeated
+        Verify requests merge into the pending one). A task that failed
+        without a test report to act on is retried instead of chained.
         """
-        task_lower = completed_task.lower()
-        
+        task_lower = completed.title.lower()
+        report = TestReport.from_result(result) if agent_kind == "QA_LEAD" else None
+
+        if not ok and report is None:
+            self._retry_task(completed, result)
+            return
+
         # ARCHITECT → ENGINEER
-        if agent_name == "ARCHITECT" and ("design" in task_lower or "architecture" in task_lower):
-            self.add_task("Implement: Create main game file with Panda3D", priority=1)
-            self.add_task("Implement: Create monkey character class", priority=0)
-            self.add_task("Implement: Create banana collectible system", priority=0)
-            self.add_task("Implement: Create house/environment classes", priority=0)
-            self.memory.add_log("SYSTEM", "✨ Generated implementation tasks for Engineer", "INFO")
+        if agent_kind == "ARCHITECT" and ("design" in task_lower or "architecture" in task_lower):
+            plan = self.add_tasks(self._plan_from_result(completed, result))
+            if plan:
+                self.add_task(Task(VERIFY_TITLE, deps={t.id for t in plan}, priority=1))
+                self.memory.add_log("SYSTEM", f"✨ Generated {len(plan)} implementation tasks for Engineer", "INFO")
         
         # ENGINEER → QA
-        elif agent_name == "ENGINEER" and "implement" in task_lower:
-            self.add_task("Verify: Run tests and validate implementation", priority=1)
+        elif agent_kind == "ENGINEER" and "implement" in task_lower:
+            self.add_task(Task(VERIFY_TITLE, deps={completed.id}, priority=1))
             self.memory.add_log("SYSTEM", "✨ Generated QA validation task", "INFO")
         
         # QA → ENGINEER (if tests fail) or NEXT FEATURE (if pass)
-        elif agent_name == "QA_LEAD":
-            if "fail" in result.lower() or "error" in result.lower():
-                self.add_task(f"Fix: Address test failures in {completed_task}", priority=1)
-                self.memory.add_log("SYSTEM", "⚠️ Tests failed - re-queuing for Engineer", "WARN")
+        elif agent_kind == "QA_LEAD":
+            if report is None and not result.startswith("QA SUCCESS"):
+                # No verdict (e.g. an empty result) is not a pass: verify again.
+                self._retry_task(completed, result or "QA returned no verdict")
+            elif report is not None and not report.ok:
+                fixes = [self.add_task(task) for task in self._fix_tasks(report)]
+                self.memory.add_log("SYSTEM", f"⚠️ {report.headline()} - {len(fixes)} fix tasks for Engineer", "WARN")
             else:
                 # Tests passed - move to next feature
                 self.memory.add_log("SYSTEM", "✅ Tests passed - ready for next feature", "SUCCESS")
 
+    def _retry_task(self, failed: Task, reason: str) -> Optional[Task]:
+        """Queue the failed task again with the reason attached, up to TASK_MAX_RETRIES times."""
+        if failed.retries >= config.task_max_retries:
+            self.memory.add_log("SYSTEM", f"❌ Giving up on {failed.title} after {failed.retries + 1} attempts", "ERR")
+            return None
+        detail = failed.detail.split(RETRY_NOTE)[0].rstrip()
+        note = f"{RETRY_NOTE} {clip_text(reason or 'no result', 1500)}"
+        retry = Task(failed.title, role=failed.role, files=failed.files, est_cost=failed.est_cost,
+                     priority=failed.priority, detail=f"{detail}\n{note}" if detail else note,
+                     retries=failed.retries + 1)
+        self.memory.add_log("SYSTEM", f"🔁 Retrying {failed.title} "
+                                      f"({retry.retries}/{config.task_max_retries})", "WARN")
+        return self.add_task(retry)
+
+    @staticmethod
+    def _fix_tasks(report: TestReport, max_tasks: int = 5) -> List[Task]:
+        """One Fix task per failing test file, carrying its failures and tracebacks."""
+        groups = sorted(report.by_file().items(), key=lambda item: item[0] or "")
+        if len(groups) > max_tasks:
+            rest = [failure for _, failures in groups[max_tasks - 1:] for failure in failures]
+            groups = groups[:max_tasks - 1] + [("other files", rest)]
+        tasks = []
+        for path, failures in groups:
+            lines = [f"{len(failures)} failing:"]
+            for failure in failures:
+                lines.append(f"- {failure.nodeid}: {failure.message}")
+                if failure.traceback:
+                    lines.append(failure.traceback)
+            title = f"Fix: failing tests in {path}" if path else "Fix: test run error"
+            tasks.append(Task(title, priority=1, detail=clip_text("\n".join(lines), 3000)))
+        return tasks
+
     def start(self):
         self.is_running = True
         self.iteration_count = 0
@@ -137,8 +546,128 @@ class Orchestrator:
 
     def stop(self):
         self.is_running = False
+        self.drain()
         self.memory.add_log("SYSTEM", "Orchestrator stopped.", "WARN")
+        if self.memory.journal is not None:
+            self.memory.journal.flush_soon()  # Written and synced by its thread, not the caller's
     
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Session state for SessionManager.save_session; restore() rebuilds a
+        live orchestrator from it plus the journal events written after it.
+        """
+        # Events up to journal_seq are in this state even if still buffered,
+        # so restore replays only later ones and nothing has to be flushed here.
+        journal_seq = self.memory.journal.seq if self.memory.journal is not None else 0
+        return {
+            "mode": self.mode_config.mode.value,
+            "iteration_count": self.iteration_count,
+            "tasks": list(self.task_queue),
+            "task_specs": [{**task.to_spec(), "status": task.status, "result": task.result[:4000]}
+                           for task in list(self.scheduler.tasks.values())],
+            "checkpoints": {**self._checkpoints, **{a.current_task_id: a.checkpoint for a in self.agents.values()
+                                                   if a.current_task_id and a.checkpoint}},
+            "kv": {k: v for k, v in self.memory.kv_store.items() if is_jsonable(v)},
+            "agents": self.agents,
+            "logs": self.memory.logs,
+            "log_run": self.memory.run_id,
+            "journal_seq": journal_seq,
+        }
+
+    def save_session(self, state: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Save a snapshot (taken now unless given) to self.sessions and drop the
+        journal segments it covers. Blocking.
+        """
+        state = state or self.snapshot()
+        with self._save_lock:
+            if state["journal_seq"] < self._saved_seq:
+                # A newer snapshot was saved (and the journal pruned to it) meanwhile;
+                # making this one the latest would lose the events in between.
+                return self.sessions.latest(self.session_id)
+            path = self.sessions.save_session(self.session_id, state)
+            self._saved_seq = state["journal_seq"]
+            if self.memory.journal is not None:
+                self.memory.journal.prune(state["journal_seq"])
+        return path
+
+    async def _bound_journal(self):
+        """Once the journal has grown by JOURNAL_MAX_MB, snapshot the session so it can be pruned."""
+        journal, limit = self.memory.journal, config.journal_max_mb * 1024 * 1024
+        if journal is None or self.sessions is None or not limit or self._saving:
+            return
+        size = await asyncio.to_thread(journal.size_bytes)
+        if size - self._journal_floor < limit:
+            return
+        self._saving = True
+        try:
+            # Snapshot on the loop so it is consistent; write and prune off it.
+            path = await asyncio.to_thread(self.save_session, self.snapshot())
+            self._journal_floor = await asyncio.to_thread(journal.size_bytes)
+            self.memory.add_log("SYSTEM", f"Journal reached {size // (1024 * 1024)} MB: saved {path} and pruned it.", "INFO")
+        except Exception as e:
+            self.memory.add_log("SYSTEM", f"Automatic session save failed: {e}", "ERR")
+        finally:
+            self._saving = False
+
+    def restore(self, state: Optional[Dict[str, Any]] = None, journal_dir: Optional[str] = None) -> Dict[str, int]:
+        """
+        Rebuild memory, agent state and the task DAG from a snapshot (as
+        returned by SessionManager.load_session) and/or the journal events
+        after it. Call after registering agents and before dispatch().
+        Tasks that were running are queued again; those with a ReAct
+        checkpoint warm-resume from their last completed step.
+        """
+        counts = {"tasks": 0, "finished": 0, "events": 0, "resumable": 0}
+        checkpoints: Dict[str, Dict[str, Any]] = {}
+        if state:
+            self.mode_config.mode = WorkMode(state.get("mode", self.mode_config.mode.value))
+            self.iteration_count = state.get("iteration_count", 0)
+            self.memory.kv_store.update(state.get("kv", {}))
+            self.memory.load_logs(state.get("logs", []))
+            for spec in state.get("task_specs", []):
+                self._restore_task(spec, spec.get("status", ""), spec.get("result", ""), counts)
+            checkpoints.update(state.get("checkpoints", {}))
+            for name, saved in state.get("agents", {}).items():
+                agent = self.agents.get(name)
+                if agent is not None:
+                    agent.thought = saved.get("thought", agent.thought)
+                    agent.logs.extend(saved.get("logs", []))
+
+        if journal_dir:
+            for event in replay_journal(journal_dir, state.get("journal_seq", 0) if state else 0):
+                counts["events"] += 1
+                kind, data = event["k"], event["d"]
+                if kind in ("log", "kv"):
+                    self.memory.replay((event,))
+                elif kind == "step":
+                    checkpoints[data["task_id"]] = apply_step(checkpoints.get(data["task_id"]), data)
+                elif kind == "task" and data["op"] == "queued" and data["task"]["id"] not in self.scheduler.tasks:
+                    self._restore_task(data["task"], "", "", counts)
+                elif kind == "task" and data["op"] in ("done", "failed"):
+                    task = self.scheduler.tasks.get(data["id"])
+                    if task is not None and task.status not in FINISHED:
+                        self.scheduler.resolve(task.id, data["op"] == "done", data.get("result", ""))
+                        counts["finished"] += 1
+                    checkpoints.pop(data["id"], None)
+
+        pending = {task.id for task in self.scheduler.tasks.values() if task.status not in FINISHED}
+        self._checkpoints = {tid: cp for tid, cp in checkpoints.items() if tid in pending and cp}
+        counts["resumable"] = len(self._checkpoints)
+        self.memory.add_log("SYSTEM", f"Session restored: {len(pending)} pending tasks "
+                                      f"({counts['resumable']} mid-task), {counts['events']} journal events.", "SUCCESS")
+        return counts
+
+    def _restore_task(self, spec: Dict[str, Any], status: str, result: str, counts: Dict[str, int]):
+        try:
+            self.scheduler.restore(Task.from_spec(spec), status, result)
+        except ValueError as e:
+            self.memory.add_log("SYSTEM", f"Skipped unrestorable task {spec.get('id')}: {e}", "WARN")
+            return
+        counts["tasks"] += 1
+        if status in FINISHED:
+            counts["finished"] += 1
+
     def should_continue(self) -> bool:
         """Check if the orchestrator should continue based on mode."""
         if not self.is_running:
@@ -146,7 +675,7 @@ class Orchestrator:
         
         if self.mode_config.mode == WorkMode.SINGLE:
             # Run until queue is empty
-            return len(self.task_queue) > 0
+            return len(self.scheduler) > 0
         
         if self.mode_config.mode == WorkMode.AUTONOMOUS:
             # Run indefinitely (or until max_iterations)
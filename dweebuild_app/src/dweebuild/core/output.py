@@ -0,0 +1,155 @@
+import asyncio
+import os
+import tempfile
+from collections import deque
+from pathlib import Path
+from typing import Deque, Optional, Tuple
+
+from .config import config
+
+
+def clip_text(text: str, max_chars: int, note: str = "") -> str:
+    """Head and tail of text within about max_chars, marking what was cut."""
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    return (text[:head] + f"\n... [{len(text) - head - tail} chars omitted{note}] ...\n"
+            + (text[-tail:] if tail else ""))
+
+
+class OutputBuffer:
+    """
+    Bounded capture of one output stream: the first head_bytes and the last
+    tail_bytes are kept in memory whatever the stream's size. Once the
+    stream outgrows them, everything (from the first byte) is also written
+    to a spill file, up to spill_max_bytes, so the output stays available
+    on disk without a runaway command filling it.
+    """
+    def __init__(self, head_bytes: int, tail_bytes: int, spill_dir: Optional[str] = None,
+                 prefix: str = "output", spill_max_bytes: Optional[int] = None):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.spill_dir = spill_dir
+        self.prefix = prefix
+        self.spill_max_bytes = (config.tool_output_spill_max_mb * 1024 * 1024 if spill_max_bytes is None
+                                else spill_max_bytes)
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.spill_path: Optional[str] = None
+        self.spilled = 0
+        self.spill_capped = False
+        self._spill = None
+
+    def write(self, data: bytes):
+        if not data:
+            return
+        self.total += len(data)
+        if self._spill is not None:
+            self._write_spill(data)
+        elif self.total > self.head_bytes + self.tail_bytes and self.spill_dir and self.spill_path is None:
+            self._open_spill(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            if len(self.tail) > self.tail_bytes:
+                del self.tail[:len(self.tail) - self.tail_bytes]
+
+    def _open_spill(self, data: bytes):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        fd, self.spill_path = tempfile.mkstemp(prefix=f"{self.prefix}-", suffix=".log", dir=self.spill_dir)
+        self._spill = os.fdopen(fd, "wb")
+        # Nothing has been dropped yet: head and tail still hold every earlier byte.
+        self._write_spill(bytes(self.head) + bytes(self.tail) + data)
+        _prune_spills(self.spill_dir, config.tool_output_spill_keep)
+
+    def _write_spill(self, data: bytes):
+        if self.spill_max_bytes and self.spilled + len(data) > self.spill_max_bytes:
+            data = data[:self.spill_max_bytes - self.spilled]
+            self.spill_capped = True
+        self._spill.write(data)
+        self.spilled += len(data)
+        if self.spill_capped:
+            self._spill.write(f"\n... [spill file capped at {self.spill_max_bytes} bytes; "
+                              f"later output was not saved] ...\n".encode())
+            self.close()
+
+    @property
+    def omitted(self) -> int:
+        return self.total - len(self.head) - len(self.tail)
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def text(self) -> str:
+        """Head and tail, decoded, with a marker (and the spill file) where bytes were cut."""
+        if not self.omitted:
+            return (bytes(self.head) + bytes(self.tail)).decode(errors="replace")
+        if self.spill_capped:
+            where = f"; first {self.spilled} bytes in {self.spill_path}"
+        else:
+            where = f"; full output in {self.spill_path}" if self.spill_path else ""
+        return (self.head.decode(errors="replace") + f"\n... [{self.omitted} bytes omitted{where}] ...\n"
+                + self.tail.decode(errors="replace"))
+
+
+def _prune_spills(directory: str, keep: int):
+    """Drop all but the newest `keep` spill files."""
+    files = sorted(Path(directory).glob("*.log"), key=lambda p: p.stat().st_mtime)
+    for path in files[:-keep] if keep > 0 else []:
+        path.unlink(missing_ok=True)
+
+
+class OutputStream:
+    """
+    Async iterator over (stream, text) chunks from a running command. A
+    consumer that falls behind by more than max_pending chunks loses the
+    oldest ones (a note says how many), so a slow reader cannot grow memory.
+    The command's ExecResult is in .result once iteration ends.
+    """
+    def __init__(self, max_pending: int = 256):
+        self._pending: Deque[Tuple[str, str]] = deque()
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._ready = asyncio.Event()
+        self._done = False
+        self.task: Optional[asyncio.Task] = None
+        self.result = None
+
+    def push(self, stream: str, text: str):
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        self._pending.append((stream, text))
+        self._ready.set()
+
+    def finish(self, task: asyncio.Task):
+        self._done = True
+        self._ready.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Tuple[str, str]:
+        while not self._pending:
+            if self._done:
+                self.result = self.task.result()  # Re-raises the command's error, if any
+                raise StopAsyncIteration
+            self._ready.clear()
+            await self._ready.wait()
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            return "note", f"[{dropped} output chunks skipped]"
+        return self._pending.popleft()
+
+    async def aclose(self):
+        """Stop early: the command is cancelled (and its process group killed)."""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
@@ -1,78 +1,283 @@
+import gzip
+import hashlib
+import io
 import json
 import os
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from dweebuild.core.config import config
 from dweebuild.core.memory import ProjectMemory
 from dweebuild.core.modes import WorkMode
 
+INDEX_FILE = "index.json"
+COMPRESSIONS = {"zstd": ".jsonl.zst", "gzip": ".jsonl.gz", "none": ".jsonl"}
+
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def _hash(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
 
 class SessionManager:
     """
     Handles saving and restoring session state.
+
+    Snapshots are compressed JSONL: a header line, one line per state field
+    and one line per log entry, so they can be read back as a stream. Most
+    saves are deltas against the previous snapshot of the same session
+    (changed fields plus new logs); every full_every-th save is a full one.
+    sessions/index.json holds per-snapshot metadata, so listing never
+    touches the snapshot files, and retention keeps the newest snapshots
+    plus whatever older ones they are deltas of.
     """
-    def __init__(self, sessions_dir: str = "sessions"):
+    def __init__(self, sessions_dir: str = "sessions", compression: Optional[str] = None,
+                 full_every: Optional[int] = None, keep: Optional[int] = None,
+                 max_age_days: Optional[float] = None):
         self.sessions_dir = Path(sessions_dir)
         self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        compression = (compression or config.session_compression).lower()
+        if compression == "auto":
+            compression = "zstd" if _zstd() else "gzip"
+        if compression not in COMPRESSIONS or (compression == "zstd" and not _zstd()):
+            raise ValueError(f"Unsupported session compression: {compression}")
+        self.compression = compression
+        self.full_every = full_every or config.session_full_every
+        self.keep = keep or config.session_keep
+        self.max_age_days = config.session_max_age_days if max_age_days is None else max_age_days
+        self.index_path = self.sessions_dir / INDEX_FILE
+        # Saves come from the UI thread and from worker threads (the journal
+        # size check); the index and its temp file take one writer at a time.
+        self._lock = threading.RLock()
+        self.index: Dict[str, List[Dict[str, Any]]] = self._load_index()
+
+    # --- Index ---------------------------------------------------------------
+
+    def _load_index(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self.index_path.exists():
+            with open(self.index_path) as f:
+                return json.load(f)["sessions"]
+        # First run on an old sessions/ dir: adopt the legacy pretty-printed files.
+        index: Dict[str, List[Dict[str, Any]]] = {}
+        for path in sorted(self.sessions_dir.glob("*.json")):
+            session_id = path.stem.rsplit("_", 2)[0]
+            index.setdefault(session_id, []).append({
+                "file": path.name, "kind": "legacy", "parent": None, "created": path.stat().st_mtime,
+                "bytes": path.stat().st_size})
+        self._write_index(index)
+        return index
+
+    def _write_index(self, index: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        with self._lock:
+            tmp = self.index_path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump({"version": 1, "sessions": self.index if index is None else index}, f)
+            os.replace(tmp, self.index_path)
+
+    # --- Files ---------------------------------------------------------------
+
+    @staticmethod
+    def _open(path: Path, mode: str):
+        """Text stream for a snapshot, compressed according to its suffix."""
+        name = path.name
+        if name.endswith(".zst"):
+            zstandard = _zstd()
+            if zstandard is None:
+                raise RuntimeError(f"{name} needs the zstandard package")
+            if mode == "w":
+                raw = zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"), closefd=True)
+            else:
+                raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+            return io.TextIOWrapper(raw, encoding="utf-8")
+        if name.endswith(".gz"):
+            return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+        return open(path, mode, encoding="utf-8")
+
+    @staticmethod
+    def _serialize(state: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        fields = {}
+        for key, value in state.items():
+            if key in ("logs", "log_run"):
+                continue
+            if key == "agents":
+                value = {name: agent if isinstance(agent, dict) else
+                         {"status": agent.status, "thought": agent.thought, "logs": list(agent.logs)}
+                         for name, agent in value.items()}
+            fields[key] = value
+        fields.setdefault("mode", "SINGLE")
+        logs = [{"seq": entry.get("seq"), **dict(entry)} for entry in state.get("logs", [])]
+        return fields, logs
+
+    # --- Saving --------------------------------------------------------------
 
     def save_session(self, session_id: str, state: Dict[str, Any]) -> str:
         """
         Save the current session state to disk.
-        
+
         Args:
             session_id: Unique session identifier
             state: Dict containing orchestrator state, agent states, memory, etc.
-        
+
         Returns:
             Path to saved session file
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{session_id}_{timestamp}.json"
-        filepath = self.sessions_dir / filename
-        
-        # Serialize state
-        serialized = {
-            "session_id": session_id,
-            "timestamp": timestamp,
-            "mode": state.get("mode", "SINGLE"),
-            "agents": {},
-            "tasks": state.get("tasks", []),
-            "logs": state.get("logs", []),
-            "iteration_count": state.get("iteration_count", 0)
-        }
-        
-        # Serialize agent states
-        for name, agent in state.get("agents", {}).items():
-            serialized["agents"][name] = {
-                "status": agent.status,
-                "thought": agent.thought,
-                "logs": list(agent.logs)
-            }
-        
-        with open(filepath, 'w') as f:
-            json.dump(serialized, f, indent=2)
-        
-        return str(filepath)
+        fields, logs = self._serialize(state)
+        hashes = {key: _hash(value) for key, value in fields.items()}
+        with self._lock:
+            history = [e for e in self.index.get(session_id, []) if e["kind"] != "legacy"]
+            parent = history[-1] if history else None
+            since_full = next((i for i, e in enumerate(reversed(history)) if e["kind"] == "full"), len(history))
+
+            # New logs are found by seq, so deltas need every entry to carry one,
+            # from the same run as the parent (seqs restart with each process).
+            log_seqs = [entry["seq"] for entry in logs]
+            log_run = state.get("log_run")
+            delta = (parent is not None and since_full + 1 < self.full_every
+                     and None not in log_seqs and parent.get("log_seq") is not None
+                     and parent.get("log_run") == log_run and max(log_seqs, default=0) >= parent["log_seq"])
+            if delta:
+                fields = {key: value for key, value in fields.items() if hashes[key] != parent["hashes"].get(key)}
+                logs = [entry for entry in logs if entry["seq"] > parent["log_seq"]]
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            filepath = self.sessions_dir / f"{session_id}_{timestamp}{COMPRESSIONS[self.compression]}"
+            header = {"session_id": session_id, "timestamp": timestamp, "kind": "delta" if delta else "full",
+                      "parent": parent["file"] if delta else None, "fields": len(fields), "logs": len(logs)}
+            with self._open(filepath, "w") as f:
+                f.write(json.dumps(header) + "\n")
+                for key, value in fields.items():
+                    f.write(json.dumps({"field": key, "value": value}, default=str) + "\n")
+                for entry in logs:
+                    f.write(json.dumps({"log": entry}, default=str) + "\n")
 
-    def load_session(self, filepath: str) -> Dict[str, Any]:
+            if None in log_seqs:
+                log_seq = None
+            elif log_seqs:
+                log_seq = max(log_seqs)
+            else:
+                log_seq = parent["log_seq"] if delta else 0
+            self.index.setdefault(session_id, []).append({
+                "file": filepath.name, "kind": header["kind"], "parent": header["parent"],
+                "created": time.time(), "bytes": filepath.stat().st_size, "hashes": hashes,
+                "log_seq": log_seq, "log_run": log_run,
+                "mode": state.get("mode", "SINGLE"), "tasks": len(state.get("tasks", []))})
+            self.apply_retention(session_id)
+            self._write_index()
+            return str(filepath)
+
+    def apply_retention(self, session_id: str) -> List[str]:
+        """
+        Drop snapshots beyond the newest `keep` (and older than max_age_days
+        when set), except those a kept delta still builds on. Returns the
+        removed file names; call _write_index() afterwards.
+        """
+        with self._lock:
+            entries = self.index.get(session_id, [])
+            cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days else None
+            wanted = {e["file"] for e in entries[-self.keep:] if cutoff is None or e["created"] >= cutoff}
+            if entries:
+                wanted.add(entries[-1]["file"])  # Never drop the latest
+            by_name = {e["file"]: e for e in entries}
+            needed = set()
+            for name in wanted:
+                while name and name not in needed:
+                    needed.add(name)
+                    name = by_name[name]["parent"] if name in by_name else None
+            removed = []
+            for entry in entries:
+                if entry["file"] not in needed:
+                    (self.sessions_dir / entry["file"]).unlink(missing_ok=True)
+                    removed.append(entry["file"])
+            self.index[session_id] = [e for e in entries if e["file"] in needed]
+            return removed
+
+    # --- Loading -------------------------------------------------------------
+
+    def _resolve(self, filepath: str) -> Path:
+        path = Path(filepath)
+        return path if path.is_absolute() or path.exists() else self.sessions_dir / path.name
+
+    def iter_records(self, filepath: str) -> Iterator[Dict[str, Any]]:
+        """Stream one snapshot file: the header, then {"field", "value"} and {"log"} records."""
+        path = self._resolve(filepath)
+        if path.suffix == ".json":
+            with open(path) as f:
+                legacy = json.load(f)
+            yield {"session_id": legacy.get("session_id"), "kind": "full", "parent": None}
+            for key, value in legacy.items():
+                if key != "logs":
+                    yield {"field": key, "value": value}
+            for entry in legacy.get("logs", []):
+                yield {"log": entry}
+            return
+        with self._open(path, "r") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def chain(self, filepath: str) -> List[Path]:
+        """The full snapshot a file builds on, then each delta up to and including it."""
+        chain = [self._resolve(filepath)]
+        while True:
+            header = next(self.iter_records(str(chain[0])))
+            if not header.get("parent"):
+                return chain
+            chain.insert(0, self.sessions_dir / header["parent"])
+
+    def iter_logs(self, filepath: str) -> Iterator[Dict[str, Any]]:
+        """All logs of a session snapshot in order, without materializing them."""
+        for path in self.chain(filepath):
+            for record in self.iter_records(str(path)):
+                if "log" in record:
+                    yield record["log"]
+
+    def load_session(self, filepath: str, include_logs: bool = True) -> Dict[str, Any]:
         """
         Restore a session from disk.
-        
+
         Returns:
             Dict containing the restored state
         """
-        with open(filepath, 'r') as f:
-            return json.load(f)
+        state: Dict[str, Any] = {}
+        logs: List[Dict[str, Any]] = []
+        for path in self.chain(filepath):
+            for record in self.iter_records(str(path)):
+                if "field" in record:
+                    state[record["field"]] = record["value"]
+                elif "log" in record and include_logs:
+                    logs.append(record["log"])
+                elif "kind" in record:
+                    state["session_id"] = record.get("session_id")
+                    state["timestamp"] = record.get("timestamp")
+        state["logs"] = logs
+        return state
 
-    def list_sessions(self) -> list[str]:
-        """List all available saved sessions."""
-        return [str(p) for p in self.sessions_dir.glob("*.json")]
+    def list_sessions(self, session_id: Optional[str] = None) -> list[str]:
+        """List all available saved sessions (from the index, oldest first)."""
+        ids = [session_id] if session_id else list(self.index)
+        return [str(self.sessions_dir / e["file"]) for sid in ids for e in self.index.get(sid, [])]
+
+    def latest(self, session_id: str) -> Optional[str]:
+        entries = self.index.get(session_id)
+        return str(self.sessions_dir / entries[-1]["file"]) if entries else None
+
+    def describe(self, session_id: str) -> List[Dict[str, Any]]:
+        """Index metadata for a session's snapshots (kind, size, task count, ...)."""
+        return [{k: v for k, v in e.items() if k != "hashes"} for e in self.index.get(session_id, [])]
 
     def export_logs(self, session_id: str, logs: list) -> str:
         """Export logs to a markdown file."""
         filename = f"{session_id}_logs.md"
         filepath = self.sessions_dir / filename
-        
+
         with open(filepath, 'w') as f:
             f.write(f"# Session Logs: {session_id}\n\n")
             for entry in logs:
@@ -81,5 +286,5 @@ class SessionManager:
                 level = entry.get('level', 'INFO')
                 msg = entry.get('message', '')
                 f.write(f"**[{ts}] [{source}] [{level}]** {msg}\n\n")
-        
+
         return str(filepath)
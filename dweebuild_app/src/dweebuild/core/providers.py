@@ -0,0 +1,190 @@
+import abc
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Union
+
+
+@dataclass
+class Completion:
+    """Provider-neutral completion result."""
+    text: str
+    total_tokens: Optional[int] = None
+
+
+class LLMProvider(abc.ABC):
+    """
+    Abstract Base Class for LLM backends.
+
+    Each provider maps model tiers ("default", "fast") to concrete models and
+    carries a blended price per million tokens used by the router's scoring.
+    """
+    name: str = "provider"
+    models: Dict[str, str] = {}
+    cost_per_mtok: Dict[str, float] = {}
+
+    def __init__(self, models: Dict[str, str] = None, limiter=None):
+        self.models = {**self.models, **(models or {})}
+        self.limiter = limiter  # None = the client's shared limiter
+
+    def model_for(self, tier: str) -> str:
+        return self.models.get(tier) or self.models["default"]
+
+    def cost_for(self, tier: str) -> float:
+        return self.cost_per_mtok.get(tier, self.cost_per_mtok.get("default", 0.0))
+
+    @abc.abstractmethod
+    async def complete(self, messages: List[Dict[str, str]], model: str, temperature: float) -> Completion:
+        pass
+
+    @abc.abstractmethod
+    def stream(self, messages: List[Dict[str, str]], model: str, temperature: float) -> AsyncIterator[str]:
+        pass
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Providers whose SDK exposes client.chat.completions.create (Groq, OpenAI)."""
+    def __init__(self, api_key: str, pool, models: Dict[str, str] = None, limiter=None):
+        super().__init__(models, limiter)
+        self.api_key = api_key
+        self.pool = pool
+
+    @property
+    def client(self):
+        return self.pool.get(self.name, self.api_key)
+
+    async def complete(self, messages, model, temperature) -> Completion:
+        chat = await self.client.chat.completions.create(
+            messages=messages, model=model, temperature=temperature
+        )
+        usage = getattr(chat, "usage", None)
+        return Completion(chat.choices[0].message.content, getattr(usage, "total_tokens", None))
+
+    async def stream(self, messages, model, temperature) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            messages=messages, model=model, temperature=temperature, stream=True
+        )
+        async for chunk in response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+
+class GroqProvider(OpenAICompatibleProvider):
+    name = "groq"
+    models = {"default": "llama-3.3-70b-versatile", "fast": "llama-3.1-8b-instant"}
+    cost_per_mtok = {"default": 0.69, "fast": 0.065}
+
+
+class OpenAIProvider(OpenAICompatibleProvider):
+    name = "openai"
+    models = {"default": "gpt-4o", "fast": "gpt-4o-mini"}
+    cost_per_mtok = {"default": 6.25, "fast": 0.375}
+
+
+class AnthropicProvider(LLMProvider):
+    name = "anthropic"
+    models = {"default": "claude-3-5-sonnet-latest", "fast": "claude-3-5-haiku-latest"}
+    cost_per_mtok = {"default": 9.0, "fast": 2.4}
+    max_tokens = 8192
+
+    def __init__(self, api_key: str, pool, models: Dict[str, str] = None, limiter=None):
+        super().__init__(models, limiter)
+        self.api_key = api_key
+        self.pool = pool
+
+    @property
+    def client(self):
+        return self.pool.get(self.name, self.api_key)
+
+    @staticmethod
+    def _split(messages):
+        text = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        # Agent conversations keep the system prompt byte-identical across
+        # turns; marking it lets the API serve it from the prompt cache.
+        system = {"system": [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]} if text else {}
+        return system, [m for m in messages if m["role"] != "system"]
+
+    async def complete(self, messages, model, temperature) -> Completion:
+        system, rest = self._split(messages)
+        msg = await self.client.messages.create(
+            model=model, messages=rest, **system,
+            temperature=temperature, max_tokens=self.max_tokens
+        )
+        text = "".join(block.text for block in msg.content if getattr(block, "type", "") == "text")
+        usage = getattr(msg, "usage", None)
+        total = (usage.input_tokens + usage.output_tokens) if usage else None
+        return Completion(text, total)
+
+    async def stream(self, messages, model, temperature) -> AsyncIterator[str]:
+        system, rest = self._split(messages)
+        events = await self.client.messages.create(
+            model=model, messages=rest, **system,
+            temperature=temperature, max_tokens=self.max_tokens, stream=True
+        )
+        async for event in events:
+            if getattr(event, "type", "") == "content_block_delta":
+                text = getattr(event.delta, "text", None)
+                if text:
+                    yield text
+
+
+Reply = Union[str, Callable[[List[Dict[str, str]]], str]]
+
+
+class ScriptedProvider(LLMProvider):
+    """
+    Deterministic stand-in provider for local testing.
+
+    Replies are taken in order from `replies` (strings or callables receiving
+    the messages); once exhausted, the last one repeats. With no replies every
+    call returns a FINAL_ANSWER action. `latency` and `fail_times` simulate a
+    slow or flaky backend.
+    """
+    name = "scripted"
+    models = {"default": "scripted", "fast": "scripted-fast"}
+    cost_per_mtok = {"default": 0.0}
+
+    def __init__(self, replies: Sequence[Reply] = None, latency: float = 0.0, fail_times: int = 0,
+                 chunk_size: int = 16, name: str = None):
+        super().__init__()
+        if name:
+            self.name = name
+        self.replies = list(replies or [])
+        self.latency = latency
+        self.fail_times = fail_times
+        self.chunk_size = chunk_size
+        self.calls: List[List[Dict[str, str]]] = []
+
+    def _next_reply(self, messages) -> str:
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise ConnectionError(f"{self.name}: simulated failure")
+        self.calls.append(messages)
+        if not self.replies:
+            return json.dumps({"thought": "Scripted run.", "tool": "FINAL_ANSWER",
+                               "args": {"result": "Task Completed"}})
+        index = min(len(self.calls) - 1, len(self.replies) - 1)
+        reply = self.replies[index]
+        return reply(messages) if callable(reply) else reply
+
+    async def complete(self, messages, model, temperature) -> Completion:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = self._next_reply(messages)
+        tokens = sum(len(m["content"]) for m in messages) // 4 + len(text) // 4
+        return Completion(text, tokens)
+
+    async def stream(self, messages, model, temperature) -> AsyncIterator[str]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = self._next_reply(messages)
+        for i in range(0, len(text), self.chunk_size):
+            yield text[i:i + self.chunk_size]
+
+
+PROVIDER_TYPES = {
+    "groq": GroqProvider,
+    "openai": OpenAIProvider,
+    "anthropic": AnthropicProvider,
+}
@@ -0,0 +1,140 @@
+import os
+import xml.etree.ElementTree as ET
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .action_parser import parse_json
+from .output import clip_text
+
+# pytest exit codes that mean "nothing failed": all passed, no tests collected.
+OK_EXIT_CODES = (0, 5)
+
+
+@dataclass
+class TestFailure:
+    __test__ = False
+    nodeid: str     # "tests/test_api.py::TestLogin::test_bad_password", or "<session>"
+    kind: str       # "failure" | "error"
+    message: str
+    traceback: str = ""
+
+    @property
+    def file(self) -> Optional[str]:
+        path = self.nodeid.split("::", 1)[0]
+        return path if path.endswith(".py") else None
+
+
+@dataclass
+class TestReport:
+    """
+    Outcome of one pytest run, read from its JUnit XML rather than its
+    console output: counts, and per failing test its node id, message and a
+    trimmed traceback. Small enough to travel in a task result.
+    """
+    __test__ = False
+    tests: int = 0
+    passed: int = 0
+    failed: int = 0
+    errors: int = 0
+    skipped: int = 0
+    duration: float = 0.0
+    returncode: Optional[int] = None
+    failures: List[TestFailure] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures and self.returncode in OK_EXIT_CODES + (None,)
+
+    def headline(self) -> str:
+        if not self.tests and self.failures:
+            return f"pytest did not run (exit {self.returncode})"
+        if not self.tests:
+            return "no tests collected"
+        text = f"{self.tests} tests: {self.passed} passed, {self.failed} failed, {self.errors} errors"
+        if self.skipped:
+            text += f", {self.skipped} skipped"
+        return text + f" in {self.duration:.1f}s"
+
+    def by_file(self) -> Dict[Optional[str], List[TestFailure]]:
+        grouped: Dict[Optional[str], List[TestFailure]] = {}
+        for failure in self.failures:
+            grouped.setdefault(failure.file, []).append(failure)
+        return grouped
+
+    def render(self, max_chars: int = 6000) -> str:
+        """Headline plus each failure (for agents reading the tool output)."""
+        lines = [self.headline()]
+        for failure in self.failures:
+            lines.append(f"{failure.kind.upper()} {failure.nodeid} - {failure.message}")
+            if failure.traceback:
+                lines.append(failure.traceback)
+        return clip_text("\n".join(lines), max_chars)
+
+    # --- Parsing --------------------------------------------------------------
+
+    @classmethod
+    def from_junit(cls, path: str, returncode: Optional[int] = None, output: str = "",
+                   max_failures: int = 20, traceback_chars: int = 1500) -> "TestReport":
+        """
+        Parse pytest's --junitxml (junit_family=xunit1, which records each
+        test's file). A failed run with nothing to show for it in the XML -
+        pytest missing, a usage or internal error - becomes a single
+        "<session>" error carrying the console output.
+        """
+        report = cls(returncode=returncode)
+        try:
+            root = ET.parse(path).getroot()
+            suites = [root] if root.tag == "testsuite" else list(root.iter("testsuite"))
+        except (OSError, ET.ParseError):
+            suites = []
+        for suite in suites:
+            report.duration += float(suite.get("time") or 0)
+            for case in suite.iter("testcase"):
+                report.tests += 1
+                outcome = next((child for child in case if child.tag in ("failure", "error", "skipped")), None)
+                if outcome is None:
+                    report.passed += 1
+                elif outcome.tag == "skipped":
+                    report.skipped += 1
+                else:
+                    if outcome.tag == "failure":
+                        report.failed += 1
+                    else:
+                        report.errors += 1
+                    if len(report.failures) < max_failures:
+                        report.failures.append(TestFailure(
+                            cls._nodeid(case), outcome.tag, (outcome.get("message") or "").strip()[:300],
+                            clip_text((outcome.text or "").strip(), traceback_chars)))
+        if not report.failures and returncode not in OK_EXIT_CODES + (None,):
+            report.failures.append(TestFailure("<session>", "error", f"pytest exited with {returncode}",
+                                               clip_text(output.strip(), traceback_chars)))
+        return report
+
+    @staticmethod
+    def _nodeid(case: ET.Element) -> str:
+        classname, name = case.get("classname") or "", case.get("name") or ""
+        path = (case.get("file") or "").replace(os.sep, "/")
+        if not path:
+            return f"{classname}::{name}" if classname else name
+        module = path[:-3].replace("/", ".")
+        inner = classname[len(module) + 1:] if classname.startswith(module + ".") else ""
+        return "::".join(part for part in (path, inner.replace(".", "::"), name) if part)
+
+    # --- Transport ------------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TestReport":
+        data = dict(data)
+        data["failures"] = [TestFailure(**f) for f in data.get("failures", [])]
+        return cls(**data)
+
+    @classmethod
+    def from_result(cls, result: str) -> Optional["TestReport"]:
+        """The report embedded in a QA task result ({"test_report": ...}), if any."""
+        data = parse_json(result)
+        if isinstance(data, dict) and isinstance(data.get("test_report"), dict):
+            return cls.from_dict(data["test_report"])
+        return None
@@ -0,0 +1,94 @@
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from .providers import LLMProvider
+
+
+class ProviderStats:
+    """Rolling latency window, error rate and circuit state for one provider."""
+    def __init__(self, window: int = 100):
+        self.latencies: deque = deque(maxlen=window)
+        self.error_rate = 0.0          # EWMA of failures (0..1)
+        self.consecutive_failures = 0
+        self.open_until = 0.0          # Circuit breaker: skipped until this time
+        self.calls = 0
+        self.failures = 0
+        self.tokens = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "p50": self.percentile(0.5), "p95": self.percentile(0.95),
+            "error_rate": round(self.error_rate, 3), "calls": self.calls,
+            "failures": self.failures, "tokens": self.tokens,
+            "circuit_open": self.open_until > time.monotonic(),
+        }
+
+
+class LLMRouter:
+    """
+    Picks a provider per call from measured latency, error rate and cost.
+
+    Candidates are ordered by score (lower is better):
+        p50 + 0.5 * p95 + error_rate * error_penalty + cost_weight * $/Mtok
+    Providers that have not been measured yet score only their cost term, so
+    they are tried early; ties keep configuration order. After `failure_threshold` consecutive failures a
+    provider's circuit opens for `cooldown` seconds; it is only offered again
+    when every other provider is also unavailable.
+    """
+    def __init__(self, providers: List[LLMProvider], cost_weight: float = 0.1,
+                 error_penalty: float = 10.0, failure_threshold: int = 3, cooldown: float = 30.0,
+                 alpha: float = 0.2):
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider.")
+        self.providers = list(providers)
+        self.cost_weight = cost_weight
+        self.error_penalty = error_penalty
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.stats: Dict[str, ProviderStats] = {p.name: ProviderStats() for p in self.providers}
+
+    def score(self, provider: LLMProvider, tier: str) -> float:
+        st = self.stats[provider.name]
+        p50 = st.percentile(0.5) or 0.0
+        p95 = st.percentile(0.95) or 0.0
+        return (p50 + 0.5 * p95 + st.error_rate * self.error_penalty
+                + self.cost_weight * provider.cost_for(tier))
+
+    def candidates(self, tier: str = "default") -> List[LLMProvider]:
+        """Providers to try for this call, best first."""
+        now = time.monotonic()
+        closed = [p for p in self.providers if self.stats[p.name].open_until <= now]
+        if closed:
+            return sorted(closed, key=lambda p: self.score(p, tier))
+        # Everything is tripped: probe the one whose cooldown ends first.
+        return sorted(self.providers, key=lambda p: self.stats[p.name].open_until)
+
+    def record_success(self, provider: LLMProvider, latency: float, tokens: Optional[int] = None):
+        st = self.stats[provider.name]
+        st.calls += 1
+        st.latencies.append(latency)
+        st.error_rate *= (1 - self.alpha)
+        st.consecutive_failures = 0
+        st.open_until = 0.0
+        if tokens:
+            st.tokens += tokens
+
+    def record_failure(self, provider: LLMProvider):
+        st = self.stats[provider.name]
+        st.calls += 1
+        st.failures += 1
+        st.error_rate = st.error_rate * (1 - self.alpha) + self.alpha
+        st.consecutive_failures += 1
+        if st.consecutive_failures >= self.failure_threshold:
+            st.open_until = time.monotonic() + self.cooldown
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {name: st.snapshot() for name, st in self.stats.items()}
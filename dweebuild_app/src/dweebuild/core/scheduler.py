@@ -0,0 +1,554 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Union
+
+# Keyword routing used by the Loop of Truth task names ("Design: ...",
+# "Implement: ...", "Verify: ..."). First match wins, in this order.
+ROLE_KEYWORDS = (
+    ("ARCHITECT", ("design", "architecture")),
+    ("ENGINEER", ("implement", "fix", "create")),
+    ("QA_LEAD", ("test", "verify", "qa")),
+)
+
+ANY_ROLE = "ANY"
+
+
+def route_role(task: str) -> str:
+    """
+    Role that should run a task, or ANY_ROLE when no keyword matches. A
+    "Verb: ..." prefix decides on its own, so "Verify: ... implementation"
+    goes to QA rather than matching "implement" in its description.
+    """
+    lowered = task.lower()
+    prefix, sep, _ = lowered.partition(":")
+    for text in ((prefix, lowered) if sep else (lowered,)):
+        for role, keywords in ROLE_KEYWORDS:
+            if any(keyword in text for keyword in keywords):
+                return role
+    return ANY_ROLE
+
+
+# Lifecycle: blocked -> ready -> running -> done | failed
+BLOCKED, READY, RUNNING, DONE, FAILED = "blocked", "ready", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+@dataclass
+class Task:
+    """
+    A unit of work in the build DAG.
+
+    `deps` are ids of tasks that must finish first, `files` the paths the
+    task is expected to write (leased while it runs) and `est_cost` a
+    relative duration used for critical-path ranking.
+    """
+    title: str
+    id: str = ""
+    role: str = ""
+    deps: Set[str] = field(default_factory=set)
+    files: List[str] = field(default_factory=list)
+    est_cost: float = 1.0
+    priority: float = 0.0
+    status: str = BLOCKED
+    rank: float = 0.0       # est_cost + longest chain of dependents (critical path)
+    enqueued: float = 0.0
+    seq: int = 0
+    version: int = 0        # Bumped whenever the heap key changes
+    result: str = ""
+    detail: str = ""        # Extra instructions for the agent (e.g. failing tests and tracebacks)
+    retries: int = 0        # Earlier failed attempts at this task
+
+    def __post_init__(self):
+        self.deps = set(self.deps or ())
+        self.files = list(self.files or ())
+        self.role = self.role or route_role(self.title)
+
+    @classmethod
+    def from_spec(cls, spec: Union[str, Dict[str, Any], "Task"], priority: float = 0) -> "Task":
+        """Build a Task from a title, a dict (as produced by the architect) or a Task."""
+        if isinstance(spec, Task):
+            return spec
+        if isinstance(spec, str):
+            return cls(spec, priority=priority)
+        title = spec.get("title") or spec.get("task") or spec.get("name") or ""
+        if not title:
+            raise ValueError(f"Task spec without a title: {spec!r}")
+        deps = spec.get("deps", spec.get("depends_on", ()))
+        return cls(
+            title=str(title),
+            id=str(spec.get("id") or ""),
+            role=str(spec.get("role") or "").upper(),
+            deps={str(d) for d in ([deps] if isinstance(deps, str) else deps or ())},
+            files=list(spec.get("files", spec.get("target_files", ())) or ()),
+            est_cost=float(spec.get("cost", spec.get("est_cost", 1.0)) or 1.0),
+            priority=float(spec.get("priority", priority) or 0),
+            detail=str(spec.get("detail") or ""),
+            retries=int(spec.get("retries") or 0),
+        )
+
+    def to_spec(self) -> Dict[str, Any]:
+        """Inverse of from_spec (for journals and snapshots)."""
+        return {"id": self.id, "title": self.title, "role": self.role, "deps": sorted(self.deps),
+                "files": self.files, "cost": self.est_cost, "priority": self.priority, "detail": self.detail,
+                "retries": self.retries}
+
+    @property
+    def dedup_key(self) -> tuple:
+        return (self.role, " ".join(self.title.lower().split()), tuple(sorted(self.files)))
+
+    def prompt(self) -> str:
+        """Task text handed to an agent."""
+        text = self.title
+        if self.files:
+            text += f"\nTarget files: {', '.join(self.files)}"
+        if self.detail:
+            text += f"\n{self.detail}"
+        return text
+
+
+class FileLeases:
+    """
+    Exclusive, expiring write leases on project files.
+
+    A worker holds a lease on every file it writes until its task finishes
+    (release_all) or the lease expires, so two pool members never edit the
+    same file at once. Re-acquiring a lease you already hold extends it.
+    """
+    def __init__(self, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._leases: Dict[str, tuple] = {}  # path -> (owner, expires)
+
+    @staticmethod
+    def _norm(path: str) -> str:
+        return os.path.normpath(path)
+
+    def holder(self, path: str) -> Optional[str]:
+        lease = self._leases.get(self._norm(path))
+        if lease is None or lease[1] <= self.clock():
+            return None
+        return lease[0]
+
+    def acquire(self, path: str, owner: str, ttl: Optional[float] = None) -> bool:
+        holder = self.holder(path)
+        if holder is not None and holder != owner:
+            return False
+        self._leases[self._norm(path)] = (owner, self.clock() + (ttl or self.ttl))
+        return True
+
+    def release(self, path: str, owner: str):
+        key = self._norm(path)
+        if self._leases.get(key, (None,))[0] == owner:
+            del self._leases[key]
+
+    def release_all(self, owner: str):
+        for key in [k for k, (o, _) in self._leases.items() if o == owner]:
+            del self._leases[key]
+
+    def summary(self) -> Dict[str, str]:
+        now = self.clock()
+        return {path: owner for path, (owner, expires) in self._leases.items() if expires > now}
+
+
+class TaskScheduler:
+    """
+    Dependency-aware, per-role priority scheduler.
+
+    Tasks form a DAG through `deps`. A task is blocked until every dependency
+    has finished, then moves to its role's ready heap (tasks no role claims
+    go to a shared ANY heap every role may take from), so one unroutable or
+    blocked task never stalls the others.
+
+    Ready tasks are ordered by effective priority:
+        priority + rank + aging_rate * (now - enqueued)
+    where rank is the task's critical-path length (its own est_cost plus the
+    longest chain of dependents), so work that unblocks the most downstream
+    effort goes first. The `now` term is the same for every task at a given
+    moment, so the heap key `-(priority + rank) + aging_rate * enqueued` is
+    fixed at push time and push/pop stay O(log n). When a rank grows the task
+    is pushed again and the stale entry is skipped on pop.
+
+    submit() rejects dependency cycles (ValueError) and merges a task into an
+    identical pending one (same role, title and files) instead of queueing
+    it twice.
+    """
+    def __init__(self, aging_rate: float = 1 / 60, clock: Callable[[], float] = time.monotonic,
+                 lease_ttl: float = 300.0):
+        self.aging_rate = aging_rate
+        self.clock = clock
+        self.leases = FileLeases(lease_ttl, clock)
+        self.tasks: Dict[str, Task] = {}
+        self._dependents: Dict[str, Set[str]] = {}
+        self._pending_keys: Dict[tuple, str] = {}
+        self._heaps: Dict[str, List[tuple]] = {}
+        self._seq = itertools.count(1)
+        self._active = 0  # blocked + ready
+        self.stats = {"submitted": 0, "deduplicated": 0, "completed": 0, "failed": 0}
+
+    # --- Submission -------------------------------------------------------
+
+    def push(self, task: Union[str, Dict[str, Any], Task], priority: float = 0,
+             role: Optional[str] = None) -> Task:
+        """Queue one task (title, spec dict or Task); see submit()."""
+        entry = Task.from_spec(task, priority)
+        if role:
+            entry.role = role
+        return self.submit(entry)
+
+    def submit(self, task: Task) -> Task:
+        """Add a task to the DAG. Returns the queued task (an existing one if deduplicated)."""
+        if task.id and task.id in self.tasks:
+            existing = self.tasks[task.id]
+            if existing.status not in FINISHED:
+                return self._merge(existing, task)
+            raise ValueError(f"Task id {task.id!r} already used.")
+        for dep in task.deps:
+            if dep not in self.tasks:
+                raise ValueError(f"Task {task.title!r} depends on unknown task {dep!r}.")
+
+        duplicate = self._pending_keys.get(task.dedup_key)
+        if duplicate is not None:
+            return self._merge(self.tasks[duplicate], task)
+
+        task.seq = next(self._seq)
+        task.id = task.id or f"t{task.seq}"
+        task.enqueued = self.clock()
+        task.rank = task.est_cost
+        self.tasks[task.id] = task
+        self._pending_keys[task.dedup_key] = task.id
+        self._active += 1
+        self.stats["submitted"] += 1
+        for dep in task.deps:
+            self._dependents.setdefault(dep, set()).add(task.id)
+            self._raise_rank(dep, task.rank)
+        if self._unfinished(task):
+            task.status = BLOCKED
+        else:
+            self._make_ready(task)
+        return task
+
+    def submit_many(self, specs: Iterable[Union[str, Dict[str, Any], Task]], priority: float = 0) -> List[Task]:
+        """
+        Add a batch whose tasks may depend on each other by id, in any order.
+        The batch is checked for cycles and unknown ids before anything is
+        queued (ValueError); tasks are then submitted in topological order.
+        """
+        batch = [Task.from_spec(spec, priority) for spec in specs]
+        by_id: Dict[str, Task] = {}
+        for task in batch:
+            if not task.id:
+                task.id = f"t{next(self._seq)}"
+            if task.id in by_id:
+                raise ValueError(f"Duplicate task id {task.id!r} in batch.")
+            by_id[task.id] = task
+
+        for task in batch:
+            for dep in task.deps:
+                if dep not in by_id and dep not in self.tasks:
+                    raise ValueError(f"Task {task.id!r} depends on unknown task {dep!r}.")
+
+        # Kahn's algorithm over the in-batch edges.
+        indegree = {tid: sum(1 for d in t.deps if d in by_id) for tid, t in by_id.items()}
+        children: Dict[str, List[str]] = {}
+        for tid, task in by_id.items():
+            for dep in task.deps:
+                if dep in by_id:
+                    children.setdefault(dep, []).append(tid)
+        order = [tid for tid in by_id if indegree[tid] == 0]
+        for tid in order:
+            for child in children.get(tid, ()):
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    order.append(child)
+        if len(order) != len(by_id):
+            cyclic = sorted(tid for tid, n in indegree.items() if n > 0)
+            raise ValueError(f"Dependency cycle among tasks: {', '.join(cyclic)}")
+
+        # Dedup may map a batch id onto an existing task; rewrite later deps.
+        alias: Dict[str, str] = {}
+        queued = []
+        for tid in order:
+            task = by_id[tid]
+            task.deps = {alias.get(d, d) for d in task.deps}
+            result = self.submit(task)
+            alias[tid] = result.id
+            queued.append(result)
+        return queued
+
+    def _merge(self, existing: Task, task: Task) -> Task:
+        new_deps = {d for d in task.deps if d != existing.id} - existing.deps
+        for dep in new_deps:
+            if dep not in self.tasks:
+                raise ValueError(f"Task {task.title!r} depends on unknown task {dep!r}.")
+            if self._reaches(dep, existing.id):
+                raise ValueError(f"Dependency cycle: {existing.id} -> {dep} -> ... -> {existing.id}")
+        existing.priority = max(existing.priority, task.priority)
+        existing.files = sorted(set(existing.files) | set(task.files))
+        existing.detail = task.detail or existing.detail  # The newest instructions win
+        for dep in new_deps:
+            existing.deps.add(dep)
+            self._dependents.setdefault(dep, set()).add(existing.id)
+            self._raise_rank(dep, existing.rank)
+        if existing.status == READY and self._unfinished(existing):
+            existing.status = BLOCKED
+            existing.version += 1  # Drops its heap entry
+        elif existing.status == READY:
+            self._push_ready(existing)
+        self.stats["deduplicated"] += 1
+        return existing
+
+    def _reaches(self, start: str, target: str) -> bool:
+        """True if target is start or one of its (transitive) dependencies."""
+        stack, seen = [start], set()
+        while stack:
+            tid = stack.pop()
+            if tid == target:
+                return True
+            if tid not in seen:
+                seen.add(tid)
+                stack.extend(self.tasks[tid].deps if tid in self.tasks else ())
+        return False
+
+    def _unfinished(self, task: Task) -> bool:
+        return any(self.tasks[d].status not in FINISHED for d in task.deps)
+
+    def _raise_rank(self, tid: str, child_rank: float):
+        """Propagate a longer downstream chain up through unfinished ancestors."""
+        stack = [(tid, child_rank)]
+        while stack:
+            tid, child_rank = stack.pop()
+            task = self.tasks[tid]
+            if task.status in FINISHED or task.rank >= task.est_cost + child_rank:
+                continue
+            task.rank = task.est_cost + child_rank
+            if task.status == READY:
+                self._push_ready(task)
+            stack.extend((dep, task.rank) for dep in task.deps)
+
+    # --- Dispatch ---------------------------------------------------------
+
+    def _push_ready(self, task: Task):
+        task.version += 1
+        key = -(task.priority + task.rank) + self.aging_rate * task.enqueued
+        heapq.heappush(self._heaps.setdefault(task.role, []), (key, task.seq, task.version, task))
+
+    def _make_ready(self, task: Task):
+        task.status = READY
+        task.enqueued = self.clock()
+        self._push_ready(task)
+
+    @staticmethod
+    def _live(item: tuple) -> bool:
+        return item[3].status == READY and item[2] == item[3].version
+
+    def _best_heap(self, role: str, include_any: bool = True) -> Optional[List[tuple]]:
+        best = None
+        for name in ((role, ANY_ROLE) if include_any else (role,)):
+            heap = self._heaps.get(name)
+            while heap and not self._live(heap[0]):
+                heapq.heappop(heap)
+            if heap and (best is None or heap[0] < best[0]):
+                best = heap
+        return best
+
+    def peek(self, role: str) -> Optional[Task]:
+        heap = self._best_heap(role)
+        return heap[0][3] if heap else None
+
+    def pop(self, role: str, lease: bool = True, include_any: bool = True) -> Optional[Task]:
+        """
+        Best ready task for role (its own heap or, with include_any, the
+        shared ANY heap), or None. With lease, tasks whose files are leased
+        by another task are skipped and the returned task's files are leased
+        to its id.
+        """
+        skipped = []
+        try:
+            while True:
+                heap = self._best_heap(role, include_any)
+                if heap is None:
+                    return None
+                item = heapq.heappop(heap)
+                task = item[3]
+                if lease and task.files:
+                    if any(self.leases.holder(f) not in (None, task.id) for f in task.files):
+                        skipped.append((heap, item))
+                        continue
+                    for path in task.files:
+                        self.leases.acquire(path, task.id)
+                task.status = RUNNING
+                self._active -= 1
+                self._pending_keys.pop(task.dedup_key, None)
+                return task
+        finally:
+            for heap, item in skipped:
+                heapq.heappush(heap, item)
+
+    def complete(self, task_id: str, ok: bool = True, result: str = "") -> List[Task]:
+        """Mark a task finished and return the dependents it made ready."""
+        task = self.tasks[task_id]
+        task.status = DONE if ok else FAILED
+        task.result = result
+        self.stats["completed" if ok else "failed"] += 1
+        released = []
+        for child_id in self._dependents.pop(task_id, ()):
+            child = self.tasks[child_id]
+            if child.status == BLOCKED and not self._unfinished(child):
+                self._make_ready(child)
+                released.append(child)
+        return released
+
+    def restore(self, task: Task, status: str, result: str = "") -> Task:
+        """
+        Re-add a task from a saved session, in original submission order.
+        Finished tasks stay finished; the rest (running ones included) are
+        queued again.
+        """
+        if status not in FINISHED:
+            return self.submit(task)
+        task.seq = next(self._seq)
+        task.status = status
+        task.result = result
+        self.tasks[task.id] = task
+        return task
+
+    def resolve(self, task_id: str, ok: bool, result: str = "") -> List[Task]:
+        """complete() for a task that may still be queued (journal replay)."""
+        task = self.tasks.get(task_id)
+        if task is None or task.status in FINISHED:
+            return []
+        if task.status != RUNNING:
+            self._active -= 1
+            self._pending_keys.pop(task.dedup_key, None)
+        return self.complete(task_id, ok, result)
+
+    def requeue(self, task: Task):
+        """Return a running task (e.g. cancelled) to the ready heap."""
+        if task.status != RUNNING:
+            return
+        self._active += 1
+        self._pending_keys.setdefault(task.dedup_key, task.id)
+        if self._unfinished(task):
+            task.status = BLOCKED
+        else:
+            self._make_ready(task)
+
+    # --- Introspection ----------------------------------------------------
+
+    def effective_priority(self, task: Task) -> float:
+        return task.priority + task.rank + self.aging_rate * (self.clock() - task.enqueued)
+
+    def pending(self, role: Optional[str] = None) -> int:
+        """Blocked + ready tasks (for one role, or in total)."""
+        if role is None:
+            return self._active
+        return sum(1 for t in list(self.tasks.values()) if t.role == role and t.status in (BLOCKED, READY))
+
+    def running(self) -> List[Task]:
+        return [t for t in list(self.tasks.values()) if t.status == RUNNING]
+
+    def roles(self) -> List[str]:
+        return sorted({t.role for t in list(self.tasks.values()) if t.status == READY})
+
+    def clear(self):
+        """Drop everything that has not started."""
+        for task in list(self.tasks.values()):
+            if task.status in (BLOCKED, READY):
+                task.status = FAILED
+                task.version += 1
+        self._heaps.clear()
+        self._pending_keys.clear()
+        self._active = 0
+
+    def __len__(self) -> int:
+        return self._active
+
+    def __iter__(self) -> Iterator[Task]:
+        """Pending tasks: ready ones best first, then blocked ones (for display)."""
+        tasks = [t for t in list(self.tasks.values()) if t.status in (BLOCKED, READY)]
+        now = self.clock()
+        return iter(sorted(tasks, key=lambda t: (t.status != READY,
+                                                 -(t.priority + t.rank + self.aging_rate * (now - t.enqueued)),
+                                                 t.seq)))
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        counts: Dict[str, Dict[str, int]] = {}
+        for task in list(self.tasks.values()):
+            if task.status in (BLOCKED, READY, RUNNING):
+                role = counts.setdefault(task.role, {BLOCKED: 0, READY: 0, RUNNING: 0})
+                role[task.status] += 1
+        return counts
+
+
+class FairShare:
+    """
+    Concurrency limit shared by several tenants (missions). When a slot frees
+    up it goes to the waiting tenant with the fewest slots in use relative to
+    its weight, so one mission with a deep queue cannot starve the others.
+    Use from a single event loop.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.weights: Dict[str, float] = {}
+        self.in_use: Dict[str, int] = defaultdict(int)
+        self.granted: Dict[str, int] = defaultdict(int)
+        self._waiters: Dict[str, deque] = defaultdict(deque)
+        self._active = 0
+
+    def _share(self, key: str) -> tuple:
+        return (self.in_use[key] / self.weights.get(key, 1.0), self.granted[key])
+
+    def _take(self, key: str):
+        self._active += 1
+        self.in_use[key] += 1
+        self.granted[key] += 1
+
+    def _grant(self):
+        while self._active < self.capacity:
+            waiting = [key for key, queue in self._waiters.items() if queue]
+            if not waiting:
+                return
+            key = min(waiting, key=self._share)
+            future = self._waiters[key].popleft()
+            if not future.done():
+                self._take(key)
+                future.set_result(None)
+
+    async def acquire(self, key: str):
+        if self._active < self.capacity and not any(self._waiters.values()):
+            self._take(key)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[key].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(key)  # Granted just as we were cancelled
+            elif future in self._waiters[key]:
+                self._waiters[key].remove(future)
+            raise
+
+    def release(self, key: str):
+        self._active -= 1
+        self.in_use[key] -= 1
+        self._grant()
+
+    @asynccontextmanager
+    async def slot(self, key: str):
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "active": self._active,
+                "in_use": {k: v for k, v in self.in_use.items() if v},
+                "waiting": {k: len(q) for k, q in self._waiters.items() if q}}
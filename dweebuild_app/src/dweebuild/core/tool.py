@@ -5,6 +5,11 @@ class BaseTool(abc.ABC):
     """
     Abstract Base Class for Tools.
     """
+    def __new__(cls, *args, **kwargs):
+        self = super().__new__(cls)
+        self._init_args = (args, kwargs)  # Lets a worker process rebuild the tool
+        return self
+
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
@@ -0,0 +1,45 @@
+import threading
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Mission the current task works for. Set by the Orchestrator's dispatch loop;
+# asyncio tasks inherit it, so LLM and tool calls deep in an agent are charged
+# to the right mission without threading an id through every call.
+current_mission: ContextVar[Optional[str]] = ContextVar("dweebuild_mission", default=None)
+
+
+class UsageMeter:
+    """Thread-safe per-mission counters (LLM calls/tokens, tool calls, agent time)."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def add(self, mission: str, amounts: Dict[str, float]):
+        with self._lock:
+            bucket = self._usage[mission]
+            for key, value in amounts.items():
+                bucket[key] += value
+
+    def get(self, mission: str) -> Dict[str, float]:
+        with self._lock:
+            return {k: round(v, 3) for k, v in self._usage.get(mission, {}).items()}
+
+    def pop(self, mission: str) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._usage.pop(mission, {}))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            missions = list(self._usage)
+        return {mission: self.get(mission) for mission in missions}
+
+
+usage_meter = UsageMeter()
+
+
+def record_usage(**amounts: float):
+    """Charge amounts to the current mission (no-op outside one)."""
+    mission = current_mission.get()
+    if mission is not None:
+        usage_meter.add(mission, amounts)
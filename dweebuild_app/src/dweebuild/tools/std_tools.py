@@ -1,11 +1,29 @@
 import asyncio
+import importlib.util
 import os
+import shlex
+import shutil
 import subprocess
-from typing import Any, Optional
+import tempfile
+from typing import Any, Optional, Tuple, Union
 from pathlib import Path
+from dweebuild.core.action_parser import Spool
+from dweebuild.core.code_index import get_code_index
+from dweebuild.core.config import config
+from dweebuild.core.executor import shell_executor
+from dweebuild.core.reports import TestReport
 from dweebuild.core.tool import BaseTool
 
 
+async def _run(cmd: str, cwd: Optional[str] = None, timeout: Optional[float] = None) -> Tuple[int, str, str]:
+    """Run cmd in a warm shell session; returns (returncode, stdout, stderr)."""
+    result = await shell_executor.run(cmd, cwd=cwd, timeout=timeout)
+    stderr = result.stderr  # Head and tail only when the output was large
+    if result.timed_out:
+        stderr += f"\n[killed after {result.duration:.0f}s timeout]"
+    return result.returncode, result.stdout, stderr
+
+
 # === EXISTING TOOLS (Enhanced) ===
 
 class ShellTool(BaseTool):
@@ -15,15 +33,10 @@ class ShellTool(BaseTool):
 
     async def execute(self, cmd: str, **kwargs) -> str:
         try:
-            proc = await asyncio.create_subprocess_shell(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await proc.communicate()
-            if proc.returncode != 0:
-                return f"ERROR (Exit {proc.returncode}): {stderr.decode().strip()}"
-            return stdout.decode().strip()
+            returncode, stdout, stderr = await _run(cmd)
+            if returncode != 0:
+                return f"ERROR (Exit {returncode}): {stderr.strip()}"
+            return stdout.strip()
         except Exception as e:
             return f"EXECUTION ERROR: {str(e)}"
 
@@ -33,16 +46,27 @@ class FileWriteTool(BaseTool):
         super().__init__("file_write", "Writes content to a file.")
         self.root_dir = root_dir
 
-    async def execute(self, filepath: str, content: str, **kwargs) -> str:
+    async def execute(self, filepath: str, content: Union[str, Spool] = None, **kwargs) -> str:
+        """content may be a Spool (a streamed body on disk); it is moved into place."""
         full_path = os.path.abspath(os.path.join(self.root_dir, filepath))
         if not full_path.startswith(os.path.abspath(self.root_dir)):
             return "ERROR: Access denied (Path traversal attempt)."
+        if content is None:
+            return "ERROR: file_write requires content."
         
         os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        with open(full_path, "w") as f:
-            f.write(content)
+        if isinstance(content, Spool):
+            shutil.move(content.path, full_path)
+        else:
+            with open(full_path, "w") as f:
+                f.write(content)
         return f"Successfully wrote to {filepath}"
 
+# Share of AGENT_TIMEOUT_SECONDS a test run may take by default, so a hung
+# run is reported as a failure before the agent running it times out.
+TEST_TIMEOUT_SHARE = 0.8
+
+
 class PytestTool(BaseTool):
     """Runs pytest on a specific directory or file."""
     def __init__(self, root_dir: str):
@@ -50,21 +74,42 @@ class PytestTool(BaseTool):
         self.shell = ShellTool()
         self.root_dir = root_dir
 
-    async def execute(self, target: str = "tests", **kwargs) -> str:
-        cmd = f"pytest {target}"
+    async def execute(self, target: str = "tests", tests: Optional[list] = None,
+                      workers: Optional[str] = None, **kwargs) -> str:
+        """tests: specific test files (node ids) to run instead of target."""
         try:
-            proc = await asyncio.create_subprocess_shell(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=self.root_dir
-            )
-            stdout, stderr = await proc.communicate()
-            output = stdout.decode() + "\n" + stderr.decode()
-            return output
+            report = await self.run(target, tests, workers)
+            return report.render()
         except Exception as e:
             return str(e)
 
+    async def run(self, target: str = "tests", tests: Optional[list] = None,
+                  workers: Optional[str] = None, timeout: Optional[float] = None) -> TestReport:
+        """Run pytest and read its JUnit XML into a TestReport; a killed run is a failed one."""
+        fd, junit = tempfile.mkstemp(prefix="dweebuild-junit-", suffix=".xml")
+        os.close(fd)
+        cmd = (f"pytest -q {' '.join(shlex.quote(t) for t in tests) if tests else target} "
+               f"--junitxml={shlex.quote(junit)} -o junit_family=xunit1")
+        workers = self._workers(workers, tests)
+        if workers:
+            cmd += f" -n {workers}"
+        try:
+            returncode, stdout, stderr = await _run(
+                cmd, cwd=self.root_dir, timeout=timeout or config.agent_timeout * TEST_TIMEOUT_SHARE)
+            return TestReport.from_junit(junit, returncode, stdout + "\n" + stderr)
+        finally:
+            os.unlink(junit)
+
+    @staticmethod
+    def _workers(workers: Optional[str], tests: Optional[list]) -> Optional[str]:
+        """pytest-xdist -n value, when xdist is installed and the run is big enough to pay for it."""
+        workers = str(workers or config.test_workers)
+        if workers in ("", "0", "1") or importlib.util.find_spec("xdist") is None:
+            return None
+        if tests is not None and len(tests) < 4:
+            return None  # Worker start-up would cost more than it saves
+        return workers
+
 # === NEW TOOLS ===
 
 class FileReadTool(BaseTool):
@@ -88,21 +133,21 @@ class FileReadTool(BaseTool):
             return f"ERROR: {str(e)}"
 
 class GrepTool(BaseTool):
-    """Searches for patterns in the codebase."""
+    """Searches for patterns in the codebase (through the shared trigram index)."""
     def __init__(self, root_dir: str):
-        super().__init__("grep", "Searches for text patterns in files.")
+        super().__init__("grep", "Searches for text patterns (regex, or literal=true) in files; "
+                                 "returns file:line:text.")
         self.root_dir = root_dir
 
-    async def execute(self, pattern: str, path: str = ".", **kwargs) -> str:
-        cmd = f"grep -r '{pattern}' {path}"
-        proc = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=self.root_dir
-        )
-        stdout, stderr = await proc.communicate()
-        return stdout.decode() if stdout else "No matches found."
+    async def execute(self, pattern: str, path: str = ".", literal: bool = False,
+                      ignore_case: bool = False, **kwargs) -> str:
+        full_path = os.path.abspath(os.path.join(self.root_dir, path))
+        if not full_path.startswith(os.path.abspath(self.root_dir)):
+            return "ERROR: Access denied"
+        index = get_code_index(self.root_dir)
+        relpath = os.path.relpath(full_path, index.root)
+        matches = await asyncio.to_thread(index.search, pattern, relpath, literal, ignore_case)
+        return "\n".join(matches) if matches else "No matches found."
 
 class GitTool(BaseTool):
     """Git operations."""
@@ -123,14 +168,8 @@ class GitTool(BaseTool):
             return f"ERROR: Unknown git action: {action}"
         
         cmd = commands[action]
-        proc = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=self.root_dir
-        )
-        stdout, stderr = await proc.communicate()
-        return stdout.decode() + stderr.decode()
+        returncode, stdout, stderr = await _run(cmd, cwd=self.root_dir)
+        return stdout + stderr
 
 class PipTool(BaseTool):
     """Install Python packages."""
@@ -139,15 +178,10 @@ class PipTool(BaseTool):
 
     async def execute(self, package: str, **kwargs) -> str:
         cmd = f"pip install -q {package}"
-        proc = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
-        if proc.returncode == 0:
+        returncode, stdout, stderr = await _run(cmd, timeout=config.agent_timeout)
+        if returncode == 0:
             return f"Successfully installed {package}"
-        return f"ERROR installing {package}: {stderr.decode()}"
+        return f"ERROR installing {package}: {stderr}"
 
 class WebSearchTool(BaseTool):
     """Performs web searches."""
@@ -191,15 +225,9 @@ class LintTool(BaseTool):
     async def execute(self, target: str = ".", **kwargs) -> str:
         # Try ruff first, fallback to pylint
         for cmd in [f"ruff check {target}", f"pylint {target}"]:
-            proc = await asyncio.create_subprocess_shell(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=self.root_dir
-            )
-            stdout, stderr = await proc.communicate()
-            if proc.returncode != 127:  # Command exists
-                return stdout.decode() + stderr.decode()
+            returncode, stdout, stderr = await _run(cmd, cwd=self.root_dir)
+            if returncode != 127:  # Command exists
+                return stdout + stderr
         return "No linter found. Install ruff or pylint."
 
 class FormatTool(BaseTool):
@@ -210,14 +238,8 @@ class FormatTool(BaseTool):
 
     async def execute(self, target: str = ".", **kwargs) -> str:
         cmd = f"black {target}"
-        proc = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=self.root_dir
-        )
-        stdout, stderr = await proc.communicate()
-        return stdout.decode() if proc.returncode == 0 else f"ERROR: {stderr.decode()}"
+        returncode, stdout, stderr = await _run(cmd, cwd=self.root_dir)
+        return stdout if returncode == 0 else f"ERROR: {stderr}"
 
 class ComplexityTool(BaseTool):
     """Analyzes code complexity."""
@@ -227,14 +249,8 @@ class ComplexityTool(BaseTool):
 
     async def execute(self, target: str = ".", **kwargs) -> str:
         cmd = f"radon cc {target} -a"
-        proc = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=self.root_dir
-        )
-        stdout, stderr = await proc.communicate()
-        return stdout.decode() if proc.returncode == 0 else "Radon not installed."
+        returncode, stdout, stderr = await _run(cmd, cwd=self.root_dir)
+        return stdout if returncode == 0 else "Radon not installed."
 
 class CoverageTool(BaseTool):
     """Runs test coverage."""
@@ -243,12 +259,7 @@ class CoverageTool(BaseTool):
         self.root_dir = root_dir
 
     async def execute(self, **kwargs) -> str:
-        cmd = "pytest --cov=. --cov-report=term"
-        proc = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=self.root_dir
-        )
-        stdout, stderr = await proc.communicate()
-        return stdout.decode() + stderr.decode()
+        # Per-test contexts let QA's impact map select tests from coverage.
+        cmd = "pytest --cov=. --cov-report=term --cov-context=test"
+        returncode, stdout, stderr = await _run(cmd, cwd=self.root_dir, timeout=config.agent_timeout)
+        return stdout + stderr
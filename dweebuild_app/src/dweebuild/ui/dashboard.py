@@ -6,6 +6,7 @@ from collections import deque
 from dweebuild.core.orchestrator import Orchestrator
 from dweebuild.core.modes import WorkMode
 from dweebuild.core.config import config
+from dweebuild.core.journal import open_journal
 from dweebuild.core.persistence import SessionManager
 from dweebuild.agents.architect import ArchitectAgent
 from dweebuild.agents.engineer import EngineerAgent
@@ -225,7 +226,7 @@ if "orc" not in st.session_state:
     if "selected_mode" not in st.session_state:
         st.session_state.selected_mode = WorkMode.SINGLE
     
-    orc = Orchestrator(mode=st.session_state.selected_mode)
+    orc = Orchestrator(mode=st.session_state.selected_mode, journal=open_journal())
     product_root = os.path.abspath("product_build")
     
     # Initialize Agents with ALL tools
@@ -249,11 +250,21 @@ if "orc" not in st.session_state:
     orc.register_agent(arch)
     orc.register_agent(eng)
     orc.register_agent(qa)
+    if config.worker_processes:
+        orc.start_workers()
     
     st.session_state.orc = orc
-    st.session_state.session_manager = SessionManager()
+    st.session_state.session_manager = orc.sessions = SessionManager()
     st.session_state.mission_input = ""
     st.session_state.is_running = False
+    if config.resume_on_start:
+        latest = st.session_state.session_manager.latest(orc.session_id)
+        snapshot = st.session_state.session_manager.load_session(latest) if latest else None
+        if snapshot or config.journal_dir:
+            orc.restore(snapshot, config.journal_dir or None)
+        if len(orc.scheduler):
+            orc.start()
+            st.session_state.is_running = True
 
 # === HEADER ===
 c1, c2 = st.columns([1, 5])
@@ -289,14 +300,7 @@ if mode_options[selected] != st.session_state.orc.mode_config.mode:
     st.rerun()
 
 if b4.button("💾 SAVE", use_container_width=True):
-    state = {
-        "mode": st.session_state.orc.mode_config.mode.value,
-        "agents": st.session_state.orc.agents,
-        "tasks": list(st.session_state.orc.task_queue),
-        "logs": st.session_state.orc.memory.get_logs(),
-        "iteration_count": st.session_state.orc.iteration_count
-    }
-    path = st.session_state.session_manager.save_session("dweeb_session", state)
+    path = st.session_state.orc.save_session()  # Deltas only store what changed
     st.success(f"Saved to {path}")
 
 # === MAIN DASHBOARD === 
@@ -315,7 +319,7 @@ with col_left:
         elif agent.status == "ERROR": css = "agent-error"
         elif agent.status == "SUCCESS": css = "agent-success"
         
-        avatar = avatars.get(name, "🤖")
+        avatar = avatars.get(agent.kind, "🤖")
         
         st.markdown(f"""
         <div class='agent-card {css}'>
@@ -327,6 +331,7 @@ with col_left:
                 <span style='font-size:10px; opacity:0.8; text-transform:uppercase;'>{agent.status}</span>
             </div>
             <div style='font-size:11px; margin-top:8px; color:#a1a1aa; font-style:italic;'>{agent.thought}</div>
+            <div style='font-size:10px; margin-top:4px; color:#00d4ff; font-family:monospace;'>{agent.progress}</div>
         </div>
         """, unsafe_allow_html=True)
     
@@ -384,11 +389,11 @@ with col_right:
     st.markdown("</div>", unsafe_allow_html=True)
 
 # === ASYNC RUNNER ===
-async def run_swarm():
-    await st.session_state.orc.run_concurrent()
-    st.session_state.orc.iteration_count += 1
-
-if st.session_state.is_running and st.session_state.orc.should_continue():
-    asyncio.run(run_swarm())
+# The dispatch loop runs in a background thread; reruns only refresh the view.
+if st.session_state.is_running:
+    st.session_state.orc.start_background()
     time.sleep(0.5)
-    st.rerun()
+    if st.session_state.orc.is_dispatching:
+        st.rerun()
+    else:
+        st.session_state.is_running = False
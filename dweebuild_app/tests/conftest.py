@@ -0,0 +1,25 @@
+import os
+
+# Offline defaults: the scripted provider instead of real LLM backends, and
+# every cache, spill and journal directory kept out of the working tree.
+os.environ["LLM_PROVIDERS"] = "scripted"
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["JOURNAL_DIR"] = ""
+os.environ["TOOL_OUTPUT_SPILL_DIR"] = ""
+
+import pytest
+
+from dweebuild.core.llm import LLMClient
+from dweebuild.core.providers import ScriptedProvider
+from dweebuild.core.router import LLMRouter
+
+
+@pytest.fixture
+def scripted_llm():
+    """LLMClient over a single ScriptedProvider; pass replies to script the model."""
+    def build(*replies, **kwargs):
+        provider = ScriptedProvider(replies, **kwargs)
+        client = LLMClient(router=LLMRouter([provider]))
+        client.provider = provider
+        return client
+    return build
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import logging
+
+from dweebuild.core.action_parser import IncrementalActionParser, ParseMetrics, Spool, parse_action, stream_action
+from dweebuild.tools.std_tools import FileWriteTool
+
+ACTION = '{"thought": "t", "tool": "file_read", "args": {"path": "a.py"}}'
+
+
+def test_clean_and_fenced_actions():
+    metrics = ParseMetrics()
+    assert parse_action(ACTION, metrics)["tool"] == "file_read"
+    assert parse_action(f"Sure.\n```json\n{ACTION}\n```\nDone.", metrics)["args"] == {"path": "a.py"}
+    assert metrics.counts["clean"] == metrics.counts["embedded"] == 1
+
+
+def test_trailing_comma_is_repaired():
+    metrics = ParseMetrics()
+    action = parse_action('{"tool": "file_read", "args": {"path": "a.py",},}', metrics)
+    assert action["args"] == {"path": "a.py"}
+    assert metrics.counts["repaired"] == 1
+
+
+def test_truncated_reply_keeps_complete_arguments():
+    metrics = ParseMetrics()
+    action = parse_action('{"tool": "file_read", "args": {"path": "a.py"}, "thought": "and th', metrics)
+    assert action["tool"] == "file_read" and action["args"] == {"path": "a.py"}
+    assert metrics.counts["truncated"] == 1
+
+
+def test_finished_prose_is_a_final_answer():
+    metrics = ParseMetrics()
+    action = parse_action("All tests pass and the endpoint is documented.", metrics)
+    assert action["tool"] == "FINAL_ANSWER"
+    assert action["args"]["result"] == "All tests pass and the endpoint is documented."
+    assert metrics.counts["prose"] == 1
+
+
+def test_cut_off_or_empty_prose_is_not_a_final_answer():
+    metrics = ParseMetrics()
+    for reply in ("", "   ", "I will now write the handler for the", "LLM ERROR: all providers failed."):
+        assert parse_action(reply, metrics) is None
+    assert metrics.counts["failed"] == 4 and metrics.counts["prose"] == 0
+
+
+def test_incremental_parser_streams_thought_and_spools_content():
+    parser = IncrementalActionParser()
+    reply = '{"thought": "writing", "tool": "file_write", "args": {"path": "a.py", "content": "x = 1\\n"}}'
+    events = []
+    for i in range(0, len(reply), 5):
+        events.extend(parser.feed(reply[i:i + 5]))
+    assert "".join(e[2] for e in events if e[0] == "chunk" and e[1] == ("thought",)) == "writing"
+    assert parser.action_ready
+    assert parser.result()["args"]["path"] == "a.py"
+
+
+async def chunks_of(text, size=7):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def test_streamed_file_body_is_moved_into_place(tmp_path):
+    spool_dir, project = tmp_path / "spool", tmp_path / "project"
+    spool_dir.mkdir()
+    reply = '{"thought": "w", "tool": "file_write", "args": {"filepath": "a.py", "content": "x = 1\\n"}}'
+    action, _ = asyncio.run(stream_action(chunks_of(reply), spool_dir=str(spool_dir)))
+    assert isinstance(action["args"]["content"], Spool)
+    assert asyncio.run(FileWriteTool(str(project)).execute(**action["args"])).startswith("Successfully")
+    assert (project / "a.py").read_text() == "x = 1\n"
+    assert not any(spool_dir.iterdir())
+
+
+def test_model_cannot_name_a_file_to_move(tmp_path):
+    secret, project = tmp_path / "secret", tmp_path / "project"
+    secret.write_text("token")
+    reply = json.dumps({"tool": "file_write", "args": {"filepath": "leak.txt", "content_file": str(secret)}})
+    action = parse_action(reply)
+    assert asyncio.run(FileWriteTool(str(project)).execute(**action["args"])).startswith("ERROR")
+    assert secret.read_text() == "token" and not (project / "leak.txt").exists()
+
+
+def test_get_json_logs_unparseable_replies(scripted_llm, caplog):
+    llm = scripted_llm("not json at all")
+    with caplog.at_level(logging.WARNING, logger="dweebuild.core.llm"):
+        assert asyncio.run(llm.get_json("sys", "hi")) == {}
+    assert "not json at all" in caplog.text
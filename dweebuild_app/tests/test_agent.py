@@ -0,0 +1,105 @@
+import asyncio
+
+from dweebuild.core.action_parser import Spool
+from dweebuild.core.agent import BaseAgent, apply_step
+from dweebuild.core.journal import Journal, replay
+from dweebuild.core.memory import ProjectMemory
+from dweebuild.core.scheduler import FileLeases
+from dweebuild.core.tool import BaseTool
+
+
+class RecordingTool(BaseTool):
+    def __init__(self, name, events):
+        super().__init__(name, "records its calls")
+        self.events = events
+
+    async def execute(self, **kwargs):
+        self.events.append(("start", self.name))
+        await asyncio.sleep(0.01)
+        self.events.append(("end", self.name))
+        return f"{self.name} output"
+
+
+def make_agent(*names):
+    events = []
+    agent = BaseAgent("ENGINEER", "Engineer", "mission")
+    for name in names:
+        agent.equip(RecordingTool(name, events))
+    return agent, events
+
+
+def run_steps(agent, *steps):
+    async def main():
+        seen_calls, semaphore = {}, asyncio.Semaphore(4)
+        for calls in steps:
+            await agent._execute_calls([{"tool": t, "args": {}} for t in calls], seen_calls, semaphore)
+    asyncio.run(main())
+
+
+def test_repeated_read_is_answered_from_the_cache():
+    agent, events = make_agent("file_read")
+    run_steps(agent, ["file_read"], ["file_read"])
+    assert events.count(("start", "file_read")) == 1
+    assert agent.conversation.stats["repeats"] == 1
+
+
+def test_any_other_tool_invalidates_the_cache():
+    for tool in ("shell_exec", "format_code", "git", "pip_install", "file_write"):
+        agent, events = make_agent("file_read", tool)
+        run_steps(agent, ["file_read"], [tool], ["file_read"], [tool])
+        assert events.count(("start", "file_read")) == 2, tool
+        assert events.count(("start", tool)) == 2, tool
+
+
+def test_state_changing_call_runs_alone_in_a_batch():
+    agent, events = make_agent("file_read", "grep", "shell_exec")
+    run_steps(agent, ["file_read", "grep", "shell_exec", "file_read"])
+    shell = events.index(("start", "shell_exec"))
+    assert events[shell + 1] == ("end", "shell_exec")
+    assert set(events[:shell]) == {("start", "file_read"), ("end", "file_read"),
+                                   ("start", "grep"), ("end", "grep")}
+    assert events[shell + 2:] == [("start", "file_read"), ("end", "file_read")]
+
+
+def test_skipped_calls_delete_their_spools(tmp_path):
+    agent, events = make_agent("file_write")
+    agent.leases = FileLeases()
+    agent.leases.acquire("a.py", "another task")
+    spools = []
+    for name in ("leased", "unknown"):
+        path = tmp_path / f"{name}.spool"
+        path.write_text("body")
+        spools.append(Spool(str(path)))
+
+    async def main():
+        calls = [{"tool": "file_write", "args": {"filepath": "a.py", "content": spools[0]}},
+                 {"tool": "no_such_tool", "args": {"content": spools[1]}}]
+        await agent._execute_calls(calls, {}, asyncio.Semaphore(4))
+    asyncio.run(main())
+    assert events == []
+    assert not any(tmp_path.iterdir())
+
+
+def test_steps_journal_only_new_turns_and_replay_to_the_checkpoint(tmp_path):
+    journal = Journal(tmp_path, fsync="never")
+    agent = BaseAgent("ENGINEER", "Engineer", "mission")
+    agent.memory = ProjectMemory(journal=journal)
+    agent.current_task_id = "t1"
+    agent.conversation.start("system", "task")
+    for step in range(1, 41):
+        if step % 7 == 0:
+            agent.conversation.add_note("Reply with one JSON object.")  # Merges into the last observation
+        agent.conversation.add_action({"thought": f"step {step}", "tool": "file_read", "args": {}})
+        agent.conversation.add_observation("file_read", "x" * 200)
+        if step == 25:
+            asyncio.run(agent.conversation.compact())
+        agent._save_checkpoint(step)
+    journal.close()
+
+    steps = [e["d"] for e in replay(tmp_path) if e["k"] == "step"]
+    assert [s["attempt"] for s in steps if "conversation" in s] == [1, 25]  # Start and compaction
+    assert max(len(s.get("turns", ())) for s in steps) == 3
+    checkpoint = None
+    for step in steps:
+        checkpoint = apply_step(checkpoint, step)
+    assert checkpoint == agent.checkpoint
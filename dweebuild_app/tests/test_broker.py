@@ -0,0 +1,57 @@
+import asyncio
+
+from dweebuild.core.agent import BaseAgent
+from dweebuild.core.broker import InProcessBroker, WorkerPool, agent_spec, build_agent
+from dweebuild.core.modes import WorkMode
+from dweebuild.core.orchestrator import Orchestrator
+
+
+def test_jobs_are_claimed_once_in_order():
+    broker = InProcessBroker()
+    first = broker.submit({"coordinator": "c", "task": "1"})
+    broker.submit({"coordinator": "c", "task": "2"})
+    assert broker.claim("w1")["id"] == first
+    assert broker.claim("w2")["task"] == "2"
+    assert broker.claim("w1") is None
+
+
+def test_cancelled_jobs_are_not_delivered():
+    broker = InProcessBroker()
+    job = broker.submit({"coordinator": "c"})
+    broker.cancel(job)
+    assert broker.is_cancelled(job)
+    assert broker.claim("w") is None
+
+
+def test_messages_are_per_coordinator_with_a_cursor():
+    broker = InProcessBroker()
+    broker.publish("a", "j1", "log", {"n": 1})
+    broker.publish("b", "j2", "log", {"n": 2})
+    broker.publish("a", "j1", "log", {"n": 3})
+    messages, cursor = broker.fetch("a")
+    assert [m["payload"]["n"] for m in messages] == [1, 3]
+    assert broker.fetch("a", cursor) == ([], cursor)
+
+
+def test_agent_spec_rebuilds_the_agent():
+    agent = BaseAgent("ENGINEER", "Engineer", "mission")
+    rebuilt = build_agent(agent_spec(agent))
+    assert type(rebuilt) is BaseAgent
+    assert (rebuilt.name, rebuilt.kind, rebuilt.mission) == ("ENGINEER", "ENGINEER", "mission")
+
+
+def test_orchestrator_runs_tasks_on_workers(scripted_llm):
+    broker = InProcessBroker()
+    orc = Orchestrator(mode=WorkMode.SINGLE, llm=scripted_llm(), broker=broker)
+    orc.register_agent(BaseAgent("ENGINEER", "Engineer", "mission"))
+    workers = orc.start_workers(1)
+    try:
+        orc.start()
+        task = orc.add_task("Fix: the thing")
+        asyncio.run(asyncio.wait_for(orc.dispatch(), 10))
+    finally:
+        orc.stop_workers()
+    assert workers.alive == 0
+    assert task.status == "done"
+    assert task.result == "Default BaseAgent has no brain."
+    assert any("Starting ReAct Loop" in entry for entry in orc.agents["ENGINEER"].logs)
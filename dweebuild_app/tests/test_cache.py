@@ -0,0 +1,51 @@
+import json
+import threading
+
+from dweebuild.core.cache import ResponseCache, request_key
+
+
+def test_round_trip_through_memory_and_disk(tmp_path):
+    cache = ResponseCache(tmp_path)
+    key = request_key("groq", "m", [{"role": "user", "content": "hi"}], 0.0)
+    assert cache.get(key) is None
+    cache.put(key, "hello")
+    assert cache.get(key) == "hello"
+    assert ResponseCache(tmp_path).get(key) == "hello"  # A fresh cache reads it from disk
+    assert cache.stats["memory_hits"] == 1
+
+
+def test_sampled_requests_bypass_the_cache(tmp_path):
+    cache = ResponseCache(tmp_path, max_temperature=0.0)
+    assert cache.should_cache(0.0) and not cache.should_cache(0.7)
+
+
+def test_overwriting_an_entry_counts_its_bytes_once(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.put("ab" * 32, "first")
+    for value in ("second", "a much longer third value", "4"):
+        cache.put("ab" * 32, value)
+    assert cache._disk_bytes == cache._scan_size()
+
+
+def test_concurrent_puts_of_one_key_leave_a_valid_entry(tmp_path):
+    cache = ResponseCache(tmp_path)
+    key = "cd" * 32
+    values = [str(i) * 5000 for i in range(10)]
+    threads = [threading.Thread(target=lambda v=v: [cache.put(key, v) for _ in range(20)]) for v in values]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(cache._path(key)) as f:
+        assert json.load(f)["response"] in values
+    assert not list(tmp_path.rglob("*.tmp"))
+    assert cache._disk_bytes == cache._scan_size()
+
+
+def test_disk_store_is_trimmed_oldest_first(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=2000)
+    for i in range(20):
+        cache.put(f"{i:02d}" + "0" * 62, "x" * 200)
+    assert cache._scan_size() <= 2000
+    assert cache.get("19" + "0" * 62) == "x" * 200
+    assert ResponseCache(tmp_path).get("00" + "0" * 62) is None
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from dweebuild.core.code_index import CodeIndex, IgnoreRules
+
+
+def write(root, relpath, text):
+    path = root / relpath
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+@pytest.fixture
+def project(tmp_path):
+    write(tmp_path, "app/main.py", "import app.util\n\ndef main():\n    return util.helper()\n")
+    write(tmp_path, "app/util.py", "def helper():\n    return 42\n")
+    write(tmp_path, "build/out.py", "def helper(): pass\n")
+    write(tmp_path, ".gitignore", "build/\n*.log\n")
+    write(tmp_path, "debug.log", "helper\n")
+    return tmp_path
+
+
+def test_search_returns_grep_style_lines(project):
+    index = CodeIndex(str(project))
+    assert index.search(r"def \w+\(") == ["app/main.py:3:def main():", "app/util.py:1:def helper():"]
+
+
+def test_gitignored_files_are_not_indexed(project):
+    index = CodeIndex(str(project))
+    assert all(not m.startswith(("build/", "debug.log")) for m in index.search("helper"))
+
+
+def test_path_and_case_options(project):
+    index = CodeIndex(str(project))
+    assert index.search("HELPER", path="app/util.py", ignore_case=True) == ["app/util.py:1:def helper():"]
+    assert index.search("HELPER") == []
+
+
+def test_invalid_regex_is_searched_literally(project):
+    write(project, "app/odd.py", "x = call(\n")
+    index = CodeIndex(str(project))
+    assert index.search("call(") == ["app/odd.py:1:x = call("]
+
+
+def test_refresh_picks_up_changes(project):
+    index = CodeIndex(str(project))
+    assert index.search("banana") == []
+    write(project, "app/util.py", "def helper():\n    return 'banana'\n")
+    os.utime(project / "app/util.py", (1, 1))  # Same size is possible; make the mtime differ too
+    assert index.search("banana") == ["app/util.py:2:    return 'banana'"]
+    (project / "app/util.py").unlink()
+    assert index.search("banana") == []
+    assert index.refresh() == {"added": 0, "updated": 0, "removed": 0}
+
+
+def test_trigrams_narrow_the_candidates(project):
+    index = CodeIndex(str(project))
+    index.refresh()
+    assert index.candidates(["helper"]) == ["app/main.py", "app/util.py"]
+    assert index.candidates(["return 42"]) == ["app/util.py"]
+
+
+def test_ignore_rules_negation_and_anchoring():
+    rules = IgnoreRules()
+    rules.add(["*.py", "!keep.py", "/top.txt", "docs/"])
+    assert rules.ignored("a/b.py", False)
+    assert not rules.ignored("a/keep.py", False)
+    assert rules.ignored("top.txt", False) and not rules.ignored("sub/top.txt", False)
+    assert rules.ignored("docs", True) and not rules.ignored("docs", False)
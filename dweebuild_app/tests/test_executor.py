@@ -0,0 +1,112 @@
+import asyncio
+import os
+
+import pytest
+
+from dweebuild.core.executor import ShellExecutor
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/bin/sh"), reason="needs /bin/sh")
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_output_and_exit_status(tmp_path):
+    executor = ShellExecutor(pool_size=1, timeout=10)
+
+    async def main():
+        ok = await executor.run("echo out; echo err >&2", cwd=str(tmp_path))
+        failed = await executor.run("exit 3", cwd=str(tmp_path))
+        broken = await executor.run("if then fi", cwd=str(tmp_path))
+        after = await executor.run("pwd", cwd=str(tmp_path))
+        return ok, failed, broken, after
+
+    ok, failed, broken, after = run(main())
+    assert (ok.returncode, ok.stdout, ok.stderr) == (0, "out\n", "err\n")
+    assert failed.returncode == 3
+    assert broken.returncode != 0
+    assert after.stdout.strip() == str(tmp_path)
+    assert executor.stats["started"] == 1  # Exit and syntax errors did not cost the session
+
+
+def test_commands_cannot_change_the_session(tmp_path):
+    executor = ShellExecutor(pool_size=1, timeout=10)
+
+    async def main():
+        await executor.run("cd / && export LEAK=1", cwd=str(tmp_path))
+        return await executor.run('pwd; echo "[$LEAK]"', cwd=str(tmp_path))
+
+    assert run(main()).stdout == f"{tmp_path}\n[]\n"
+
+
+def test_background_jobs_cannot_write_into_later_output(tmp_path):
+    executor = ShellExecutor(pool_size=1, timeout=10)
+
+    async def main():
+        first = await executor.run("(sleep 0.3; echo LEAK; echo LEAK >&2) & echo first", cwd=str(tmp_path))
+        second = await executor.run("sleep 0.6; echo second", cwd=str(tmp_path))
+        return first, second
+
+    first, second = run(main())
+    assert (first.stdout, second.stdout, second.stderr) == ("first\n", "second\n", "")
+    assert executor.stats["started"] == 1  # The session outlived its command's background job
+
+
+def test_timeout_kills_the_process_group(tmp_path):
+    executor = ShellExecutor(pool_size=1, timeout=0.5)
+    marker = tmp_path / "survived"
+
+    async def main():
+        result = await executor.run(f"(sleep 2; touch {marker}) & sleep 5", cwd=str(tmp_path))
+        await asyncio.sleep(2.5)
+        return result
+
+    result = run(main())
+    assert result.timed_out
+    assert not marker.exists()
+    assert executor.stats["timeouts"] == 1
+
+
+def test_output_is_capped(tmp_path):
+    executor = ShellExecutor(pool_size=0, timeout=10, max_output_bytes=3000)
+    result = run(executor.run("seq 1 100000", cwd=str(tmp_path)))
+    assert result.returncode == 0 and result.truncated
+    assert result.stdout.startswith("1\n2\n") and result.stdout.endswith("99999\n100000\n")
+    assert len(result.stdout) < 4000
+
+
+def test_stream_delivers_output_as_it_arrives(tmp_path):
+    executor = ShellExecutor(pool_size=0, timeout=10)
+
+    async def main():
+        stream = executor.stream("echo one; sleep 0.2; echo two", cwd=str(tmp_path))
+        chunks = [text async for name, text in stream if name == "stdout"]
+        return chunks, stream.result
+
+    chunks, result = run(main())
+    assert "".join(chunks) == "one\ntwo\n"
+    assert len(chunks) == 2
+    assert result.returncode == 0
+
+
+def test_only_provider_keys_are_scrubbed(tmp_path, monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "llm-secret")
+    monkeypatch.setenv("GITHUB_TOKEN", "push-token")
+    monkeypatch.setenv("PIP_INDEX_PASSWORD", "index-password")
+    executor = ShellExecutor(pool_size=0, timeout=10)
+    result = run(executor.run('echo "[$GROQ_API_KEY][$GITHUB_TOKEN][$PIP_INDEX_PASSWORD]"', cwd=str(tmp_path)))
+    assert result.stdout == "[][push-token][index-password]\n"
+
+    monkeypatch.setenv("SHELL_SCRUB_ENV", "GROQ_API_KEY,GITHUB_TOKEN")
+    result = run(executor.run('echo "[$GITHUB_TOKEN]"', cwd=str(tmp_path)))
+    assert result.stdout == "[]\n"
+
+
+def test_runaway_output_does_not_fill_the_disk(tmp_path, monkeypatch):
+    monkeypatch.setenv("TOOL_OUTPUT_SPILL_DIR", str(tmp_path / "spill"))
+    monkeypatch.setenv("TOOL_OUTPUT_SPILL_MAX_MB", "1")
+    executor = ShellExecutor(pool_size=0, timeout=2, max_output_bytes=3000)
+    result = run(executor.run("yes", cwd=str(tmp_path)))
+    assert result.timed_out and result.truncated
+    assert os.path.getsize(result.stdout_file) < 1024 * 1024 + 200
@@ -0,0 +1,85 @@
+import pytest
+
+from dweebuild.core.impact import ImpactMap, is_test_file
+
+
+def write(root, relpath, text):
+    path = root / relpath
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+@pytest.fixture
+def project(tmp_path):
+    write(tmp_path, "pkg/__init__.py", "")
+    write(tmp_path, "pkg/core.py", "VALUE = 1\n")
+    write(tmp_path, "pkg/api.py", "from .core import VALUE\n")
+    write(tmp_path, "pkg/cli.py", "import sys\n")
+    write(tmp_path, "tests/test_api.py", "from pkg.api import VALUE\n")
+    write(tmp_path, "tests/test_cli.py", "from pkg import cli\n")
+    return tmp_path
+
+
+def passing_baseline(impact):
+    selection = impact.select()
+    assert selection.full
+    impact.record(selection, True, full_ran=True)
+
+
+def test_is_test_file():
+    assert is_test_file("tests/test_api.py") and is_test_file("api_test.py")
+    assert not is_test_file("tests/conftest.py") and not is_test_file("test_data.json")
+
+
+def test_first_run_is_the_full_suite(project):
+    selection = ImpactMap(str(project)).select()
+    assert selection.full and not selection.tests
+
+
+def test_changes_select_transitive_importers(project):
+    impact = ImpactMap(str(project), full_every=100)
+    passing_baseline(impact)
+    write(project, "pkg/core.py", "VALUE = 22\n")
+    selection = impact.select()
+    assert not selection.full
+    assert selection.tests == ["tests/test_api.py"]
+    assert selection.changed == ["pkg/core.py"]
+
+
+def test_nothing_changed_selects_nothing(project):
+    impact = ImpactMap(str(project), full_every=100)
+    passing_baseline(impact)
+    assert impact.select().tests == []
+
+
+def test_failing_tests_stay_selected_until_they_pass(project):
+    impact = ImpactMap(str(project), full_every=100)
+    passing_baseline(impact)
+    write(project, "pkg/cli.py", "import os\nimport sys\n")
+    selection = impact.select()
+    assert selection.tests == ["tests/test_cli.py"]
+    impact.record(selection, False, failing=["tests/test_cli.py"])
+
+    write(project, "pkg/core.py", "VALUE = 333\n")
+    assert impact.select().tests == ["tests/test_api.py", "tests/test_cli.py"]
+    impact.record(impact.select(), True)
+    assert impact.select().tests == []
+
+
+def test_conftest_and_config_changes_widen_the_selection(project):
+    impact = ImpactMap(str(project), full_every=100)
+    passing_baseline(impact)
+    write(project, "tests/conftest.py", "import pytest\n")
+    assert impact.select().tests == ["tests/test_api.py", "tests/test_cli.py"]
+    write(project, "pytest.ini", "[pytest]\n")
+    assert impact.select().full
+
+
+def test_every_nth_run_is_a_checkpoint(project):
+    impact = ImpactMap(str(project), full_every=2)
+    passing_baseline(impact)
+    write(project, "pkg/core.py", "VALUE = 4444\n")
+    first = impact.select()
+    assert not first.checkpoint
+    impact.record(first, True)
+    assert impact.select().checkpoint
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+
+from dweebuild.core.journal import Journal, replay
+from dweebuild.core.memory import ProjectMemory
+from dweebuild.core.orchestrator import Orchestrator
+
+
+def test_events_replay_in_order(tmp_path):
+    journal = Journal(tmp_path, fsync="never")
+    for i in range(5):
+        journal.append("log", source="A", level="INFO", message=f"m{i}")
+    journal.close()
+    events = list(replay(tmp_path))
+    assert [e["seq"] for e in events] == [1, 2, 3, 4, 5]
+    assert [e["d"]["message"] for e in replay(tmp_path, after_seq=3)] == ["m3", "m4"]
+
+
+def test_reopening_continues_the_sequence(tmp_path):
+    journal = Journal(tmp_path, fsync="never")
+    journal.append("kv", key="a", value=1)
+    journal.close()
+    journal = Journal(tmp_path, fsync="never")
+    assert journal.append("kv", key="b", value=2) == 2
+    journal.close()
+    assert [e["d"]["key"] for e in replay(tmp_path)] == ["a", "b"]
+
+
+def test_torn_last_line_is_skipped_and_sealed(tmp_path):
+    journal = Journal(tmp_path, fsync="never")
+    journal.append("kv", key="a", value=1)
+    journal.close()
+    segment = journal.segments()[-1]
+    with open(segment, "a") as f:
+        f.write('{"seq": 2, "t": 0, "k": "kv", "d": {"key"')  # Crash mid-write
+    journal = Journal(tmp_path, fsync="never")
+    journal.append("kv", key="b", value=2)
+    journal.close()
+    assert [e["d"]["key"] for e in replay(tmp_path)] == ["a", "b"]
+
+
+def test_segments_rotate_and_prune(tmp_path):
+    journal = Journal(tmp_path, fsync="never", segment_bytes=200)
+    for i in range(20):
+        journal.append("log", source="A", level="INFO", message="x" * 50)
+        journal.flush()
+    assert len(journal.segments()) > 3
+    removed = journal.prune(journal.seq - 2)
+    assert removed > 0
+    remaining = [e["seq"] for e in journal.replay()]
+    assert remaining[-1] == 20
+    assert remaining[0] <= 19  # Only whole segments below the cut are dropped
+    journal.close()
+
+
+def test_memory_rebuilds_from_the_journal(tmp_path):
+    journal = Journal(tmp_path, fsync="never")
+    memory = ProjectMemory(journal=journal)
+    memory.add_log("ENGINEER", "wrote app.py", "SUCCESS")
+    memory.update_context("stack", "flask")
+    memory.record("task", op="done", id="t1")
+    journal.close()
+
+    restored = ProjectMemory()
+    restored.replay(replay(tmp_path))
+    assert [e["message"] for e in restored.get_logs()] == ["wrote app.py"]
+    assert restored.get_context("stack") == "flask"
+
+
+def test_always_policy_fsyncs_off_the_calling_thread(tmp_path, monkeypatch):
+    synced_on = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced_on.append(threading.current_thread().name), real_fsync(fd)))
+    journal = Journal(tmp_path, fsync="always", flush_interval=10)
+    journal.append("kv", key="a", value=1)
+    deadline = time.monotonic() + 5
+    while not synced_on and time.monotonic() < deadline:
+        time.sleep(0.01)
+    journal.close()
+    assert synced_on == ["dweebuild-journal"]
+    assert [e["d"]["key"] for e in replay(tmp_path)] == ["a"]
+
+
+def test_events_larger_than_a_read_block_keep_their_seq(tmp_path):
+    journal = Journal(tmp_path, fsync="never", segment_bytes=1000)
+    journal.append("kv", key="a", value=1)
+    journal.append("kv", key="big", value="x" * 200_000)
+    journal.flush()
+    journal.append("kv", key="c", value=3)
+    journal.close()
+    assert [Journal._last_seq(path) for path in journal.segments()] == [2, 3]
+    assert [e["d"]["key"] for e in replay(tmp_path, 1)] == ["big", "c"]
+
+    journal = Journal(tmp_path, fsync="never", segment_bytes=1000)
+    assert journal.append("kv", key="d", value=4) == 4
+    assert journal.prune(1) == 0  # The first segment still holds event 2
+    journal.close()
+
+
+def test_stopping_the_orchestrator_leaves_fsync_to_the_journal_thread(tmp_path, scripted_llm, monkeypatch):
+    synced_on = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced_on.append(threading.current_thread().name), real_fsync(fd)))
+    journal = Journal(tmp_path, fsync="batch", flush_interval=10)
+    orc = Orchestrator(llm=scripted_llm(), journal=journal)
+    orc.memory.add_log("ENGINEER", "wrote app.py")
+    assert orc.snapshot()["journal_seq"] == journal.seq
+    orc.stop()
+    deadline = time.monotonic() + 5
+    while not synced_on and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert synced_on == ["dweebuild-journal"]
+    journal.close()
+    assert "Orchestrator stopped." in [e["d"]["message"] for e in replay(tmp_path) if e["k"] == "log"]
@@ -0,0 +1,254 @@
+import asyncio
+import threading
+
+import pytest
+
+from dweebuild.agents.architect import ArchitectAgent
+from dweebuild.core.llm import ClientPool, LLMClient, LLMError
+from dweebuild.core.providers import ScriptedProvider
+from dweebuild.core.router import LLMRouter
+
+MESSAGES = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}]
+
+
+def test_scripted_replies_in_order(scripted_llm):
+    llm = scripted_llm("one", "two")
+
+    async def main():
+        return [await llm.complete(MESSAGES + [{"role": "user", "content": str(i)}]) for i in range(3)]
+
+    assert asyncio.run(main()) == ["one", "two", "two"]
+
+
+def test_stream_yields_the_whole_reply(scripted_llm):
+    llm = scripted_llm("x" * 100, chunk_size=7)
+
+    async def main():
+        return [chunk async for chunk in llm.stream(MESSAGES)]
+
+    chunks = asyncio.run(main())
+    assert len(chunks) > 1 and "".join(chunks) == "x" * 100
+
+
+def test_identical_concurrent_requests_share_one_call(scripted_llm):
+    llm = scripted_llm("shared", latency=0.05)
+
+    async def main():
+        return await asyncio.gather(*(llm.complete(MESSAGES) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["shared"] * 5
+    assert len(llm.provider.calls) == 1
+    assert llm.stats["coalesced"] == 4
+
+
+def test_prompts_differing_only_in_whitespace_are_not_coalesced(scripted_llm):
+    llm = scripted_llm(lambda messages: messages[-1]["content"], latency=0.05)
+    prompts = ["def f():\n    return 1", "def f():\n        return 1", "def f(): return 1"]
+
+    async def main():
+        return await asyncio.gather(*(llm.complete([{"role": "user", "content": p}]) for p in prompts))
+
+    assert asyncio.run(main()) == prompts
+    assert llm.stats["coalesced"] == 0
+
+
+def test_requests_on_different_loops_are_not_coalesced():
+    provider = ScriptedProvider(["reply"], latency=0.1)
+    llm = LLMClient(router=LLMRouter([provider]))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(asyncio.run(llm.complete(MESSAGES))))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["reply", "reply"]
+    assert len(provider.calls) == 2 and llm.stats["coalesced"] == 0
+
+
+class EndlessStream(ScriptedProvider):
+    closed = False
+
+    async def stream(self, messages, model, temperature):
+        try:
+            while True:
+                yield "tick "
+                await asyncio.sleep(0.01)
+        finally:
+            EndlessStream.closed = True
+
+
+def test_abandoned_shared_stream_is_cancelled():
+    llm = LLMClient(router=LLMRouter([EndlessStream(name="endless")]))
+
+    async def main():
+        stream = llm.stream(MESSAGES)
+        assert await stream.__anext__() == "tick "
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+        return dict(llm._inflight)
+
+    assert asyncio.run(main()) == {}
+    assert EndlessStream.closed
+
+
+def test_only_streams_that_end_normally_count_as_successes():
+    provider = EndlessStream(name="endless")
+    router = LLMRouter([provider])
+    llm = LLMClient(router=router)
+
+    async def main():
+        for coalesce in (True, False):
+            llm.coalesce = coalesce
+            stream = llm.stream(MESSAGES)
+            await stream.__anext__()
+            await stream.aclose()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert (router.stats["endless"].calls, router.stats["endless"].failures) == (0, 0)
+
+
+def test_repeated_architect_plan_is_served_from_the_cache(tmp_path, scripted_llm, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "true")
+    monkeypatch.setenv("LLM_CACHE_DIR", str(tmp_path / "cache"))
+    # Text after the action: the agent stops reading before the stream ends.
+    llm = scripted_llm('{"thought": "t", "tool": "FINAL_ANSWER", "args": {"result": "Designed."}}\n'
+                       "That is the whole design.", chunk_size=8)
+    (tmp_path / "project").mkdir()
+
+    async def plan():
+        architect = ArchitectAgent("a todo app", str(tmp_path / "project"))
+        architect.llm = llm
+        result = await architect.run("Design: project structure")
+        await asyncio.sleep(0.05)  # Let the abandoned stream finish into the cache
+        return result
+
+    assert asyncio.run(plan()) == asyncio.run(plan()) == "Designed."
+    assert len(llm.provider.calls) == 1
+    assert llm.cache.stats["bypassed"] == 0
+    assert llm.cache.stats["memory_hits"] == 1
+
+
+def test_failing_provider_fails_over():
+    flaky = ScriptedProvider(["flaky"], fail_times=100, name="flaky")
+    steady = ScriptedProvider(["steady"], name="steady")
+    router = LLMRouter([flaky, steady])
+    llm = LLMClient(router=router)
+    llm.max_retries = 0
+
+    assert asyncio.run(llm.complete(MESSAGES)) == "steady"
+    assert llm.stats["failovers"] == 1
+    assert router.stats["flaky"].failures == 1 and router.stats["steady"].failures == 0
+
+
+def test_exhausted_providers_raise(scripted_llm):
+    llm = scripted_llm("never", fail_times=100)
+    llm.max_retries = 0
+    with pytest.raises(LLMError):
+        asyncio.run(llm.complete(MESSAGES))
+    assert asyncio.run(llm.chat("sys", "hi")).startswith("LLM ERROR")
+
+
+def test_retried_request_counts_as_one_failure_or_none(monkeypatch):
+    monkeypatch.setattr("dweebuild.core.llm.backoff_delay", lambda attempt: 0)
+    flaky = ScriptedProvider(["ok"], fail_times=2, name="flaky")
+    router = LLMRouter([flaky])
+    llm = LLMClient(router=router)
+    llm.max_retries = 2
+    assert asyncio.run(llm.complete(MESSAGES)) == "ok"
+    assert llm.stats["retries"] == 2
+    assert (router.stats["flaky"].calls, router.stats["flaky"].failures) == (1, 0)
+
+    flaky.fail_times = 100
+    with pytest.raises(LLMError):
+        asyncio.run(llm.complete(MESSAGES + [{"role": "user", "content": "again"}]))
+    assert (router.stats["flaky"].calls, router.stats["flaky"].failures) == (2, 1)
+
+
+class BreaksMidStream(ScriptedProvider):
+    async def stream(self, messages, model, temperature):
+        yield "partial "
+        raise ConnectionError("connection reset")
+
+
+def test_mid_stream_failure_is_recorded_once():
+    provider = BreaksMidStream(name="breaks")
+    router = LLMRouter([provider])
+    llm = LLMClient(router=router)
+
+    async def main():
+        return [chunk async for chunk in llm.stream(MESSAGES)]
+
+    with pytest.raises(LLMError):
+        asyncio.run(main())
+    assert (router.stats["breaks"].calls, router.stats["breaks"].failures) == (1, 1)
+
+
+def test_router_opens_the_circuit_after_repeated_failures():
+    a, b = ScriptedProvider(name="a"), ScriptedProvider(name="b")
+    router = LLMRouter([a, b], failure_threshold=2, cooldown=60)
+    assert router.candidates()[0] is a
+    router.record_failure(a)
+    router.record_failure(a)
+    assert router.candidates() == [b]
+    router.record_failure(b)
+    router.record_failure(b)
+    assert router.candidates()[0] is a  # Everything tripped: probe the earliest to recover
+
+
+def test_router_prefers_faster_providers():
+    slow, fast = ScriptedProvider(name="slow"), ScriptedProvider(name="fast")
+    router = LLMRouter([slow, fast])
+    for _ in range(5):
+        router.record_success(slow, 2.0)
+        router.record_success(fast, 0.2)
+    assert router.candidates()[0] is fast
+
+
+class FakeClient:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePool(ClientPool):
+    def _build(self, provider, api_key):
+        return FakeClient()
+
+
+def test_client_pool_keeps_one_client_per_loop_and_closes_it_with_the_loop():
+    pool = FakePool()
+    seen = {}
+
+    async def use(name):
+        client = pool.get("groq", "key")
+        assert pool.get("groq", "key") is client
+        seen[name] = client
+        await asyncio.sleep(0.05)
+        assert pool.get("groq", "key") is client  # The other loop did not replace it
+
+    threads = [threading.Thread(target=asyncio.run, args=(use(name),)) for name in ("ui", "dispatch")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen["ui"] is not seen["dispatch"]
+    assert seen["ui"].closed and seen["dispatch"].closed
+    assert pool.stats()["clients"] == 0
+    assert pool.clients_created == pool.clients_closed == 2
+
+
+def test_client_pool_aclose_closes_the_running_loops_clients():
+    pool = FakePool()
+
+    async def main():
+        client = pool.get("groq", "key")
+        await pool.aclose()
+        return client, pool.get("groq", "key")
+
+    first, second = asyncio.run(main())
+    assert first.closed and second is not first
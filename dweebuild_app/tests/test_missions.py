@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from dweebuild.core.code_index import get_code_index
+from dweebuild.core.executor import shell_executor
+from dweebuild.core.impact import get_impact_map
+from dweebuild.core.missions import MissionManager
+from dweebuild.core.usage import usage_meter
+
+
+def test_removing_a_finished_mission_forgets_its_usage(tmp_path, scripted_llm):
+    manager = MissionManager(root=str(tmp_path), agent_factory=lambda objective, cwd: [], llm=scripted_llm())
+    mission = manager.create("build a thing", mission_id="m1")
+    usage_meter.add("m1", {"llm_calls": 3})
+    with pytest.raises(ValueError):
+        manager.remove("m1")  # Still queued
+
+    async def finished():
+        task = asyncio.ensure_future(asyncio.sleep(0))
+        await task
+        return task
+
+    mission.task = asyncio.run(finished())
+    assert manager.remove("m1") is mission
+    assert "m1" not in manager.missions and "m1" not in manager.fair_share.weights
+    assert usage_meter.get("m1") == {}
+    assert "m1" not in usage_meter.summary()
+
+
+def test_removing_a_mission_releases_its_directory_resources(tmp_path, scripted_llm, monkeypatch):
+    monkeypatch.setenv("JOURNAL_DIR", str(tmp_path / "journal"))
+    manager = MissionManager(root=str(tmp_path / "missions"), agent_factory=lambda objective, cwd: [],
+                             llm=scripted_llm())
+    mission = manager.create("build a thing", mission_id="m1")
+    journal = mission.orchestrator.memory.journal
+    impact = get_impact_map(mission.working_dir)
+
+    async def main():
+        await shell_executor.run("true", cwd=mission.working_dir)
+        assert shell_executor.summary()["idle"] >= 1
+        mission.task = asyncio.ensure_future(asyncio.sleep(0))
+        await mission.task
+        manager.remove("m1")
+        await asyncio.sleep(0.1)  # Let the killed shell be reaped on its own loop
+
+    asyncio.run(main())
+    assert not journal._flusher.is_alive()
+    assert mission.working_dir not in shell_executor._idle
+    assert get_impact_map(mission.working_dir) is not impact
+    assert get_code_index(mission.working_dir) is not impact.index
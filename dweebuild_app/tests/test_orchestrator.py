@@ -0,0 +1,111 @@
+import asyncio
+
+from dweebuild.core.agent import BaseAgent
+from dweebuild.core.journal import Journal
+from dweebuild.core.modes import WorkMode
+from dweebuild.core.orchestrator import VERIFY_TITLE, Orchestrator
+from dweebuild.core.persistence import SessionManager
+
+
+class StubAgent(BaseAgent):
+    """Plays back outcomes in order: a string is returned, an exception is raised."""
+    def __init__(self, kind, *outcomes):
+        super().__init__(kind, kind.title(), "mission")
+        self.outcomes = list(outcomes)
+        self.tasks = []
+
+    async def run(self, task):
+        self.tasks.append(task)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if outcome == "hang":
+            await asyncio.sleep(60)
+        return outcome
+
+
+def run_mission(scripted_llm, *agents, tasks=()):
+    orc = Orchestrator(mode=WorkMode.SINGLE, llm=scripted_llm())
+    for agent in agents:
+        orc.register_agent(agent)
+    orc.start()
+    for task in tasks:
+        orc.add_task(task)
+    asyncio.run(asyncio.wait_for(orc.dispatch(), 20))
+    return orc
+
+
+def titles(orc):
+    return [task.title for task in orc.scheduler.tasks.values()]
+
+
+def test_failed_design_is_retried_instead_of_planned(scripted_llm, monkeypatch):
+    monkeypatch.setenv("TASK_MAX_RETRIES", "2")
+    architect = StubAgent("ARCHITECT", RuntimeError("boom"))
+    orc = run_mission(scripted_llm, architect, tasks=["Design: game architecture"])
+    assert titles(orc) == ["Design: game architecture"] * 3
+    assert [task.status for task in orc.scheduler.tasks.values()] == ["failed"] * 3
+    assert "Previous attempt failed: Error: RuntimeError('boom')" in architect.tasks[-1]
+    assert architect.tasks[-1].count("Previous attempt failed") == 1
+
+
+def test_timed_out_engineer_does_not_queue_verify(scripted_llm, monkeypatch):
+    monkeypatch.setenv("TASK_MAX_RETRIES", "0")
+    monkeypatch.setenv("AGENT_TIMEOUT_SECONDS", "1")
+    engineer = StubAgent("ENGINEER", "hang")
+    qa = StubAgent("QA_LEAD", "QA SUCCESS.")
+    orc = run_mission(scripted_llm, engineer, qa, tasks=["Implement: the parser"])
+    assert VERIFY_TITLE not in titles(orc)
+    assert qa.tasks == []
+    assert orc.scheduler.tasks["t1"].result == "Task timed out after 1s"
+
+
+def test_retry_that_succeeds_continues_the_chain(scripted_llm):
+    engineer = StubAgent("ENGINEER", "Max attempts reached without resolution.", "Implemented.")
+    qa = StubAgent("QA_LEAD", "QA SUCCESS. No tests affected by the changes.")
+    orc = run_mission(scripted_llm, engineer, qa, tasks=["Implement: the parser"])
+    assert titles(orc) == ["Implement: the parser", "Implement: the parser", VERIFY_TITLE]
+    assert [task.status for task in orc.scheduler.tasks.values()] == ["failed", "done", "done"]
+    assert len(qa.tasks) == 1
+
+
+def test_journal_growth_triggers_a_snapshot_and_prune(tmp_path, scripted_llm, monkeypatch):
+    monkeypatch.setenv("JOURNAL_MAX_MB", "1")
+    journal = Journal(tmp_path / "journal", fsync="never", segment_bytes=100_000)
+    orc = Orchestrator(llm=scripted_llm(), journal=journal)
+    orc.sessions = SessionManager(tmp_path / "sessions", compression="gzip")
+    for i in range(120):
+        orc.memory.add_log("ENGINEER", f"{i} " + "x" * 10_000)
+    journal.flush()
+    before = journal.size_bytes()
+
+    asyncio.run(orc._bound_journal())
+    assert orc.sessions.latest(orc.session_id)
+    assert journal.size_bytes() < 200_000 < before
+    asyncio.run(orc._bound_journal())  # Nothing new: no second snapshot
+    assert len(orc.sessions.describe(orc.session_id)) == 1
+    journal.close()
+
+
+def test_qa_without_a_verdict_is_not_a_pass(scripted_llm, monkeypatch):
+    monkeypatch.setenv("TASK_MAX_RETRIES", "1")
+    monkeypatch.setenv("AGENT_TIMEOUT_SECONDS", "1")
+    for outcome in ("", "hang", RuntimeError("crashed")):
+        qa = StubAgent("QA_LEAD", outcome)
+        orc = run_mission(scripted_llm, qa, tasks=[VERIFY_TITLE])
+        assert titles(orc) == [VERIFY_TITLE, VERIFY_TITLE], outcome
+        assert [task.status for task in orc.scheduler.tasks.values()] == ["failed", "failed"], outcome
+        assert not any("Tests passed" in entry["message"] for entry in orc.memory.logs), outcome
+
+
+def test_an_older_snapshot_never_replaces_a_newer_one(tmp_path, scripted_llm):
+    journal = Journal(tmp_path / "journal", fsync="never")
+    orc = Orchestrator(llm=scripted_llm(), journal=journal)
+    orc.sessions = SessionManager(tmp_path / "sessions", compression="gzip")
+    orc.memory.add_log("ENGINEER", "first")
+    older = orc.snapshot()
+    orc.memory.add_log("ENGINEER", "second")
+    newer = orc.save_session()
+    assert orc.save_session(older) == newer
+    assert len(orc.sessions.describe(orc.session_id)) == 1
+    journal.close()
@@ -0,0 +1,72 @@
+import asyncio
+
+from dweebuild.core.output import OutputBuffer, OutputStream, clip_text
+
+
+def test_clip_text_keeps_head_and_tail():
+    assert clip_text("short", 100) == "short"
+    clipped = clip_text("a" * 100 + "b" * 100, 60)
+    assert clipped.startswith("a" * 40) and clipped.endswith("b" * 20)
+    assert "140 chars omitted" in clipped
+
+
+def test_small_output_is_kept_whole():
+    buffer = OutputBuffer(10, 10)
+    buffer.write(b"hello ")
+    buffer.write(b"world")
+    assert buffer.text() == "hello world"
+    assert buffer.omitted == 0
+
+
+def test_large_output_keeps_head_and_tail_only():
+    buffer = OutputBuffer(4, 4)
+    for chunk in (b"HEAD", b"-middle-" * 1000, b"TAIL"):
+        buffer.write(chunk)
+    assert len(buffer.head) == 4 and len(buffer.tail) == 4
+    assert buffer.omitted == buffer.total - 8
+    assert buffer.text().startswith("HEAD") and buffer.text().endswith("TAIL")
+
+
+def test_overflow_spills_the_full_stream(tmp_path):
+    buffer = OutputBuffer(4, 4, spill_dir=str(tmp_path))
+    data = b"".join(b"%05d\n" % i for i in range(1000))
+    for i in range(0, len(data), 7):
+        buffer.write(data[i:i + 7])
+    buffer.close()
+    with open(buffer.spill_path, "rb") as f:
+        assert f.read() == data
+    assert buffer.spill_path in buffer.text()
+
+
+def test_stream_drops_the_oldest_chunks_for_a_slow_reader():
+    async def main():
+        stream = OutputStream(max_pending=3)
+
+        async def produce():
+            for i in range(10):
+                stream.push("stdout", str(i))
+            return "result"
+
+        stream.task = asyncio.ensure_future(produce())
+        stream.task.add_done_callback(stream.finish)
+        await stream.task
+        return [chunk async for chunk in stream], stream.result
+
+    chunks, result = asyncio.run(main())
+    assert chunks[0] == ("note", "[7 output chunks skipped]")
+    assert chunks[1:] == [("stdout", "7"), ("stdout", "8"), ("stdout", "9")]
+    assert result == "result"
+
+
+def test_spill_file_is_capped(tmp_path):
+    buffer = OutputBuffer(4, 4, spill_dir=str(tmp_path), spill_max_bytes=1000)
+    for _ in range(100):
+        buffer.write(b"y\n" * 500)
+    buffer.write(b"END!")
+    buffer.close()
+    with open(buffer.spill_path, "rb") as f:
+        saved = f.read()
+    assert saved.startswith(b"y\n" * 500) and b"spill file capped at 1000 bytes" in saved
+    assert buffer.spilled == 1000 and len(saved) < 1200
+    assert buffer.text().endswith("END!")
+    assert f"first 1000 bytes in {buffer.spill_path}" in buffer.text()
@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+from dweebuild.core.memory import ProjectMemory
+from dweebuild.core.persistence import SessionManager
+
+
+def state_of(memory, **fields):
+    return {"mode": "single", "tasks": [], **fields, "logs": memory.logs, "log_run": memory.run_id}
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return SessionManager(tmp_path / "sessions", compression="gzip", full_every=3, keep=10)
+
+
+def test_deltas_store_only_changes(manager):
+    memory = ProjectMemory()
+    for i in range(5):
+        memory.add_log("A", f"first {i}")
+    manager.save_session("s", state_of(memory, kv={"a": 1}, big="x" * 1000))
+    for i in range(2):
+        memory.add_log("A", f"second {i}")
+    manager.save_session("s", state_of(memory, kv={"a": 2}, big="x" * 1000))
+
+    kinds = [e["kind"] for e in manager.describe("s")]
+    assert kinds == ["full", "delta"]
+    records = list(manager.iter_records(manager.latest("s")))
+    assert records[0]["kind"] == "delta"
+    assert {r["field"] for r in records if "field" in r} == {"kv"}
+    assert sum(1 for r in records if "log" in r) == 2
+
+    state = manager.load_session(manager.latest("s"))
+    assert state["kv"] == {"a": 2} and state["big"] == "x" * 1000
+    assert [e["message"] for e in state["logs"]] == [f"first {i}" for i in range(5)] + ["second 0", "second 1"]
+
+
+def test_save_after_a_restart_keeps_the_new_logs(manager):
+    first = ProjectMemory()
+    for i in range(50):
+        first.add_log("A", f"run one {i}")
+    manager.save_session("s", state_of(first))
+
+    second = ProjectMemory()  # New process: seqs start again at 1
+    for i in range(10):
+        second.add_log("A", f"run two {i}")
+    manager.save_session("s", state_of(second))
+    assert [e["kind"] for e in manager.describe("s")] == ["full", "full"]
+    logs = manager.load_session(manager.latest("s"))["logs"]
+    assert [e["message"] for e in logs] == [f"run two {i}" for i in range(10)]
+
+
+def test_save_after_restoring_a_snapshot_keeps_every_log(manager):
+    first = ProjectMemory()
+    for i in range(5):
+        first.add_log("A", f"before {i}")
+    manager.save_session("s", state_of(first))
+
+    restored = ProjectMemory()
+    restored.load_logs(manager.load_session(manager.latest("s"))["logs"])
+    restored.add_log("A", "after")
+    manager.save_session("s", state_of(restored))
+    restored.add_log("A", "later")
+    manager.save_session("s", state_of(restored))
+    assert [e["kind"] for e in manager.describe("s")] == ["full", "full", "delta"]
+    logs = manager.load_session(manager.latest("s"))["logs"]
+    assert [e["message"] for e in logs] == [f"before {i}" for i in range(5)] + ["after", "later"]
+
+
+def test_seqs_going_backwards_force_a_full_save(manager):
+    memory = ProjectMemory()
+    for i in range(20):
+        memory.add_log("A", str(i))
+    manager.save_session("s", {"mode": "single", "logs": memory.logs})
+    fresh = ProjectMemory()
+    fresh.add_log("A", "new")
+    manager.save_session("s", {"mode": "single", "logs": fresh.logs})
+    assert manager.describe("s")[-1]["kind"] == "full"
+    assert [e["message"] for e in manager.load_session(manager.latest("s"))["logs"]] == ["new"]
+
+
+def test_every_nth_save_is_full(manager):
+    memory = ProjectMemory()
+    for i in range(4):
+        memory.add_log("A", str(i))
+        manager.save_session("s", state_of(memory))
+    assert [e["kind"] for e in manager.describe("s")] == ["full", "delta", "delta", "full"]
+
+
+def test_retention_keeps_the_parents_of_kept_deltas(tmp_path):
+    manager = SessionManager(tmp_path, compression="gzip", full_every=2, keep=2)
+    memory = ProjectMemory()
+    for i in range(5):
+        memory.add_log("A", str(i))
+        manager.save_session("s", state_of(memory))
+    entries = manager.describe("s")
+    # Saves go full, delta, full, delta, full: the newest two plus the delta's base.
+    assert [e["kind"] for e in entries] == ["full", "delta", "full"]
+    assert [e["message"] for e in manager.load_session(manager.latest("s"))["logs"]] == [str(i) for i in range(5)]
+
+
+def test_index_survives_reopening(tmp_path, manager):
+    memory = ProjectMemory()
+    memory.add_log("A", "hello")
+    path = manager.save_session("s", state_of(memory))
+    reopened = SessionManager(tmp_path / "sessions", compression="gzip")
+    assert reopened.latest("s") == path
+    assert reopened.load_session(path)["logs"][0]["message"] == "hello"
+
+
+def test_concurrent_saves_keep_every_snapshot_in_the_index(tmp_path):
+    manager = SessionManager(tmp_path, compression="none", full_every=3, keep=1000)
+    errors = []
+
+    def save(worker):
+        memory = ProjectMemory()
+        try:
+            for i in range(10):
+                memory.add_log("A", f"{worker}-{i}")
+                manager.save_session("s", state_of(memory, worker=worker))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(manager.describe("s")) == 80
+    assert len(SessionManager(tmp_path, compression="none").describe("s")) == 80
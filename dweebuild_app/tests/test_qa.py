@@ -0,0 +1,28 @@
+import asyncio
+import os
+
+import pytest
+
+from dweebuild.agents.qa import QAAgent
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/bin/sh"), reason="needs /bin/sh")
+
+
+def make_project(tmp_path, body):
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "test_app.py").write_text(body)
+    return QAAgent("mission", str(tmp_path))
+
+
+def test_passing_suite_is_approved(tmp_path):
+    qa = make_project(tmp_path, "def test_ok():\n    assert True\n")
+    result = asyncio.run(qa.run("Verify"))
+    assert result.startswith("QA SUCCESS") and "1 tests: 1 passed" in result
+
+
+def test_hung_suite_is_a_failure_before_the_agent_timeout(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_TIMEOUT_SECONDS", "3")
+    qa = make_project(tmp_path, "import time\n\ndef test_hangs():\n    time.sleep(30)\n")
+    result = asyncio.run(asyncio.wait_for(qa.run("Verify"), 3))
+    assert result.startswith("QA FAILURE")
+    assert "pytest did not run" in result
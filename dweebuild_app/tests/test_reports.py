@@ -0,0 +1,77 @@
+import json
+
+from dweebuild.core.reports import TestReport
+
+JUNIT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest" errors="1" failures="1" skipped="1" tests="5" time="1.5">
+  <testcase classname="tests.test_api" name="test_ok" file="tests/test_api.py" time="0.1"/>
+  <testcase classname="tests.test_api" name="test_error_message_is_shown" file="tests/test_api.py" time="0.1"/>
+  <testcase classname="tests.test_api.TestLogin" name="test_bad_password" file="tests/test_api.py" time="0.1">
+    <failure message="AssertionError: assert 401 == 403">tests/test_api.py:12: AssertionError</failure>
+  </testcase>
+  <testcase classname="tests.test_db" name="test_connect" file="tests/test_db.py" time="0.1">
+    <error message="fixture 'db' not found">setup failed</error>
+  </testcase>
+  <testcase classname="tests.test_db" name="test_slow" file="tests/test_db.py" time="0.0">
+    <skipped message="slow"/>
+  </testcase>
+</testsuite></testsuites>
+"""
+
+
+def write_junit(tmp_path, text=JUNIT):
+    path = tmp_path / "junit.xml"
+    path.write_text(text)
+    return str(path)
+
+
+def test_counts_and_node_ids(tmp_path):
+    report = TestReport.from_junit(write_junit(tmp_path), returncode=1)
+    assert (report.tests, report.passed, report.failed, report.errors, report.skipped) == (5, 2, 1, 1, 1)
+    assert not report.ok
+    assert [f.nodeid for f in report.failures] == [
+        "tests/test_api.py::TestLogin::test_bad_password", "tests/test_db.py::test_connect"]
+    assert report.headline() == "5 tests: 2 passed, 1 failed, 1 errors, 1 skipped in 1.5s"
+
+
+def test_passing_test_named_error_is_not_a_failure(tmp_path):
+    junit = """<testsuite tests="1" time="0.1">
+      <testcase classname="tests.test_x" name="test_error_handling" file="tests/test_x.py"/>
+    </testsuite>"""
+    report = TestReport.from_junit(write_junit(tmp_path, junit), returncode=0, output="1 passed, error handling ok")
+    assert report.ok and report.passed == 1
+
+
+def test_failures_group_by_file(tmp_path):
+    report = TestReport.from_junit(write_junit(tmp_path), returncode=1)
+    assert sorted(report.by_file()) == ["tests/test_api.py", "tests/test_db.py"]
+
+
+def test_run_without_a_report_is_a_session_error(tmp_path):
+    report = TestReport.from_junit(str(tmp_path / "missing.xml"), returncode=4, output="ERROR: file not found: tests")
+    assert not report.ok
+    assert report.failures[0].nodeid == "<session>"
+    assert report.failures[0].file is None
+    assert "file not found" in report.failures[0].traceback
+    assert report.headline() == "pytest did not run (exit 4)"
+
+
+def test_no_tests_collected_is_ok(tmp_path):
+    report = TestReport.from_junit(str(tmp_path / "missing.xml"), returncode=5)
+    assert report.ok and report.headline() == "no tests collected"
+
+
+def test_report_travels_in_a_task_result(tmp_path):
+    report = TestReport.from_junit(write_junit(tmp_path), returncode=1)
+    result = f"QA FAILURE. {report.headline()}\n" + json.dumps({"test_report": report.to_dict()})
+    again = TestReport.from_result(result)
+    assert again == report
+    assert TestReport.from_result("QA SUCCESS. No tests affected by the changes.") is None
+
+
+def test_render_is_bounded(tmp_path):
+    report = TestReport.from_junit(write_junit(tmp_path), returncode=1)
+    text = report.render()
+    assert text.splitlines()[0] == report.headline()
+    assert "FAILURE tests/test_api.py::TestLogin::test_bad_password" in text
+    assert len(report.render(max_chars=80)) < 200
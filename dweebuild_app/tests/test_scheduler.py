@@ -0,0 +1,122 @@
+import pytest
+
+from dweebuild.core.scheduler import (ANY_ROLE, BLOCKED, DONE, FAILED, READY, FileLeases, Task,
+                                      TaskScheduler, route_role)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_route_role_prefers_the_verb_prefix():
+    assert route_role("Design: a game") == "ARCHITECT"
+    assert route_role("Verify: Run tests and validate implementation") == "QA_LEAD"
+    assert route_role("Fix: failing tests in tests/test_api.py") == "ENGINEER"
+    assert route_role("Write the docs") == ANY_ROLE
+
+
+def test_dependents_wait_for_their_deps():
+    scheduler = TaskScheduler()
+    scheduler.submit_many([
+        {"id": "a", "title": "Implement: a"},
+        {"id": "b", "title": "Implement: b", "deps": ["a"]},
+    ])
+    assert scheduler.tasks["b"].status == BLOCKED
+    assert scheduler.pop("ENGINEER").id == "a"
+    assert scheduler.pop("ENGINEER") is None
+
+    released = scheduler.complete("a")
+    assert [t.id for t in released] == ["b"]
+    assert scheduler.pop("ENGINEER").id == "b"
+
+
+def test_failed_deps_still_release_dependents():
+    scheduler = TaskScheduler()
+    scheduler.submit_many([{"id": "a", "title": "Implement: a"},
+                           {"id": "v", "title": "Verify: a", "deps": ["a"]}])
+    scheduler.pop("ENGINEER")
+    scheduler.complete("a", ok=False)
+    assert scheduler.tasks["a"].status == FAILED
+    assert scheduler.tasks["v"].status == READY
+
+
+def test_batch_cycles_and_unknown_deps_are_rejected():
+    scheduler = TaskScheduler()
+    with pytest.raises(ValueError, match="cycle"):
+        scheduler.submit_many([{"id": "a", "title": "Implement: a", "deps": ["b"]},
+                               {"id": "b", "title": "Implement: b", "deps": ["a"]}])
+    with pytest.raises(ValueError, match="unknown"):
+        scheduler.push({"title": "Implement: c", "deps": ["missing"]})
+    assert not scheduler.tasks
+
+
+def test_identical_pending_tasks_merge():
+    scheduler = TaskScheduler()
+    first = scheduler.push(Task("Verify: run tests", priority=1))
+    second = scheduler.push(Task("Verify:  run   tests", priority=3, detail="newest"))
+    assert second is first
+    assert first.priority == 3 and first.detail == "newest"
+    assert scheduler.stats["deduplicated"] == 1
+    assert len(scheduler) == 1
+
+
+def test_critical_path_goes_first():
+    scheduler = TaskScheduler(aging_rate=0)
+    scheduler.submit_many([
+        {"id": "leaf", "title": "Implement: leaf"},
+        {"id": "root", "title": "Implement: root"},
+        {"id": "mid", "title": "Implement: mid", "deps": ["root"], "cost": 3},
+    ])
+    assert scheduler.pop("ENGINEER").id == "root"
+
+
+def test_waiting_tasks_age_upward():
+    clock = Clock()
+    scheduler = TaskScheduler(aging_rate=1.0, clock=clock)
+    scheduler.push(Task("Implement: old"))
+    clock.now = 10
+    scheduler.push(Task("Implement: new", priority=5))
+    assert scheduler.pop("ENGINEER").title == "Implement: old"
+
+
+def test_tasks_with_leased_files_are_skipped():
+    scheduler = TaskScheduler()
+    scheduler.push({"id": "a", "title": "Implement: a", "files": ["app.py"]})
+    scheduler.push({"id": "b", "title": "Implement: b", "files": ["app.py"]})
+    scheduler.push({"id": "c", "title": "Implement: c", "files": ["other.py"]})
+    assert scheduler.pop("ENGINEER").id == "a"
+    assert scheduler.pop("ENGINEER").id == "c"
+    assert scheduler.pop("ENGINEER") is None
+    scheduler.leases.release_all("a")
+    scheduler.complete("a")
+    assert scheduler.pop("ENGINEER").id == "b"
+
+
+def test_leases_expire():
+    clock = Clock()
+    leases = FileLeases(ttl=5, clock=clock)
+    assert leases.acquire("src/app.py", "t1")
+    assert not leases.acquire("src/./app.py", "t2")
+    clock.now = 6
+    assert leases.holder("src/app.py") is None
+    assert leases.acquire("src/app.py", "t2")
+
+
+def test_spec_round_trip():
+    task = Task.from_spec({"id": "x", "title": "Fix: it", "deps": [], "files": ["a.py"],
+                           "cost": 2, "detail": "traceback"})
+    again = Task.from_spec(task.to_spec())
+    assert again.to_spec() == task.to_spec()
+    assert "traceback" in again.prompt() and "a.py" in again.prompt()
+
+
+def test_restore_keeps_finished_tasks_finished():
+    scheduler = TaskScheduler()
+    scheduler.restore(Task("Implement: a", id="a"), DONE, "ok")
+    scheduler.restore(Task("Verify: a", id="v", deps={"a"}), "running")
+    assert scheduler.tasks["a"].status == DONE
+    assert scheduler.pop("QA_LEAD").id == "v"
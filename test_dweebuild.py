@@ -111,8 +111,7 @@ Build a chaotic monkey-banana physics game:
             for log in logs:
                 print(f"  [{log['level']}] {log['source']}: {log['message'][:80]}...")
         
-        # Small delay to avoid hammering the API
-        await asyncio.sleep(2)
+        # No fixed delay needed: LLMClient's shared RateLimiter paces the API.
         
         # Safety: stop if stuck
         if iteration > orc.mode_config.max_iterations:
@@ -115,8 +115,6 @@ Build a chaotic monkey-banana physics game with:
         if all_idle and len(orc.task_queue) == 0:
             print("\n✅ All agents idle and queue empty!")
             break
-        
-        await asyncio.sleep(2)
     
     elapsed = int(time.time() - start_time)
     print(f"\n{'='*60}")